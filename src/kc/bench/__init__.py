@@ -0,0 +1,8 @@
+"""Benchmarks that run the real kc commands against a local Keycloak stand-in.
+
+Run ``python -m kc.bench --help`` for usage.
+"""
+
+from kc.bench.server import FakeKeycloak
+
+__all__ = ["FakeKeycloak"]
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import typer
+
+from kc.bench.scenarios import SCENARIOS, BenchParams, Scenario
+from kc.bench.server import FakeKeycloak
+
+bench_app = typer.Typer(add_completion=False, help="Benchmark kc commands against a local Keycloak stand-in")
+
+
+def _run_measured(args: list[str], cwd: Path, log_path: Path) -> tuple[int, float, Optional[int]]:
+    """Run a command and return (exit code, wall seconds, peak RSS in KiB or None)."""
+    with log_path.open("w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(args, cwd=str(cwd), stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            # wait4 reports the child's own peak RSS (and that of anything it waited for)
+            _, status, usage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+            return proc.returncode, wall, int(rss)
+        code = proc.wait()
+        return code, time.perf_counter() - start, None
+
+
+def _diff_counts(before: dict[str, int], after: dict[str, int]) -> dict[str, int]:
+    out = {k: v - before.get(k, 0) for k, v in after.items()}
+    return {k: v for k, v in sorted(out.items(), key=lambda kv: -kv[1]) if v}
+
+
+def _run_scenario(
+    scenario: Scenario,
+    params: BenchParams,
+    *,
+    latency_ms: float,
+    jitter_ms: float,
+    error_rate: float,
+    seed: int,
+    workdir: Path,
+    http2: bool = False,
+    compression: bool = False,
+) -> dict[str, Any]:
+    workdir.mkdir(parents=True, exist_ok=True)
+    with FakeKeycloak(
+        realms=scenario.realms(params),
+        latency_ms=latency_ms,
+        jitter_ms=jitter_ms,
+        error_rate=error_rate,
+        seed=seed,
+        compression=compression,
+    ) as server:
+        if scenario.prepare is not None:
+            scenario.prepare(server, params)
+        cfg = workdir / "config.json"
+        cfg.write_text(
+            json.dumps(
+                {
+                    "server_url": server.url,
+                    "auth_realm": "master",
+                    "realm": "master",
+                    "client_id": "kc-bench",
+                    "client_secret": "kc-bench",
+                    "grant_type": "client_credentials",
+                    "http2": http2,
+                }
+            ),
+            encoding="utf-8",
+        )
+        kc_args = scenario.build(workdir, params)
+        argv = [sys.executable, "-m", "kc", "--config", str(cfg), "--log-file", str(workdir / "kc.log"), *kc_args]
+
+        before = server.snapshot()
+        code, wall, rss = _run_measured(argv, workdir, workdir / "output.txt")
+        after = server.snapshot()
+
+    by_endpoint = _diff_counts(before["requests"], after["requests"])
+    total = sum(by_endpoint.values())
+    return {
+        "scenario": scenario.name,
+        "exit_code": code,
+        "wall_s": round(wall, 4),
+        "peak_rss_kb": rss,
+        "requests": total,
+        "requests_per_s": round(total / wall, 1) if wall > 0 else None,
+        "bytes_out": after["bytes_out"] - before["bytes_out"],
+        "connections": after["connections"] - before["connections"],
+        "requests_by_endpoint": by_endpoint,
+    }
+
+
+@bench_app.command("run")
+def run(
+    scenario: list[str] = typer.Option(None, "--scenario", help=f"scenario(s) to run; default all: {', '.join(SCENARIOS)}"),
+    out: str = typer.Option("", "--out", help="write results as JSON to this path"),
+    users: int = typer.Option(1000, "--users", help="usernames for users-create"),
+    realms: int = typer.Option(200, "--realms", help="realms for roles-create-all-realms"),
+    cmd_lines: int = typer.Option(2000, "--cmd-lines", help="lines for the cmd-file scenario"),
+    clients: int = typer.Option(2000, "--clients", help="clients seeded for clients-list"),
+    latency_ms: float = typer.Option(0.0, "--latency-ms", help="fixed delay added to every response"),
+    jitter_ms: float = typer.Option(0.0, "--jitter-ms", help="random extra delay of up to this many ms"),
+    error_rate: float = typer.Option(0.0, "--error-rate", help="fraction of requests answered with 503"),
+    seed: int = typer.Option(0, "--seed", help="random seed for jitter and error injection"),
+    workdir: str = typer.Option("", "--workdir", help="keep scenario files (config, logs, output) here"),
+    http2: bool = typer.Option(False, "--http2", help="run kc with \"http2\": true (h2c to the stand-in)"),
+    compression: bool = typer.Option(False, "--compression", help="let the stand-in gzip/br-compress JSON responses"),
+):
+    names = scenario or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise RuntimeError(f"unknown scenario(s): {', '.join(unknown)}")
+
+    params = BenchParams(users=users, realms=realms, cmd_lines=cmd_lines, clients=clients)
+    settings = {
+        "users": users,
+        "realms": realms,
+        "cmd_lines": cmd_lines,
+        "clients": clients,
+        "http2": http2,
+        "compression": compression,
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "error_rate": error_rate,
+        "seed": seed,
+    }
+
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="kc-bench-") as tmp:
+        base = Path(workdir) if workdir else Path(tmp)
+        for name in names:
+            res = _run_scenario(
+                SCENARIOS[name],
+                params,
+                latency_ms=latency_ms,
+                jitter_ms=jitter_ms,
+                error_rate=error_rate,
+                seed=seed,
+                workdir=base / name,
+                http2=http2,
+                compression=compression,
+            )
+            results.append(res)
+            typer.echo(_format_result(res))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+    if out:
+        Path(out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        typer.echo(f"Results written to {out}")
+
+
+def _format_result(res: dict[str, Any]) -> str:
+    rss = f"{res['peak_rss_kb'] / 1024:.1f} MiB" if res.get("peak_rss_kb") else "n/a"
+    status = "ok" if res["exit_code"] == 0 else f"exit {res['exit_code']}"
+    lines = [
+        f"{res['scenario']}: {status}, wall {res['wall_s']:.2f}s, requests {res['requests']}, "
+        f"{res['requests_per_s']} req/s, peak RSS {rss}, "
+        f"{res['bytes_out']} bytes out over {res.get('connections', 'n/a')} connection(s)"
+    ]
+    for endpoint, n in res["requests_by_endpoint"].items():
+        lines.append(f"  {n:>8}  {endpoint}")
+    return "\n".join(lines)
+
+
+@bench_app.command("compare")
+def compare(
+    baseline: str = typer.Argument(..., help="results JSON of the reference run"),
+    candidate: str = typer.Argument(..., help="results JSON of the run to compare"),
+):
+    base = {r["scenario"]: r for r in json.loads(Path(baseline).read_text(encoding="utf-8"))["results"]}
+    cand = {r["scenario"]: r for r in json.loads(Path(candidate).read_text(encoding="utf-8"))["results"]}
+
+    for name, c in cand.items():
+        b = base.get(name)
+        if b is None:
+            typer.echo(f"{name}: not in baseline")
+            continue
+        typer.echo(
+            f"{name}: wall {_delta(b['wall_s'], c['wall_s'])}, "
+            f"requests {_delta(b['requests'], c['requests'])}, "
+            f"bytes out {_delta(b.get('bytes_out'), c.get('bytes_out'))}, "
+            f"connections {_delta(b.get('connections'), c.get('connections'))}, "
+            f"peak RSS {_delta(b.get('peak_rss_kb'), c.get('peak_rss_kb'))}"
+        )
+
+
+def _delta(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if not old:
+        return f"{old} -> {new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)"
+
+
+def _user_json(i: int) -> dict[str, Any]:
+    # what a brief user listing returns per user
+    return {
+        "id": f"{i:08d}-0000-4000-8000-000000000000",
+        "username": f"bench-user-{i:06d}",
+        "email": f"bench-user-{i:06d}@example.com",
+        "emailVerified": True,
+        "firstName": "Bench",
+        "lastName": f"User {i}",
+        "enabled": True,
+        "createdTimestamp": 1700000000000 + i,
+        "totp": False,
+        "disableableCredentialTypes": [],
+        "requiredActions": [],
+        "notBefore": 0,
+        "access": {"manageGroupMembership": True, "view": True, "mapRoles": True, "impersonate": False, "manage": True},
+    }
+
+
+def _measure_retained(build) -> tuple[object, int, float]:
+    """Run build() under tracemalloc; return (result, bytes still held by it, seconds)."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, seconds
+
+
+@bench_app.command("models")
+def models(
+    users: int = typer.Option(200_000, "--users", help="user representations to hold"),
+):
+    """Compare the memory a list of users keeps as decoded dicts, projected dicts and User records."""
+    from kc.core.keycloak import _decode_json, _project
+    from kc.core.models import User
+
+    payload = json.dumps([_user_json(i) for i in range(users)]).encode()
+
+    class _Body:
+        content = payload
+
+        def json(self) -> Any:
+            return json.loads(payload)
+
+    fields = tuple(User._FIELDS)
+    variants = {
+        "full dicts": lambda: _decode_json(_Body()),
+        "projected dicts": lambda: _project(_decode_json(_Body()), fields),
+        "User records": lambda: User.build("bench", _decode_json(_Body())),
+    }
+
+    base = None
+    for name, build in variants.items():
+        result, held, seconds = _measure_retained(build)
+        base = base or held
+        typer.echo(
+            f"{name:>16}: {held / 1024 / 1024:8.1f} MiB held ({held / users:6.0f} B/user, "
+            f"{held / base * 100:5.1f}%), built in {seconds:.2f}s"
+        )
+        del result
+
+
+@bench_app.command("serve")
+def serve(
+    port: int = typer.Option(8080, "--port", help="port to listen on"),
+    realms: int = typer.Option(1, "--realms", help="number of realms to start with, including master"),
+    latency_ms: float = typer.Option(0.0, "--latency-ms", help="fixed delay added to every response"),
+    jitter_ms: float = typer.Option(0.0, "--jitter-ms", help="random extra delay of up to this many ms"),
+    error_rate: float = typer.Option(0.0, "--error-rate", help="fraction of requests answered with 503"),
+    compression: bool = typer.Option(False, "--compression", help="gzip/br-compress JSON responses the client accepts"),
+    admin_events: bool = typer.Option(False, "--admin-events", help="record writes as admin events (for `kc index refresh`)"),
+    login_events: bool = typer.Option(False, "--login-events", help="record token requests as login events"),
+):
+    """Run the stand-in server in the foreground, for manual runs against it."""
+    server = FakeKeycloak(
+        port=port,
+        realms=realms,
+        latency_ms=latency_ms,
+        jitter_ms=jitter_ms,
+        error_rate=error_rate,
+        compression=compression,
+        admin_events=admin_events,
+        login_events=login_events,
+    )
+    server.start()
+    typer.echo(f"Fake Keycloak listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        typer.echo(json.dumps(server.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    bench_app()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from kc.bench.server import FakeKeycloak
+
+
+@dataclass
+class BenchParams:
+    users: int = 1000
+    realms: int = 200
+    cmd_lines: int = 2000
+    clients: int = 2000
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    # number of realms the stand-in server starts with (including master)
+    realms: Callable[[BenchParams], int]
+    # returns the kc arguments to run, after the global --config/--log-file flags
+    build: Callable[[Path, BenchParams], list[str]]
+    # fills the stand-in server with data before the run
+    prepare: Optional[Callable[["FakeKeycloak", BenchParams], None]] = None
+
+
+BENCH_PASSWORD = "Bench!pass123"
+
+
+def _users_create(workdir: Path, p: BenchParams) -> list[str]:
+    args = ["users", "create", "--realm", "master", "--password", BENCH_PASSWORD]
+    for i in range(p.users):
+        args.extend(["--username", f"bench-user-{i:06d}"])
+    return args
+
+
+def _roles_create_all_realms(workdir: Path, p: BenchParams) -> list[str]:
+    return ["roles", "create", "--all-realms", "--name", "bench-role", "--description", "benchmark"]
+
+
+def _cmd_file(workdir: Path, p: BenchParams) -> list[str]:
+    path = workdir / "commands.txt"
+    with path.open("w", encoding="utf-8") as f:
+        f.write("# generated by kc.bench\n")
+        for i in range(p.cmd_lines):
+            f.write(f"roles create --realm master --name bench-role-{i:06d}\n")
+    return ["--cmd-file", str(path)]
+
+
+def _clients_list(workdir: Path, p: BenchParams) -> list[str]:
+    return ["clients", "list", "--realm", "master"]
+
+
+def _index_build(workdir: Path, p: BenchParams) -> list[str]:
+    return ["index", "build", "--db", str(workdir / "index.sqlite")]
+
+
+def _seed(workdir: Path, p: BenchParams) -> list[str]:
+    path = workdir / "seed.json"
+    spec = {
+        "seed": 1,
+        "client_scopes": {"count": 10},
+        "roles": {"count": 100},
+        "clients": {"count": p.clients // 10, "roles": 5, "scopes": 3},
+        "users": {"count": p.users, "roles": 2, "client_roles": 1},
+    }
+    path.write_text(json.dumps(spec), encoding="utf-8")
+    return ["seed", str(path), "--realm", "seeded", "--progress", str(workdir / "seed.progress")]
+
+
+def _seed_index_realms(server: "FakeKeycloak", p: BenchParams) -> None:
+    for realm in server.realm_names():
+        server.add_users(realm, p.users)
+        server.add_clients(realm, p.clients // 10)
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario(
+            name="users-create",
+            description="users create with --users usernames in one realm",
+            realms=lambda p: 1,
+            build=_users_create,
+        ),
+        Scenario(
+            name="roles-create-all-realms",
+            description="roles create --all-realms across --realms realms",
+            realms=lambda p: p.realms,
+            build=_roles_create_all_realms,
+        ),
+        Scenario(
+            name="cmd-file",
+            description="--cmd-file with --cmd-lines roles create lines",
+            realms=lambda p: 1,
+            build=_cmd_file,
+        ),
+        Scenario(
+            name="clients-list",
+            description="clients list on a realm with --clients clients (large responses)",
+            realms=lambda p: 1,
+            build=_clients_list,
+            prepare=lambda server, p: server.add_clients("master", p.clients),
+        ),
+        Scenario(
+            name="index-build",
+            description="index build over 10 realms with --users users and --clients/10 clients each",
+            realms=lambda p: 10,
+            build=_index_build,
+            prepare=_seed_index_realms,
+        ),
+        Scenario(
+            name="seed",
+            description="seed a new realm with --users users, 100 roles and --clients/10 clients",
+            realms=lambda p: 1,
+            build=_seed,
+        ),
+    ]
+}
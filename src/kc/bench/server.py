@@ -0,0 +1,1108 @@
+from __future__ import annotations
+
+import calendar
+import gzip
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+# (method, path template, handler name). Order matters: literal segments such as
+# /users/count must come before the /users/{id} template they would also match.
+_ROUTES = [
+    ("POST", "/realms/{realm}/protocol/openid-connect/token", "token"),
+    ("GET", "/admin/realms", "realms_list"),
+    ("POST", "/admin/realms", "realm_create"),
+    ("GET", "/admin/realms/{realm}", "realm_get"),
+    ("GET", "/admin/realms/{realm}/admin-events", "admin_events"),
+    ("GET", "/admin/realms/{realm}/events", "login_events"),
+    ("POST", "/admin/realms/{realm}/partialImport", "partial_import"),
+    ("GET", "/admin/realms/{realm}/users/count", "users_count"),
+    ("GET", "/admin/realms/{realm}/users", "users_list"),
+    ("POST", "/admin/realms/{realm}/users", "user_create"),
+    ("GET", "/admin/realms/{realm}/users/{id}", "user_get"),
+    ("PUT", "/admin/realms/{realm}/users/{id}", "user_update"),
+    ("DELETE", "/admin/realms/{realm}/users/{id}", "user_delete"),
+    ("PUT", "/admin/realms/{realm}/users/{id}/reset-password", "user_reset_password"),
+    ("GET", "/admin/realms/{realm}/users/{id}/role-mappings/realm", "user_realm_roles"),
+    ("POST", "/admin/realms/{realm}/users/{id}/role-mappings/realm", "user_realm_roles_add"),
+    ("DELETE", "/admin/realms/{realm}/users/{id}/role-mappings/realm", "user_realm_roles_remove"),
+    ("GET", "/admin/realms/{realm}/users/{id}/role-mappings/clients/{client}", "user_client_roles"),
+    ("POST", "/admin/realms/{realm}/users/{id}/role-mappings/clients/{client}", "user_client_roles_add"),
+    ("DELETE", "/admin/realms/{realm}/users/{id}/role-mappings/clients/{client}", "user_client_roles_remove"),
+    ("GET", "/admin/realms/{realm}/roles", "roles_list"),
+    ("POST", "/admin/realms/{realm}/roles", "role_create"),
+    ("GET", "/admin/realms/{realm}/roles/{name}", "role_get"),
+    ("PUT", "/admin/realms/{realm}/roles/{name}", "role_update"),
+    ("DELETE", "/admin/realms/{realm}/roles/{name}", "role_delete"),
+    ("GET", "/admin/realms/{realm}/clients", "clients_list"),
+    ("POST", "/admin/realms/{realm}/clients", "client_create"),
+    ("GET", "/admin/realms/{realm}/clients/{id}", "client_get"),
+    ("PUT", "/admin/realms/{realm}/clients/{id}", "client_update"),
+    ("DELETE", "/admin/realms/{realm}/clients/{id}", "client_delete"),
+    ("GET", "/admin/realms/{realm}/clients/{id}/roles", "client_roles_list"),
+    ("POST", "/admin/realms/{realm}/clients/{id}/roles", "client_role_create"),
+    ("GET", "/admin/realms/{realm}/clients/{id}/roles/{name}", "client_role_get"),
+    ("DELETE", "/admin/realms/{realm}/clients/{id}/roles/{name}", "client_role_delete"),
+    ("GET", "/admin/realms/{realm}/clients/{id}/{kind}-client-scopes", "client_scope_links"),
+    ("PUT", "/admin/realms/{realm}/clients/{id}/{kind}-client-scopes/{scope}", "client_scope_link"),
+    ("DELETE", "/admin/realms/{realm}/clients/{id}/{kind}-client-scopes/{scope}", "client_scope_unlink"),
+    ("GET", "/admin/realms/{realm}/groups/count", "groups_count"),
+    ("GET", "/admin/realms/{realm}/groups", "groups_list"),
+    ("POST", "/admin/realms/{realm}/groups", "group_create"),
+    ("GET", "/admin/realms/{realm}/group-by-path/{path*}", "group_by_path"),
+    ("GET", "/admin/realms/{realm}/groups/{id}", "group_get"),
+    ("PUT", "/admin/realms/{realm}/groups/{id}", "group_update"),
+    ("DELETE", "/admin/realms/{realm}/groups/{id}", "group_delete"),
+    ("GET", "/admin/realms/{realm}/groups/{id}/children", "group_children"),
+    ("POST", "/admin/realms/{realm}/groups/{id}/children", "group_child_create"),
+    ("GET", "/admin/realms/{realm}/groups/{id}/members", "group_members"),
+    ("GET", "/admin/realms/{realm}/users/{id}/groups", "user_groups"),
+    ("PUT", "/admin/realms/{realm}/users/{id}/groups/{group}", "user_group_join"),
+    ("DELETE", "/admin/realms/{realm}/users/{id}/groups/{group}", "user_group_leave"),
+    ("GET", "/admin/realms/{realm}/client-scopes", "scopes_list"),
+    ("POST", "/admin/realms/{realm}/client-scopes", "scope_create"),
+    ("GET", "/admin/realms/{realm}/client-scopes/{id}", "scope_get"),
+    ("PUT", "/admin/realms/{realm}/client-scopes/{id}", "scope_update"),
+    ("DELETE", "/admin/realms/{realm}/client-scopes/{id}", "scope_delete"),
+]
+
+
+def _compile(template: str) -> "re.Pattern[str]":
+    # {name*} takes the rest of the path, slashes included
+    rx = re.sub(r"\\{(\w+)\\\*\\}", r"(?P<\1>.+)", re.escape(template))
+    rx = re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", rx)
+    return re.compile(f"^{rx}$")
+
+
+_COMPILED = [(m, t, _compile(t), h) for m, t, h in _ROUTES]
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class _Realm:
+    name: str
+    users: dict[str, dict] = field(default_factory=dict)
+    usernames: dict[str, str] = field(default_factory=dict)
+    roles: dict[str, dict] = field(default_factory=dict)
+    clients: dict[str, dict] = field(default_factory=dict)
+    client_ids: dict[str, str] = field(default_factory=dict)
+    client_roles: dict[str, dict[str, dict]] = field(default_factory=dict)
+    client_scope_links: dict[tuple[str, str], set] = field(default_factory=dict)
+    scopes: dict[str, dict] = field(default_factory=dict)
+    # group id -> {id, name, path, parentId, attributes}, and group id -> member user ids
+    groups: dict[str, dict] = field(default_factory=dict)
+    group_members: dict[str, set] = field(default_factory=dict)
+    user_realm_roles: dict[str, set] = field(default_factory=dict)
+    user_client_roles: dict[tuple[str, str], set] = field(default_factory=dict)
+    # newest last; served newest first like Keycloak does
+    admin_events: list[dict] = field(default_factory=list)
+    login_events: list[dict] = field(default_factory=list)
+
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def _bool_param(query: dict, name: str) -> bool:
+    return query.get(name, "false").lower() == "true"
+
+
+def _realm_rep(name: str, admin_events: bool = False, login_events: bool = False) -> dict:
+    # a trimmed-down version of the settings Keycloak returns for a full realm
+    return {
+        "id": name,
+        "realm": name,
+        "displayName": name,
+        "enabled": True,
+        "sslRequired": "external",
+        "registrationAllowed": False,
+        "loginWithEmailAllowed": True,
+        "accessTokenLifespan": 300,
+        "ssoSessionIdleTimeout": 1800,
+        "ssoSessionMaxLifespan": 36000,
+        "offlineSessionIdleTimeout": 2592000,
+        "passwordPolicy": "length(12) and digits(1) and upperCase(1)",
+        "defaultSignatureAlgorithm": "RS256",
+        "bruteForceProtected": True,
+        "eventsEnabled": login_events,
+        "adminEventsEnabled": admin_events,
+        "attributes": {"frontendUrl": "", "cibaBackchannelTokenDeliveryMode": "poll", "clientSessionIdleTimeout": "0"},
+    }
+
+
+# resourceType of an admin event, by the first segments of its resource path
+_RESOURCE_TYPES = [
+    (re.compile(r"^users/[^/]+/role-mappings"), "REALM_ROLE_MAPPING"),
+    (re.compile(r"^users"), "USER"),
+    (re.compile(r"^clients/[^/]+/roles"), "CLIENT_ROLE"),
+    (re.compile(r"^clients/[^/]+/[a-z]+-client-scopes"), "CLIENT_SCOPE_CLIENT_MAPPING"),
+    (re.compile(r"^clients"), "CLIENT"),
+    (re.compile(r"^roles"), "REALM_ROLE"),
+    (re.compile(r"^client-scopes"), "CLIENT_SCOPE"),
+]
+_OPERATIONS = {"POST": "CREATE", "PUT": "UPDATE", "DELETE": "DELETE"}
+
+
+def _resource_type(resource_path: str) -> str:
+    for rx, kind in _RESOURCE_TYPES:
+        if rx.match(resource_path):
+            return kind
+    return "REALM"
+
+
+def _events_since(events: list, query: dict) -> list:
+    """Events newest first, from the day in dateFrom on."""
+    out = events[::-1]
+    if query.get("dateFrom"):
+        start = calendar.timegm(time.strptime(query["dateFrom"], "%Y-%m-%d"))
+        out = [e for e in out if e["time"] >= start * 1000]
+    return out
+
+
+def _page(items: list, query: dict, default_max: int = 100) -> list:
+    first = int(query.get("first", 0) or 0)
+    mx = int(query.get("max", default_max) or default_max)
+    return items[first : first + mx] if mx >= 0 else items[first:]
+
+
+class FakeKeycloak:
+    """In-memory stand-in for the parts of the Keycloak admin API the CLI uses.
+
+    Every request is counted per (method, path template). latency_ms and jitter_ms
+    delay each response; error_rate makes that fraction of requests fail with 503.
+    With compression, JSON bodies over 1 KiB are sent gzip- or br-encoded when the
+    client accepts it. Clients that open with the HTTP/2 preface are served h2c
+    (needs the h2 package); everything else gets HTTP/1.1. With admin_events, every
+    successful write inside a realm is recorded as an admin event; with login_events,
+    every token request as a CLIENT_LOGIN event.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        realms: int = 1,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        compression: bool = False,
+        admin_events: bool = False,
+        login_events: bool = False,
+    ):
+        self.latency_ms = latency_ms
+        self.admin_events = admin_events
+        self.login_events = login_events
+        self.compression = compression
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._realms: dict[str, _Realm] = {}
+        self._counts: Counter = Counter()
+        self._bytes_out = 0
+        self._connections = 0
+        self._httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+        self._realms["master"] = _Realm("master")
+        for i in range(max(realms - 1, 0)):
+            name = f"realm-{i + 1:04d}"
+            self._realms[name] = _Realm(name)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeKeycloak":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-keycloak", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeKeycloak":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def realm_names(self) -> list[str]:
+        with self._lock:
+            return list(self._realms)
+
+    def add_clients(self, realm: str, count: int) -> None:
+        """Seed a realm with clients that look like real ones (mappers, redirect URIs, attributes)."""
+        with self._lock:
+            r = self._realms[realm]
+            for i in range(count):
+                cid = f"bench-client-{i:06d}"
+                self._put_client(
+                    r,
+                    {
+                        "clientId": cid,
+                        "name": cid,
+                        "rootUrl": f"https://{cid}.example.com",
+                        "redirectUris": [f"https://{cid}.example.com/*", f"https://{cid}.example.com/callback"],
+                        "webOrigins": [f"https://{cid}.example.com"],
+                        "attributes": {"pkce.code.challenge.method": "S256", "post.logout.redirect.uris": "+"},
+                        "protocolMappers": [
+                            {"name": m, "protocol": "openid-connect", "protocolMapper": "oidc-usermodel-attribute-mapper",
+                             "config": {"claim.name": m, "user.attribute": m, "id.token.claim": "true", "access.token.claim": "true"}}
+                            for m in ("department", "cost-center", "locale")
+                        ],
+                    },
+                )
+
+    def add_users(self, realm: str, count: int) -> None:
+        """Seed a realm with users (brief fields plus a few attributes)."""
+        with self._lock:
+            r = self._realms[realm]
+            for i in range(count):
+                un = f"bench-user-{i:06d}"
+                self._put_user(
+                    r,
+                    {
+                        "username": un,
+                        "email": f"{un}@example.com",
+                        "emailVerified": True,
+                        "firstName": "Bench",
+                        "lastName": f"User {i}",
+                        "attributes": {"department": ["bench"], "locale": ["en"]},
+                    },
+                )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return request counters; subtract two snapshots to get one command's traffic."""
+        with self._lock:
+            return {"requests": dict(self._counts), "bytes_out": self._bytes_out, "connections": self._connections}
+
+    # -- dispatch ---------------------------------------------------------------
+
+    def dispatch(self, method: str, raw_path: str, body: bytes, content_type: str) -> tuple[int, Any, dict]:
+        parts = urlsplit(raw_path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        for m, template, rx, handler in _COMPILED:
+            if m != method:
+                continue
+            match = rx.match(parts.path)
+            if match is None:
+                continue
+            params = {k: unquote(v) for k, v in match.groupdict().items()}
+            with self._lock:
+                self._counts[f"{method} {template}"] += 1
+
+            delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return 503, {"error": "injected failure"}, {}
+
+            payload: Any = None
+            if body:
+                if content_type.startswith("application/json"):
+                    payload = json.loads(body)
+                else:
+                    payload = {k: v[-1] for k, v in parse_qs(body.decode("utf-8")).items()}
+            try:
+                with self._lock:
+                    status, out, extra = getattr(self, f"_h_{handler}")(params, query, payload)
+                    if self.admin_events and method != "GET" and status < 300 and "realm" in params:
+                        self._record_event(method, params["realm"], parts.path, extra.get("Location", ""))
+                    return status, out, extra
+            except _HttpError as e:
+                return e.status, {"error": e.message}, {}
+
+        with self._lock:
+            self._counts[f"{method} <unmatched>"] += 1
+        return 404, {"error": "HTTP 404 Not Found"}, {}
+
+    def respond(
+        self, method: str, raw_path: str, body: bytes, content_type: str, accept_encoding: str
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        """dispatch() plus everything a transport needs: encoded body and response headers."""
+        status, payload, extra = self.dispatch(method, raw_path, body, content_type)
+        headers: list[tuple[str, str]] = []
+        data = b""
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+            headers.append(("Content-Type", "application/json"))
+            encoding = _pick_encoding(accept_encoding) if self.compression and len(data) > _COMPRESS_MIN_BYTES else ""
+            if encoding:
+                data = _compress(data, encoding)
+                headers.append(("Content-Encoding", encoding))
+        for k, v in extra.items():
+            if k == "Location" and v.startswith("/"):
+                v = f"{self.url}{v}"
+            headers.append((k, v))
+        with self._lock:
+            self._bytes_out += len(data)
+        return status, headers, data
+
+    def _record_event(self, method: str, realm: str, path: str, location: str) -> None:
+        r = self._realms.get(realm)
+        if r is None:
+            return
+        prefix = f"/admin/realms/{realm}/"
+        if not path.startswith(prefix):
+            # token requests and writes to the realm itself
+            return
+        # creates name the new object by its Location, like Keycloak's resourcePath
+        resource_path = unquote((location or path)[len(prefix):])
+        r.admin_events.append(
+            {
+                "id": _new_id(),
+                "time": int(time.time() * 1000),
+                "realmId": realm,
+                "operationType": _OPERATIONS[method],
+                "resourceType": _resource_type(resource_path),
+                "resourcePath": resource_path,
+            }
+        )
+
+    def _realm(self, params: dict) -> _Realm:
+        r = self._realms.get(params["realm"])
+        if r is None:
+            raise _HttpError(404, "Realm not found.")
+        return r
+
+    # -- token and realms -----------------------------------------------------------
+
+    def _h_token(self, params, query, body):
+        r = self._realms.get(params["realm"])
+        if self.login_events and r is not None:
+            r.login_events.append(
+                {
+                    "id": _new_id(),
+                    "time": int(time.time() * 1000),
+                    "type": "CLIENT_LOGIN",
+                    "realmId": r.name,
+                    "clientId": (body or {}).get("client_id", ""),
+                    "ipAddress": "127.0.0.1",
+                }
+            )
+        return 200, {"access_token": _new_id(), "expires_in": 300, "token_type": "Bearer"}, {}
+
+    def _h_realms_list(self, params, query, body):
+        if _bool_param(query, "briefRepresentation"):
+            return 200, [{"id": r.name, "realm": r.name} for r in self._realms.values()], {}
+        return 200, [_realm_rep(r.name, self.admin_events, self.login_events) for r in self._realms.values()], {}
+
+    def _h_realm_create(self, params, query, body):
+        name = (body or {}).get("realm", "")
+        if not name:
+            raise _HttpError(400, "realm name is required")
+        if name in self._realms:
+            raise _HttpError(409, "Conflict detected. See logs for details")
+        self._realms[name] = _Realm(name)
+        return 201, None, {"Location": f"/admin/realms/{name}"}
+
+    def _h_realm_get(self, params, query, body):
+        r = self._realm(params)
+        return 200, _realm_rep(r.name, self.admin_events, self.login_events), {}
+
+    def _h_admin_events(self, params, query, body):
+        return 200, _page(_events_since(self._realm(params).admin_events, query), query), {}
+
+    def _h_login_events(self, params, query, body):
+        return 200, _page(_events_since(self._realm(params).login_events, query), query), {}
+
+    def _h_partial_import(self, params, query, body):
+        r = self._realm(params)
+        body = body or {}
+        overwrite = body.get("ifResourceExists", "FAIL") == "OVERWRITE"
+        added = skipped = overwritten = 0
+
+        def outcome(exists: bool) -> bool:
+            nonlocal added, skipped, overwritten
+            if not exists:
+                added += 1
+                return True
+            if overwrite:
+                overwritten += 1
+                return True
+            if body.get("ifResourceExists", "FAIL") == "FAIL":
+                raise _HttpError(409, "resource already exists")
+            skipped += 1
+            return False
+
+        for u in body.get("users", []):
+            un = u.get("username", "").lower()
+            if outcome(un in r.usernames):
+                self._put_user(r, dict(u, username=un), r.usernames.get(un))
+        for role in body.get("roles", {}).get("realm", []):
+            if outcome(role["name"] in r.roles):
+                r.roles[role["name"]] = dict(role, id=r.roles.get(role["name"], {}).get("id") or _new_id())
+        for c in body.get("clients", []):
+            if outcome(c["clientId"] in r.client_ids):
+                self._put_client(r, c, r.client_ids.get(c["clientId"]))
+        for client_id, roles in body.get("roles", {}).get("client", {}).items():
+            internal_id = r.client_ids.get(client_id)
+            if internal_id is None:
+                raise _HttpError(400, f"client {client_id} not found")
+            existing = r.client_roles.setdefault(internal_id, {})
+            for role in roles:
+                if outcome(role["name"] in existing):
+                    existing[role["name"]] = dict(
+                        role, id=existing.get(role["name"], {}).get("id") or _new_id(), clientRole=True, containerId=internal_id
+                    )
+        return 200, {"added": added, "skipped": skipped, "overwritten": overwritten, "results": []}, {}
+
+    # -- users ---------------------------------------------------------------------
+
+    def _put_user(self, r: _Realm, rep: dict, user_id: Optional[str] = None) -> str:
+        user_id = user_id or _new_id()
+        rep = dict(rep, id=user_id, createdTimestamp=int(time.time() * 1000))
+        rep.setdefault("enabled", True)
+        r.users[user_id] = rep
+        r.usernames[rep["username"]] = user_id
+        return user_id
+
+    def _user(self, r: _Realm, user_id: str) -> dict:
+        u = r.users.get(user_id)
+        if u is None:
+            raise _HttpError(404, "User not found")
+        return u
+
+    def _h_users_count(self, params, query, body):
+        return 200, len(self._filter_users(self._realm(params), query)), {}
+
+    def _filter_users(self, r: _Realm, query: dict) -> list[dict]:
+        exact = _bool_param(query, "exact")
+        users = list(r.users.values())
+        for key in ("username", "email", "firstName", "lastName"):
+            if key in query:
+                want = query[key].lower()
+                if exact:
+                    users = [u for u in users if str(u.get(key, "")).lower() == want]
+                else:
+                    users = [u for u in users if want in str(u.get(key, "")).lower()]
+        if "search" in query:
+            want = query["search"].strip("*").lower()
+            users = [
+                u
+                for u in users
+                if any(want in str(u.get(k, "")).lower() for k in ("username", "email", "firstName", "lastName"))
+            ]
+        if "enabled" in query:
+            want_enabled = _bool_param(query, "enabled")
+            users = [u for u in users if bool(u.get("enabled", True)) == want_enabled]
+        if "q" in query:
+            for pair in query["q"].split():
+                k, _, v = pair.partition(":")
+                users = [u for u in users if v in (u.get("attributes") or {}).get(k, [])]
+        return users
+
+    def _h_users_list(self, params, query, body):
+        users = _page(self._filter_users(self._realm(params), query), query)
+        if _bool_param(query, "briefRepresentation"):
+            keep = ("id", "username", "email", "emailVerified", "firstName", "lastName", "enabled", "createdTimestamp")
+            users = [{k: u[k] for k in keep if k in u} for u in users]
+        return 200, users, {}
+
+    def _h_user_create(self, params, query, body):
+        r = self._realm(params)
+        un = (body or {}).get("username", "").lower()
+        if not un:
+            raise _HttpError(400, "username is required")
+        if un in r.usernames:
+            raise _HttpError(409, "User exists with same username")
+        # like Keycloak, credentials are stored apart and never returned
+        rep = {k: v for k, v in body.items() if k != "credentials"}
+        user_id = self._put_user(r, dict(rep, username=un))
+        return 201, None, {"Location": f"/admin/realms/{r.name}/users/{user_id}"}
+
+    def _h_user_get(self, params, query, body):
+        return 200, self._user(self._realm(params), params["id"]), {}
+
+    def _h_user_update(self, params, query, body):
+        r = self._realm(params)
+        u = self._user(r, params["id"])
+        u.update({k: v for k, v in (body or {}).items() if k not in ("id", "username")})
+        return 204, None, {}
+
+    def _h_user_delete(self, params, query, body):
+        r = self._realm(params)
+        u = self._user(r, params["id"])
+        del r.users[u["id"]]
+        r.usernames.pop(u["username"], None)
+        for members in r.group_members.values():
+            members.discard(u["id"])
+        return 204, None, {}
+
+    def _h_user_reset_password(self, params, query, body):
+        self._user(self._realm(params), params["id"])
+        return 204, None, {}
+
+    def _h_user_realm_roles(self, params, query, body):
+        r = self._realm(params)
+        names = r.user_realm_roles.get(self._user(r, params["id"])["id"], set())
+        return 200, [r.roles[n] for n in sorted(names) if n in r.roles], {}
+
+    def _h_user_realm_roles_add(self, params, query, body):
+        r = self._realm(params)
+        names = r.user_realm_roles.setdefault(self._user(r, params["id"])["id"], set())
+        for role in body or []:
+            if role.get("name") not in r.roles:
+                raise _HttpError(404, "Role not found")
+            names.add(role["name"])
+        return 204, None, {}
+
+    def _h_user_realm_roles_remove(self, params, query, body):
+        r = self._realm(params)
+        names = r.user_realm_roles.setdefault(self._user(r, params["id"])["id"], set())
+        for role in body or []:
+            names.discard(role.get("name"))
+        return 204, None, {}
+
+    def _h_user_client_roles(self, params, query, body):
+        r = self._realm(params)
+        key = (self._user(r, params["id"])["id"], params["client"])
+        roles = r.client_roles.get(params["client"], {})
+        return 200, [roles[n] for n in sorted(r.user_client_roles.get(key, set())) if n in roles], {}
+
+    def _h_user_client_roles_add(self, params, query, body):
+        r = self._realm(params)
+        key = (self._user(r, params["id"])["id"], self._client(r, params["client"])["id"])
+        roles = r.client_roles.get(key[1], {})
+        names = r.user_client_roles.setdefault(key, set())
+        for role in body or []:
+            if role.get("name") not in roles:
+                raise _HttpError(404, "Role not found")
+            names.add(role["name"])
+        return 204, None, {}
+
+    def _h_user_client_roles_remove(self, params, query, body):
+        r = self._realm(params)
+        key = (self._user(r, params["id"])["id"], params["client"])
+        names = r.user_client_roles.setdefault(key, set())
+        for role in body or []:
+            names.discard(role.get("name"))
+        return 204, None, {}
+
+    # -- realm roles ---------------------------------------------------------------------
+
+    def _h_roles_list(self, params, query, body):
+        roles = list(self._realm(params).roles.values())
+        if "search" in query:
+            roles = [x for x in roles if query["search"].lower() in x["name"].lower()]
+        return 200, _page(roles, query, default_max=-1), {}
+
+    def _h_role_create(self, params, query, body):
+        r = self._realm(params)
+        name = (body or {}).get("name", "")
+        if name in r.roles:
+            raise _HttpError(409, f"Role with name {name} already exists")
+        r.roles[name] = dict(body, id=_new_id(), composite=False, clientRole=False)
+        return 201, None, {"Location": f"/admin/realms/{r.name}/roles/{name}"}
+
+    def _role(self, r: _Realm, name: str) -> dict:
+        role = r.roles.get(name)
+        if role is None:
+            raise _HttpError(404, "Could not find role")
+        return role
+
+    def _h_role_get(self, params, query, body):
+        return 200, self._role(self._realm(params), params["name"]), {}
+
+    def _h_role_update(self, params, query, body):
+        r = self._realm(params)
+        role = self._role(r, params["name"])
+        new = dict(role, **{k: v for k, v in (body or {}).items() if k != "id"})
+        del r.roles[params["name"]]
+        r.roles[new["name"]] = new
+        return 204, None, {}
+
+    def _h_role_delete(self, params, query, body):
+        r = self._realm(params)
+        self._role(r, params["name"])
+        del r.roles[params["name"]]
+        return 204, None, {}
+
+    # -- clients ------------------------------------------------------------------------
+
+    def _put_client(self, r: _Realm, rep: dict, client_id: Optional[str] = None) -> str:
+        client_id = client_id or _new_id()
+        full = {
+            "id": client_id,
+            "enabled": True,
+            "publicClient": False,
+            "protocol": "openid-connect",
+            "redirectUris": [],
+            "webOrigins": [],
+            "attributes": {},
+            "protocolMappers": [],
+        }
+        full.update(rep)
+        full["id"] = client_id
+        r.clients[client_id] = full
+        r.client_ids[full["clientId"]] = client_id
+        r.client_roles.setdefault(client_id, {})
+        return client_id
+
+    def _client(self, r: _Realm, client_id: str) -> dict:
+        c = r.clients.get(client_id)
+        if c is None:
+            raise _HttpError(404, "Could not find client")
+        return c
+
+    def _h_clients_list(self, params, query, body):
+        r = self._realm(params)
+        if "clientId" in query:
+            cid = r.client_ids.get(query["clientId"])
+            return 200, [r.clients[cid]] if cid else [], {}
+        clients = list(r.clients.values())
+        if "search" in query:
+            clients = [c for c in clients if query["search"].lower() in c["clientId"].lower()]
+        return 200, _page(clients, query, default_max=-1), {}
+
+    def _h_client_create(self, params, query, body):
+        r = self._realm(params)
+        cid = (body or {}).get("clientId", "")
+        if not cid:
+            raise _HttpError(400, "clientId is required")
+        if cid in r.client_ids:
+            raise _HttpError(409, f"Client {cid} already exists")
+        client_id = self._put_client(r, body)
+        return 201, None, {"Location": f"/admin/realms/{r.name}/clients/{client_id}"}
+
+    def _h_client_get(self, params, query, body):
+        return 200, self._client(self._realm(params), params["id"]), {}
+
+    def _h_client_update(self, params, query, body):
+        r = self._realm(params)
+        c = self._client(r, params["id"])
+        old_cid = c["clientId"]
+        c.update({k: v for k, v in (body or {}).items() if k != "id"})
+        if c["clientId"] != old_cid:
+            r.client_ids.pop(old_cid, None)
+            r.client_ids[c["clientId"]] = c["id"]
+        return 204, None, {}
+
+    def _h_client_delete(self, params, query, body):
+        r = self._realm(params)
+        c = self._client(r, params["id"])
+        del r.clients[c["id"]]
+        r.client_ids.pop(c["clientId"], None)
+        r.client_roles.pop(c["id"], None)
+        return 204, None, {}
+
+    def _h_client_roles_list(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        return 200, _page(list(r.client_roles[params["id"]].values()), query, default_max=-1), {}
+
+    def _h_client_role_create(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        roles = r.client_roles[params["id"]]
+        name = (body or {}).get("name", "")
+        if name in roles:
+            raise _HttpError(409, f"Role with name {name} already exists")
+        roles[name] = dict(body, id=_new_id(), composite=False, clientRole=True, containerId=params["id"])
+        return 201, None, {}
+
+    def _h_client_role_get(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        role = r.client_roles[params["id"]].get(params["name"])
+        if role is None:
+            raise _HttpError(404, "Could not find role")
+        return 200, role, {}
+
+    def _h_client_role_delete(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        if r.client_roles[params["id"]].pop(params["name"], None) is None:
+            raise _HttpError(404, "Could not find role")
+        return 204, None, {}
+
+    def _scope_kind(self, params: dict) -> str:
+        if params["kind"] not in ("default", "optional"):
+            raise _HttpError(404, "HTTP 404 Not Found")
+        return params["kind"]
+
+    def _h_client_scope_links(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        ids = r.client_scope_links.get((params["id"], self._scope_kind(params)), set())
+        return 200, [{"id": i, "name": r.scopes[i]["name"]} for i in sorted(ids) if i in r.scopes], {}
+
+    def _h_client_scope_link(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        if params["scope"] not in r.scopes:
+            raise _HttpError(404, "Client scope not found")
+        links = r.client_scope_links.setdefault((params["id"], self._scope_kind(params)), set())
+        if params["scope"] in links:
+            raise _HttpError(409, "Client scope already assigned")
+        links.add(params["scope"])
+        return 204, None, {}
+
+    def _h_client_scope_unlink(self, params, query, body):
+        r = self._realm(params)
+        self._client(r, params["id"])
+        links = r.client_scope_links.setdefault((params["id"], self._scope_kind(params)), set())
+        if params["scope"] not in links:
+            raise _HttpError(404, "Client scope not assigned")
+        links.discard(params["scope"])
+        return 204, None, {}
+
+    # -- client scopes -----------------------------------------------------------------------
+
+    def _h_scopes_list(self, params, query, body):
+        return 200, list(self._realm(params).scopes.values()), {}
+
+    # -- groups --------------------------------------------------------------------
+
+    def _group(self, r: _Realm, group_id: str) -> dict:
+        g = r.groups.get(group_id)
+        if g is None:
+            raise _HttpError(404, "Could not find group by id")
+        return g
+
+    def _group_rep(self, r: _Realm, g: dict) -> dict:
+        # like Keycloak 23+: subGroupCount instead of inline subGroups
+        count = sum(1 for c in r.groups.values() if c["parentId"] == g["id"])
+        rep = {k: v for k, v in g.items() if k != "parentId"}
+        if g["parentId"]:
+            rep["parentId"] = g["parentId"]
+        return dict(rep, subGroupCount=count, subGroups=[])
+
+    def _children(self, r: _Realm, parent_id: Optional[str]) -> list[dict]:
+        return sorted((g for g in r.groups.values() if g["parentId"] == parent_id), key=lambda g: g["name"])
+
+    def _add_group(self, r: _Realm, parent: Optional[dict], body: Optional[dict]) -> tuple:
+        name = (body or {}).get("name", "")
+        if not name:
+            raise _HttpError(400, "name is required")
+        parent_id = parent["id"] if parent else None
+        if any(g["name"] == name for g in self._children(r, parent_id)):
+            raise _HttpError(409, f"Top level group named '{name}' already exists.")
+        group_id = _new_id()
+        path = f"{parent['path'] if parent else ''}/{name}"
+        r.groups[group_id] = {
+            "id": group_id,
+            "name": name,
+            "path": path,
+            "parentId": parent_id,
+            "attributes": (body or {}).get("attributes", {}),
+        }
+        r.group_members[group_id] = set()
+        return 201, None, {"Location": f"/admin/realms/{r.name}/groups/{group_id}"}
+
+    def _h_groups_count(self, params, query, body):
+        r = self._realm(params)
+        if _bool_param(query, "top"):
+            return 200, {"count": len(self._children(r, None))}, {}
+        return 200, {"count": len(r.groups)}, {}
+
+    def _h_groups_list(self, params, query, body):
+        r = self._realm(params)
+        groups = self._children(r, None)
+        if query.get("search"):
+            groups = [g for g in groups if query["search"].lower() in g["name"].lower()]
+        return 200, [self._group_rep(r, g) for g in _page(groups, query)], {}
+
+    def _h_group_create(self, params, query, body):
+        return self._add_group(self._realm(params), None, body)
+
+    def _h_group_by_path(self, params, query, body):
+        r = self._realm(params)
+        path = "/" + params["path"].strip("/")
+        for g in r.groups.values():
+            if g["path"] == path:
+                return 200, self._group_rep(r, g), {}
+        raise _HttpError(404, "Group path does not exist")
+
+    def _h_group_get(self, params, query, body):
+        r = self._realm(params)
+        return 200, self._group_rep(r, self._group(r, params["id"])), {}
+
+    def _h_group_update(self, params, query, body):
+        r = self._realm(params)
+        g = self._group(r, params["id"])
+        body = body or {}
+        if "attributes" in body:
+            g["attributes"] = body["attributes"]
+        name = body.get("name") or g["name"]
+        if name != g["name"]:
+            if any(c["name"] == name for c in self._children(r, g["parentId"])):
+                raise _HttpError(409, "Sibling group named '%s' already exists." % name)
+            old = g["path"]
+            new = old.rsplit("/", 1)[0] + "/" + name
+            g["name"] = name
+            for c in r.groups.values():
+                if c["path"] == old or c["path"].startswith(old + "/"):
+                    c["path"] = new + c["path"][len(old):]
+        return 204, None, {}
+
+    def _h_group_delete(self, params, query, body):
+        r = self._realm(params)
+        g = self._group(r, params["id"])
+        for c in [c for c in r.groups.values() if c["path"] == g["path"] or c["path"].startswith(g["path"] + "/")]:
+            del r.groups[c["id"]]
+            r.group_members.pop(c["id"], None)
+        return 204, None, {}
+
+    def _h_group_children(self, params, query, body):
+        r = self._realm(params)
+        self._group(r, params["id"])
+        return 200, [self._group_rep(r, g) for g in _page(self._children(r, params["id"]), query)], {}
+
+    def _h_group_child_create(self, params, query, body):
+        r = self._realm(params)
+        return self._add_group(r, self._group(r, params["id"]), body)
+
+    def _h_group_members(self, params, query, body):
+        r = self._realm(params)
+        self._group(r, params["id"])
+        members = sorted((r.users[u] for u in r.group_members[params["id"]] if u in r.users), key=lambda u: u["username"])
+        users = _page(members, query)
+        if _bool_param(query, "briefRepresentation"):
+            keep = ("id", "username", "email", "emailVerified", "firstName", "lastName", "enabled")
+            users = [{k: u[k] for k in keep if k in u} for u in users]
+        return 200, users, {}
+
+    def _h_user_groups(self, params, query, body):
+        r = self._realm(params)
+        u = self._user(r, params["id"])
+        groups = [g for gid, g in r.groups.items() if u["id"] in r.group_members.get(gid, ())]
+        return 200, [self._group_rep(r, g) for g in _page(sorted(groups, key=lambda g: g["path"]), query)], {}
+
+    def _h_user_group_join(self, params, query, body):
+        r = self._realm(params)
+        u = self._user(r, params["id"])
+        self._group(r, params["group"])
+        r.group_members[params["group"]].add(u["id"])
+        return 204, None, {}
+
+    def _h_user_group_leave(self, params, query, body):
+        r = self._realm(params)
+        u = self._user(r, params["id"])
+        self._group(r, params["group"])
+        r.group_members[params["group"]].discard(u["id"])
+        return 204, None, {}
+
+    def _h_scope_create(self, params, query, body):
+        r = self._realm(params)
+        name = (body or {}).get("name", "")
+        if any(s["name"] == name for s in r.scopes.values()):
+            raise _HttpError(409, f"Client Scope {name} already exists")
+        scope_id = _new_id()
+        r.scopes[scope_id] = dict(body, id=scope_id, attributes={}, protocolMappers=[])
+        return 201, None, {"Location": f"/admin/realms/{r.name}/client-scopes/{scope_id}"}
+
+    def _scope(self, r: _Realm, scope_id: str) -> dict:
+        s = r.scopes.get(scope_id)
+        if s is None:
+            raise _HttpError(404, "Could not find client scope")
+        return s
+
+    def _h_scope_get(self, params, query, body):
+        return 200, self._scope(self._realm(params), params["id"]), {}
+
+    def _h_scope_update(self, params, query, body):
+        s = self._scope(self._realm(params), params["id"])
+        s.update({k: v for k, v in (body or {}).items() if k != "id"})
+        return 204, None, {}
+
+    def _h_scope_delete(self, params, query, body):
+        r = self._realm(params)
+        self._scope(r, params["id"])
+        del r.scopes[params["id"]]
+        return 204, None, {}
+
+
+_COMPRESS_MIN_BYTES = 1024
+
+
+def _pick_encoding(accept_encoding: str) -> str:
+    offered = {part.split(";", 1)[0].strip().lower() for part in accept_encoding.split(",")}
+    if "br" in offered and _brotli() is not None:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return ""
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(data, quality=4)
+    return gzip.compress(data, compresslevel=6)
+
+
+_H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+
+def _handler_for(kc: FakeKeycloak) -> Callable[..., BaseHTTPRequestHandler]:
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes; without this every response
+        # waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def handle(self) -> None:
+            with kc._lock:
+                kc._connections += 1
+            try:
+                head = self.request.recv(len(_H2_PREFACE), socket.MSG_PEEK | socket.MSG_WAITALL)
+            except OSError:
+                return
+            if head == _H2_PREFACE:
+                _H2Connection(kc, self.request).serve()
+                return
+            super().handle()
+
+        def _serve(self) -> None:
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n) if n else b""
+            status, headers, data = kc.respond(
+                self.command,
+                self.path,
+                body,
+                self.headers.get("Content-Type", ""),
+                self.headers.get("Accept-Encoding", ""),
+            )
+            self.send_response(status)
+            for k, v in headers:
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+    return _Handler
+
+
+class _H2Connection:
+    """One h2c (prior knowledge) connection. Each stream is answered on its own
+    thread, so concurrent requests on the connection overlap like they would on
+    separate HTTP/1.1 connections."""
+
+    def __init__(self, kc: FakeKeycloak, sock: socket.socket):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+
+        self.kc = kc
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.conn = H2Connection(H2Configuration(client_side=False, header_encoding="utf-8"))
+        # stream id -> (headers, body) while the request is arriving
+        self.requests: dict[int, tuple[dict, bytearray]] = {}
+        # stream id -> response body still waiting for flow-control window
+        self.outgoing: dict[int, memoryview] = {}
+
+    def serve(self) -> None:
+        import h2.events as ev
+
+        with self.lock:
+            self.conn.initiate_connection()
+            self._flush()
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            with self.lock:
+                events = self.conn.receive_data(data)
+                for e in events:
+                    if isinstance(e, ev.RequestReceived):
+                        self.requests[e.stream_id] = (dict(e.headers), bytearray())
+                    elif isinstance(e, ev.DataReceived):
+                        self.requests[e.stream_id][1].extend(e.data)
+                        self.conn.acknowledge_received_data(e.flow_controlled_length, e.stream_id)
+                    elif isinstance(e, ev.StreamEnded):
+                        headers, body = self.requests.pop(e.stream_id)
+                        threading.Thread(target=self._answer, args=(e.stream_id, headers, bytes(body)), daemon=True).start()
+                    elif isinstance(e, ev.StreamReset):
+                        self.requests.pop(e.stream_id, None)
+                        self.outgoing.pop(e.stream_id, None)
+                    elif isinstance(e, ev.ConnectionTerminated):
+                        self._flush()
+                        return
+                self._pump()
+                self._flush()
+
+    def _answer(self, stream_id: int, headers: dict, body: bytes) -> None:
+        status, out_headers, data = self.kc.respond(
+            headers.get(":method", "GET"),
+            headers.get(":path", "/"),
+            body,
+            headers.get("content-type", ""),
+            headers.get("accept-encoding", ""),
+        )
+        response = [(":status", str(status)), *((k.lower(), v) for k, v in out_headers)]
+        response.append(("content-length", str(len(data))))
+        with self.lock:
+            try:
+                self.conn.send_headers(stream_id, response, end_stream=not data)
+            except Exception:
+                return  # reset or connection gone
+            if data:
+                self.outgoing[stream_id] = memoryview(data)
+                self._pump()
+            self._flush()
+
+    def _pump(self) -> None:
+        # send what the flow-control windows allow; the rest waits for WINDOW_UPDATE
+        for stream_id in list(self.outgoing):
+            buf = self.outgoing[stream_id]
+            try:
+                while buf:
+                    n = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size, len(buf))
+                    if n <= 0:
+                        break
+                    self.conn.send_data(stream_id, buf[:n].tobytes())
+                    buf = buf[n:]
+                if buf:
+                    self.outgoing[stream_id] = buf
+                    continue
+                self.conn.end_stream(stream_id)
+            except Exception:
+                pass  # stream was reset meanwhile
+            del self.outgoing[stream_id]
+
+    def _flush(self) -> None:
+        data = self.conn.data_to_send()
+        if data:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                pass
@@ -1,21 +1,42 @@
-import json
 import shlex
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable
 
 import typer
-import yaml
+from typer.core import TyperGroup
 
-from kc.core.runtime import Runtime
+from kc.core import idcache, trace
+from kc.core.batch import BatchCommand, BatchResult, batch_command, read_command_file, run_graph
+from kc.core.box import print_box
+from kc.core.config import use_config
+from kc.core.journal import Journal, journal_path
+from kc.core.runtime import ClusterRun, Runtime
 from kc.commands.realms import realms_app
 from kc.commands.roles import roles_app
 from kc.commands.client_roles import client_roles_app
 from kc.commands.users import users_app
+from kc.commands.groups import groups_app
 from kc.commands.clients import clients_app
 from kc.commands.client_scopes import client_scopes_app
+from kc.commands.index import find_app, index_app
+from kc.commands.events import events_app
+from kc.commands.seed import seed
 
-app = typer.Typer(add_completion=False, help="Keycloak CLI")
+
+
+class _KcGroup(TyperGroup):
+    def invoke(self, ctx):
+        # Keep the subcommand and its arguments: the root callback needs them to run the
+        # command once per cluster when several config profiles are selected.
+        ctx.meta["kc.subcommand_args"] = [*ctx._protected_args, *ctx.args]
+        return super().invoke(ctx)
+
+
+app = typer.Typer(cls=_KcGroup, add_completion=False, help="Keycloak CLI")
 
 
 def _init_runtime(
@@ -24,8 +45,30 @@ def _init_runtime(
     realm: str = typer.Option("", "--realm", help="target realm"),
     log_file: str = typer.Option("kc.log", "--log-file", help="path to the log file"),
     jira: str = typer.Option("", "--jira", help="Jira ticket identifier for display in command output"),
+    stats: bool = typer.Option(False, "--stats", help="print per-endpoint HTTP request counts and latency percentiles at the end"),
+    trace_file: str = typer.Option("", "--trace-file", help="write a Chrome/Perfetto trace of the run to this JSON file"),
+    profile_dir: str = typer.Option("", "--profile-dir", help="directory for --profile/--trace-malloc output (default: current directory)"),
+    profiles: str = typer.Option("", "--profiles", help="comma-separated config profiles (clusters) to run against, e.g. eu,us"),
+    all_profiles: bool = typer.Option(False, "--all-profiles", help="run against every profile in config.json"),
+    async_engine: bool = typer.Option(False, "--async", help="run bulk commands on the asyncio engine instead of worker threads"),
+    concurrency: int = typer.Option(32, "--concurrency", min=1, help="with --async, the most requests in flight at once"),
+    id_cache: str = typer.Option(idcache.DEFAULT_PATH, "--id-cache", help="file that keeps name-to-id lookups between runs"),
+    no_id_cache: bool = typer.Option(False, "--no-id-cache", help="resolve every name again instead of using the id cache"),
 ):
-    rt = Runtime(config_path=config, default_realm=realm, log_file=log_file, jira_ticket=jira)
+    rt = Runtime(
+        config_path=config,
+        default_realm=realm,
+        log_file=log_file,
+        jira_ticket=jira,
+        stats=stats,
+        trace_file=trace_file,
+        profile_dir=profile_dir,
+        profile_names=profiles,
+        all_profiles=all_profiles,
+        async_engine=async_engine,
+        concurrency=concurrency,
+        id_cache="" if no_id_cache else id_cache,
+    )
     rt.start()
     ctx.obj = rt
 
@@ -39,25 +82,79 @@ def main_callback(
     jira: str = typer.Option("", "--jira", help="Jira ticket identifier for display in command output"),
     cmd_file: str = typer.Option("", "--cmd-file", help="path to a text file with one CLI command per line"),
     continue_on_error: bool = typer.Option(False, "--continue-on-error", help="when using --cmd-file, continue processing even if a command fails"),
+    parallel: int = typer.Option(1, "--parallel", min=1, help="when using --cmd-file, run up to N commands at once as a dependency graph"),
+    resume: bool = typer.Option(False, "--resume", help="when using --cmd-file, skip commands its journal records as finished"),
+    stats: bool = typer.Option(False, "--stats", help="print per-endpoint HTTP request counts and latency percentiles at the end"),
+    trace_file: str = typer.Option("", "--trace-file", help="write a Chrome/Perfetto trace of the run to this JSON file"),
+    profile: bool = typer.Option(False, "--profile", help="write cProfile stats (.pstats) of the run"),
+    trace_malloc: bool = typer.Option(False, "--trace-malloc", help="write peak memory and top allocation sites (tracemalloc) of the run"),
+    profile_dir: str = typer.Option("", "--profile-dir", help="directory for --profile/--trace-malloc output (default: current directory)"),
+    profiles: str = typer.Option("", "--profiles", help="comma-separated config profiles (clusters) to run against, e.g. eu,us"),
+    all_profiles: bool = typer.Option(False, "--all-profiles", help="run against every profile in config.json"),
+    async_engine: bool = typer.Option(False, "--async", help="run bulk commands on the asyncio engine instead of worker threads"),
+    concurrency: int = typer.Option(32, "--concurrency", min=1, help="with --async, the most requests in flight at once"),
+    id_cache: str = typer.Option(idcache.DEFAULT_PATH, "--id-cache", help="file that keeps name-to-id lookups between runs"),
+    no_id_cache: bool = typer.Option(False, "--no-id-cache", help="resolve every name again instead of using the id cache"),
 ):
-    _init_runtime(ctx, config=config, realm=realm, log_file=log_file, jira=jira)
+    # --profile/--trace-malloc are started in main(), before typer parses anything.
+    _init_runtime(
+        ctx,
+        config=config,
+        realm=realm,
+        log_file=log_file,
+        jira=jira,
+        stats=stats,
+        trace_file=trace_file,
+        profile_dir=profile_dir,
+        profiles=profiles,
+        all_profiles=all_profiles,
+        async_engine=async_engine,
+        concurrency=concurrency,
+        id_cache=id_cache,
+        no_id_cache=no_id_cache,
+    )
 
     if cmd_file:
         _run_cmd_file(
             cmd_file=cmd_file,
-            base_flags={"config": config, "realm": realm, "log_file": log_file, "jira": jira},
+            base_flags={
+                "config": config,
+                "realm": realm,
+                "log_file": log_file,
+                "jira": jira,
+                "stats": stats,
+                "trace_file": trace_file,
+                "profile": profile,
+                "trace_malloc": trace_malloc,
+                "profile_dir": profile_dir,
+                "profiles": profiles,
+                "all_profiles": all_profiles,
+                "async_engine": async_engine,
+                "concurrency": concurrency,
+                "id_cache": id_cache,
+                "no_id_cache": no_id_cache,
+            },
             continue_on_error=continue_on_error,
+            parallel=parallel,
+            resume=resume,
         )
         raise typer.Exit()
 
+    rt = ctx.obj
+    if ctx.invoked_subcommand is not None and len(rt.profiles) > 1:
+        _run_on_clusters(ctx, rt, ctx.meta["kc.subcommand_args"])
+        raise typer.Exit()
+
     if ctx.invoked_subcommand is None:
         typer.echo("Keycloak CLI\n")
         typer.echo(ctx.get_help())
 
 
 def main() -> None:
-    from kc.core.runtime import CURRENT_RUNTIME
+    from kc.core import profiling, runtime
 
+    flags = profiling.global_flags(sys.argv[1:])
+    profiling.start(profile="--profile" in flags, trace_malloc="--trace-malloc" in flags)
     if getattr(sys, "frozen", False):
         try:
             Path("kc_exe_debug.txt").write_text("started\n", encoding="utf-8")
@@ -65,16 +162,64 @@ def main() -> None:
             pass
     try:
         app()
-        rt = CURRENT_RUNTIME
+        rt = runtime.CURRENT_RUNTIME
         if rt is not None:
             rt.finish_ok()
+    except SystemExit as e:
+        # Typer ends every run with SystemExit, including runs where a command raised
+        # (it reports the error itself); the original exception is kept as the context.
+        rt = runtime.CURRENT_RUNTIME
+        if rt is not None:
+            if e.code in (0, None):
+                rt.finish_ok()
+            elif isinstance(e.__context__, Exception) and not isinstance(e.__context__, typer.Exit):
+                rt.finish_error(e.__context__)
+            else:
+                rt.finish_error(RuntimeError(f"exit status {e.code}"))
+        raise
     except Exception as e:
-        rt = CURRENT_RUNTIME
+        rt = runtime.CURRENT_RUNTIME
         if rt is not None:
             rt.finish_error(e)
         raise
 
 
+def _run_on_clusters(ctx: typer.Context, rt: Runtime, args: list[str]) -> None:
+    """Run the invoked subcommand once per selected profile, all clusters concurrently."""
+    cmd_name, cmd, rest = ctx.command.resolve_command(ctx, list(args))
+
+    # Parse up front, in this thread, so a usage error is reported once and nothing runs.
+    runs: list[tuple[ClusterRun, typer.Context]] = []
+    for cfg in rt.profiles:
+        run = rt.cluster_run(cfg)
+        runs.append((run, cmd.make_context(cmd_name, list(rest), parent=ctx, obj=run)))
+
+    def run_one(item: tuple[ClusterRun, typer.Context]) -> None:
+        run, sub_ctx = item
+        with use_config(run.config), trace.span("cluster", profile=run.name):
+            try:
+                with sub_ctx:
+                    sub_ctx.command.invoke(sub_ctx)
+            except typer.Exit as e:
+                if e.exit_code:
+                    run.finish_error(RuntimeError(f"exit status {e.exit_code}"))
+            except Exception as e:
+                run.finish_error(e)
+                sys.stderr.write(f"[{run.name}] Error: {e}\n")
+            if not run.status:
+                run.finish_ok()
+
+    with ThreadPoolExecutor(max_workers=len(runs), thread_name_prefix="cluster") as ex:
+        list(ex.map(run_one, runs))
+
+    failed = [run for run in rt.clusters if run.status == "error"]
+    lines = [f"{run.name}: {run.status}" + (f" ({run.error})" if run.error else "") for run in rt.clusters]
+    lines.append(f"Total: {len(rt.clusters)} cluster(s), {len(failed)} failed")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label="", title="Clusters")
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(rt.clusters)} cluster(s) failed: {', '.join(r.name for r in failed)}")
+
+
 def _cmd_file_argv0() -> list[str]:
     """Return the executable + args to re-invoke this CLI (for --cmd-file subprocesses)."""
     if getattr(sys, "frozen", False):
@@ -85,7 +230,9 @@ def _cmd_file_argv0() -> list[str]:
     return [sys.executable, "-m", "kc"]
 
 
-def _run_cmd_file(cmd_file: str, base_flags: dict, continue_on_error: bool) -> None:
+def _run_cmd_file(
+    cmd_file: str, base_flags: dict, continue_on_error: bool, parallel: int = 1, resume: bool = False
+) -> None:
     path = Path(cmd_file)
     if not path.exists():
         raise RuntimeError(f"cmd file not found: {cmd_file}")
@@ -99,61 +246,147 @@ def _run_cmd_file(cmd_file: str, base_flags: dict, continue_on_error: bool) -> N
         base_parts.extend(["--log-file", base_flags["log_file"]])
     if base_flags.get("jira"):
         base_parts.extend(["--jira", base_flags["jira"]])
+    if base_flags.get("stats"):
+        base_parts.append("--stats")
+    # each line profiles itself; its files are named after its own command (kc-roles-create-...)
+    if base_flags.get("profile"):
+        base_parts.append("--profile")
+    if base_flags.get("trace_malloc"):
+        base_parts.append("--trace-malloc")
+    if base_flags.get("profile_dir"):
+        base_parts.extend(["--profile-dir", base_flags["profile_dir"]])
+    if base_flags.get("profiles"):
+        base_parts.extend(["--profiles", base_flags["profiles"]])
+    if base_flags.get("all_profiles"):
+        base_parts.append("--all-profiles")
+    if base_flags.get("async_engine"):
+        base_parts.extend(["--async", "--concurrency", str(base_flags.get("concurrency", 32))])
+    if base_flags.get("no_id_cache"):
+        base_parts.append("--no-id-cache")
+    elif base_flags.get("id_cache"):
+        base_parts.extend(["--id-cache", base_flags["id_cache"]])
+
+    # entries are parsed lazily: the first command runs while the rest of the file is still unread
+    commands = read_command_file(path)
+    batch = (c for i, entry in enumerate(commands) if (c := batch_command(i + 1, entry)) is not None)
+
+    jpath = journal_path(path)
+    if resume and not jpath.exists():
+        raise RuntimeError(f"--resume: no journal found at {jpath}")
+    journal = Journal(jpath, resume=resume)
+    try:
+        _run_batch(batch, journal, base_parts, base_flags, continue_on_error, parallel)
+    finally:
+        journal.close()
+
+
+def _line_trace_file(path: str, index: int) -> str:
+    # trace.json -> trace.line-3.json: the parent's own trace keeps the given name
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}.line-{index}{p.suffix}"))
 
-    ext = path.suffix.lower()
-    commands = []
-
-    if ext == ".json":
-        with path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                commands = data
-            elif isinstance(data, dict) and "commands" in data:
-                commands = data["commands"]
-    elif ext in [".yaml", ".yml"]:
-        with path.open("r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-            if isinstance(data, list):
-                commands = data
-            elif isinstance(data, dict) and "commands" in data:
-                commands = data["commands"]
-    else:
-        # Fallback to plain text
-        with path.open("r", encoding="utf-8") as f:
-            for raw_line in f:
-                line = raw_line.strip()
-                if line and not line.startswith("#"):
-                    commands.append(line)
 
+def _run_batch(
+    batch: Iterable[BatchCommand],
+    journal: Journal,
+    base_parts: list[str],
+    base_flags: dict,
+    continue_on_error: bool,
+    parallel: int,
+) -> None:
     argv0 = _cmd_file_argv0()
-    for cmd in commands:
-        if isinstance(cmd, dict):
-            line = cmd.get("cmd", "")
+    resumed = 0
+
+    def run_line(cmd: BatchCommand) -> BatchResult:
+        line_parts = []
+        if base_flags.get("trace_file"):
+            line_parts.extend(["--trace-file", _line_trace_file(base_flags["trace_file"], cmd.index)])
+        full_args = [*argv0, *base_parts, *line_parts, *shlex.split(cmd.line)]
+        started = time.perf_counter()
+        with trace.span("cmd-file line", cmd=cmd.line) as sp:
+            proc = subprocess.run(
+                full_args, capture_output=True, text=True, encoding="utf-8", errors="replace"
+            )
+            sp.set(exit_code=proc.returncode)
+        return BatchResult(
+            command=cmd,
+            status="ok" if proc.returncode == 0 else "failed",
+            returncode=proc.returncode,
+            stdout=proc.stdout,
+            stderr=proc.stderr,
+            seconds=time.perf_counter() - started,
+        )
+
+    def already_done(cmd: BatchCommand) -> bool:
+        # commands the journal records as finished (and unchanged) are not run again
+        nonlocal resumed
+        state = journal.check(cmd)
+        if state == "done":
+            resumed += 1
+            return True
+        if state == "changed":
+            sys.stderr.write(f"Command {cmd.label} was edited since it last ran; running it again: {cmd.line}\n")
+        return False
+
+    def show(res: BatchResult) -> None:
+        # each command's output is written in one piece, after it has finished
+        sys.stdout.write(res.stdout)
+        sys.stderr.write(res.stderr)
+        if res.status == "skipped":
+            sys.stderr.write(
+                f"Skipped command {res.command.label}: a command it depends on failed: {res.command.line}\n"
+            )
         else:
-            line = str(cmd).strip()
+            journal.record(res.command, res.status)
 
-        if not line or line.startswith("#"):
-            continue
+    if parallel <= 1:
+        try:
+            for cmd in batch:
+                if already_done(cmd):
+                    continue
+                res = run_line(cmd)
+                show(res)
+                if res.returncode != 0 and not continue_on_error:
+                    raise typer.Exit(code=res.returncode)
+        finally:
+            if resumed:
+                sys.stderr.write(f"Resumed: {resumed} command(s) already finished according to the journal.\n")
+        return
 
-        args = shlex.split(line)
-        full_args = [*argv0, *base_parts, *args]
+    failures: list[BatchResult] = []
 
-        proc = subprocess.run(
-            full_args, capture_output=True, text=True, encoding="utf-8", errors="replace"
-        )
-        sys.stdout.write(proc.stdout)
-        sys.stderr.write(proc.stderr)
+    def on_result(res: BatchResult) -> None:
+        show(res)
+        if res.status == "failed":
+            failures.append(res)
 
-        if proc.returncode != 0 and not continue_on_error:
-            raise typer.Exit(code=proc.returncode)
+    summary = run_graph(
+        batch,
+        run_line,
+        on_result,
+        parallel=parallel,
+        continue_on_error=continue_on_error,
+        default_realm=base_flags.get("realm", ""),
+        already_done=already_done,
+    )
+    if resumed:
+        summary.append(f"Resumed: {resumed} command(s) already finished according to the journal")
+    print_box(summary, jira_ticket=base_flags.get("jira", ""), realm_label="", title="Command file summary")
+    if failures and not continue_on_error:
+        raise typer.Exit(code=failures[0].returncode)
 
 
 app.add_typer(realms_app, name="realms")
 app.add_typer(roles_app, name="roles")
 app.add_typer(client_roles_app, name="client-roles")
 app.add_typer(users_app, name="users")
+app.add_typer(groups_app, name="groups")
 app.add_typer(clients_app, name="clients")
 app.add_typer(client_scopes_app, name="client-scopes")
+app.add_typer(index_app, name="index")
+app.add_typer(find_app, name="find")
+app.add_typer(events_app, name="events")
+app.command("seed")(seed)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
+from collections import Counter
+from typing import Optional
+
 import typer
 
+from kc.core import idcache, keycloak_async, trace
 from kc.core.box import print_box
-from kc.core.config import GLOBAL
+from kc.core.config import get_config
 from kc.core.keycloak import kc_request
+from kc.core.models import Client
+from kc.core.pool import run_ordered_async
 
 client_roles_app = typer.Typer(add_completion=False, help="Manage client roles")
 
@@ -28,7 +34,7 @@ def _pick(values: list[str], i: int) -> str:
 
 def _resolve_target_realms(rt, realm: str, all_realms: bool) -> list[str]:
     if all_realms:
-        realms = kc_request("GET", "/admin/realms")
+        realms = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
         out: list[str] = []
         for r in realms:
             name = r.get("realm")
@@ -36,20 +42,97 @@ def _resolve_target_realms(rt, realm: str, all_realms: bool) -> list[str]:
                 out.append(name)
         return out
 
-    r = realm or rt.default_realm or GLOBAL.realm
+    r = realm or rt.default_realm or get_config().realm
     if not r:
         raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
     return [r]
 
 
 def _get_client_internal_id(realm: str, client_id: str) -> str:
-    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id})
+    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client)
+    for c in clients:
+        if c.client_id == client_id and c.id:
+            return c.id
+    raise RuntimeError(f"client {client_id!r} not found")
+
+
+async def _get_client_internal_id_async(realm: str, client_id: str) -> str:
+    clients = await keycloak_async.kc_request(
+        "GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client
+    )
     for c in clients:
-        if c.get("clientId") == client_id and c.get("id"):
-            return c["id"]
+        if c.client_id == client_id and c.id:
+            return c.id
     raise RuntimeError(f"client {client_id!r} not found")
 
 
+def _role_names(realm: str, client_id: str, internal_id: Optional[str]) -> tuple[str, set[str]]:
+    """The client's id and the names of its roles.
+
+    This is the first request with a cached client id, and unlike a single role's
+    GET its 404 can only mean the client is gone.
+    """
+    if internal_id is None:
+        raise RuntimeError(f"client {client_id!r} not found")
+    roles = kc_request("GET", f"/admin/realms/{realm}/clients/{internal_id}/roles", fields=("name",))
+    return internal_id, {r.get("name") for r in roles}
+
+
+async def _role_names_async(realm: str, client_id: str, internal_id: Optional[str]) -> tuple[str, set[str]]:
+    if internal_id is None:
+        raise RuntimeError(f"client {client_id!r} not found")
+    roles = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/clients/{internal_id}/roles", fields=("name",))
+    return internal_id, {r.get("name") for r in roles}
+
+
+async def _create_async(rt, client_id: str, names: list[str], descs: list[str], target_realms: list[str]) -> tuple[list[str], Counter]:
+    # the client is looked up once per realm, all realms at once, before its roles fan out
+    async def lookup(r: str) -> tuple[str, set[str]]:
+        return await idcache.acached_call(
+            r,
+            "client",
+            client_id,
+            lambda: _get_client_internal_id_async(r, client_id),
+            lambda iid: _role_names_async(r, client_id, iid),
+        )
+
+    lookups = await run_ordered_async(target_realms, lookup, concurrency=rt.concurrency)
+    clients = {r: res for r, (res, err) in zip(target_realms, lookups) if err is None}
+
+    async def create_one(job: tuple[str, int, str]) -> tuple[str, str]:
+        r, i, rn = job
+        internal_id, existing = clients[r]
+        if rn in existing:
+            return "skipped", f"Client role {rn!r} already exists in client {client_id!r} (realm {r!r}). Skipped."
+        payload = {"name": rn, "description": _pick(descs, i)}
+        try:
+            await keycloak_async.kc_request("POST", f"/admin/realms/{r}/clients/{internal_id}/roles", json=payload)
+        except RuntimeError as e:
+            if "409" in str(e).lower():
+                return "skipped", f"Client role {rn!r} already exists in client {client_id!r} (realm {r!r}). Skipped."
+            raise
+        return "created", f"Created client role {rn!r} in client {client_id!r} (realm {r!r})."
+
+    jobs = [(r, i, rn) for r in target_realms if r in clients for i, rn in enumerate(names)]
+    results = await run_ordered_async(jobs, create_one, concurrency=rt.concurrency)
+
+    lines: list[str] = []
+    counts: Counter = Counter()
+    for r, (_, err) in zip(target_realms, lookups):
+        if err is not None:
+            lines.append(f"Failed in realm {r!r}: {err}")
+            counts["failed"] += len(names)
+    for (r, _, rn), (res, err) in zip(jobs, results):
+        if err is not None:
+            lines.append(f"Failed for client role {rn!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        status, line = res
+        lines.append(line)
+        counts[status] += 1
+    return lines, counts
+
+
 @client_roles_app.command("create")
 def create(
     ctx: typer.Context,
@@ -73,30 +156,47 @@ def create(
     _validate_0_1_n("--description", descs, len(names))
 
     target_realms = _resolve_target_realms(rt, realm=realm, all_realms=all_realms)
+    realm_label = "all realms" if all_realms else (realm or (target_realms[0] if len(target_realms) == 1 else ""))
+
+    if rt.async_engine:
+        lines, counts = keycloak_async.run(
+            _create_async(rt, client_id, names, descs, target_realms), concurrency=rt.concurrency
+        )
+        failed = f", Failed: {counts['failed']}" if counts["failed"] else ""
+        lines.append(f"Done. Created: {counts['created']}, Skipped: {counts['skipped']}{failed}.")
+        print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        if counts["failed"]:
+            raise RuntimeError(f"{counts['failed']} client role operation(s) failed")
+        return
 
     created = 0
     skipped = 0
     lines: list[str] = []
 
     for r in target_realms:
-        internal_id = _get_client_internal_id(r, client_id)
-        for i, rn in enumerate(names):
-            try:
-                kc_request("GET", f"/admin/realms/{r}/clients/{internal_id}/roles/{rn}")
-                lines.append(f"Client role {rn!r} already exists in client {client_id!r} (realm {r!r}). Skipped.")
-                skipped += 1
-                continue
-            except Exception as e:
-                if not _is_404(e):
-                    raise RuntimeError(f"failed checking client role in client {client_id}, realm {r}: {e}")
-
-            desc = _pick(descs, i)
-            payload = {"name": rn, "description": desc}
-            kc_request("POST", f"/admin/realms/{r}/clients/{internal_id}/roles", json=payload)
-            lines.append(f"Created client role {rn!r} in client {client_id!r} (realm {r!r}).")
-            created += 1
+        with trace.span("realm", realm=r):
+            # one listing of the client's roles instead of a GET per role
+            internal_id, existing = idcache.cached_call(
+                r, "client", client_id, lambda: _get_client_internal_id(r, client_id), lambda iid: _role_names(r, client_id, iid)
+            )
+            for i, rn in enumerate(names):
+                if rn in existing:
+                    lines.append(f"Client role {rn!r} already exists in client {client_id!r} (realm {r!r}). Skipped.")
+                    skipped += 1
+                    continue
+
+                desc = _pick(descs, i)
+                payload = {"name": rn, "description": desc}
+                try:
+                    kc_request("POST", f"/admin/realms/{r}/clients/{internal_id}/roles", json=payload)
+                except RuntimeError as e:
+                    if "409" in str(e).lower():
+                        lines.append(f"Client role {rn!r} already exists in client {client_id!r} (realm {r!r}). Skipped.")
+                        skipped += 1
+                        continue
+                    raise
+                lines.append(f"Created client role {rn!r} in client {client_id!r} (realm {r!r}).")
+                created += 1
 
     lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
-
-    realm_label = "all realms" if all_realms else (realm or (target_realms[0] if len(target_realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
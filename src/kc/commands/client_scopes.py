@@ -1,8 +1,15 @@
+from collections import Counter
+from typing import Optional
+
 import typer
 
+from kc.core import idcache, keycloak_async, trace
 from kc.core.box import print_box
-from kc.core.config import GLOBAL
+from kc.core.config import get_config
+from kc.core.counts import count_lines, realm_counts
 from kc.core.keycloak import kc_request
+from kc.core.models import ClientScope
+from kc.core.pool import run_ordered_async
 
 client_scopes_app = typer.Typer(add_completion=False, help="Manage client scopes")
 
@@ -26,7 +33,7 @@ def _pick(values: list[str], i: int) -> str:
 
 def _resolve_realms(rt, realm: str, all_realms: bool) -> list[str]:
     if all_realms:
-        rs = kc_request("GET", "/admin/realms")
+        rs = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
         out: list[str] = []
         for r in rs:
             name = r.get("realm")
@@ -34,20 +41,126 @@ def _resolve_realms(rt, realm: str, all_realms: bool) -> list[str]:
                 out.append(name)
         return out
 
-    r = realm or rt.default_realm or GLOBAL.realm
+    r = realm or rt.default_realm or get_config().realm
     if not r:
         raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
     return [r]
 
 
-def _find_by_name(realm: str, name: str) -> dict:
-    scopes = kc_request("GET", f"/admin/realms/{realm}/client-scopes")
+# Keycloak has no briefRepresentation for client scopes, so lookups build
+# ClientScope records instead of keeping every full representation.
+def _find_by_name(realm: str, name: str, model=ClientScope):
+    """Find a scope by name; pass model=None for the full representation as a dict."""
+    scopes = kc_request("GET", f"/admin/realms/{realm}/client-scopes", model=model)
+    for s in scopes:
+        if s.get("name") == name:
+            return s
+    raise RuntimeError(f"client scope {name!r} not found")
+
+
+async def _find_by_name_async(realm: str, name: str, model=ClientScope):
+    scopes = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/client-scopes", model=model)
     for s in scopes:
         if s.get("name") == name:
             return s
     raise RuntimeError(f"client scope {name!r} not found")
 
 
+def _cached_scope(realm: str, name: str) -> Optional[dict]:
+    """Full representation of the scope with this name, or None: read by its cached id, else looked up.
+
+    A scope read by a cached id must still carry the name, so one renamed
+    elsewhere is looked up again instead of being changed under its old name.
+    """
+    found: dict[str, dict] = {}
+
+    def resolve() -> Optional[str]:
+        try:
+            s = _find_by_name(realm, name, model=None)
+        except RuntimeError as e:
+            if "not found" in str(e):
+                return None
+            raise
+        found[s.get("id")] = s
+        return s.get("id")
+
+    def read(scope_id: Optional[str]) -> Optional[dict]:
+        if scope_id is None or scope_id in found:
+            return found.get(scope_id or "")
+        s = kc_request("GET", f"/admin/realms/{realm}/client-scopes/{scope_id}")
+        if s.get("name") != name:
+            raise idcache.stale("client scope", name)
+        return s
+
+    return idcache.cached_call(realm, "client-scope", name, resolve, read)
+
+
+async def _cached_scope_async(realm: str, name: str) -> Optional[dict]:
+    found: dict[str, dict] = {}
+
+    async def resolve() -> Optional[str]:
+        try:
+            s = await _find_by_name_async(realm, name, model=None)
+        except RuntimeError as e:
+            if "not found" in str(e):
+                return None
+            raise
+        found[s.get("id")] = s
+        return s.get("id")
+
+    async def read(scope_id: Optional[str]) -> Optional[dict]:
+        if scope_id is None or scope_id in found:
+            return found.get(scope_id or "")
+        s = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/client-scopes/{scope_id}")
+        if s.get("name") != name:
+            raise idcache.stale("client scope", name)
+        return s
+
+    return await idcache.acached_call(realm, "client-scope", name, resolve, read)
+
+
+def _renamed(realm: str, old: str, new: str, scope_id: str) -> None:
+    if new != old:
+        idcache.forget(realm, "client-scope", old)
+        idcache.remember(realm, "client-scope", new, scope_id)
+
+
+def _unchanged(current: dict, changes: dict) -> bool:
+    # Keycloak leaves an empty description out of the representation
+    return all((current.get(k) or "") == v for k, v in changes.items())
+
+
+def _run_async(rt, jobs: list[tuple[str, int, str]], fn) -> tuple[list[str], Counter]:
+    """Run fn(realm, index, name) for every job on the async engine.
+
+    Lines and counts come back in job order. A failing job becomes a line and is
+    counted as "failed"; the other jobs keep going.
+    """
+    results = keycloak_async.run(
+        run_ordered_async(jobs, lambda job: fn(*job), concurrency=rt.concurrency), concurrency=rt.concurrency
+    )
+    lines: list[str] = []
+    counts: Counter = Counter()
+    for (r, _, n), (res, err) in zip(jobs, results):
+        if err is not None:
+            lines.append(f"Failed for client scope {n!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        status, line = res
+        lines.append(line)
+        counts[status] += 1
+    return lines, counts
+
+
+def _finish_async(rt, lines: list[str], counts: Counter, verb: str, realm_label: str) -> None:
+    failed = f", Failed: {counts['failed']}" if counts["failed"] else ""
+    unchanged = f", Unchanged: {counts['unchanged']}" if verb == "updated" else ""
+    lines.append(f"Done. {verb.capitalize()}: {counts[verb]}{unchanged}, Skipped: {counts['skipped']}{failed}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    if counts["failed"]:
+        raise RuntimeError(f"{counts['failed']} client scope operation(s) failed")
+
+
 @client_scopes_app.command("create")
 def create(
     ctx: typer.Context,
@@ -71,37 +184,61 @@ def create(
 
     realms = _resolve_realms(rt, realm=realm, all_realms=all_realms)
 
-    created, skipped = 0, 0
-    lines: list[str] = []
-
-    for r in realms:
-        for i, n in enumerate(names):
+    if rt.async_engine:
+        async def create_one(r: str, i: int, n: str) -> tuple[str, str]:
             try:
-                _find_by_name(r, n)
-                lines.append(f"Client scope {n!r} already exists in realm {r!r}. Skipped.")
-                skipped += 1
-                continue
+                await _find_by_name_async(r, n)
+                return "skipped", f"Client scope {n!r} already exists in realm {r!r}. Skipped."
             except Exception:
                 pass
-
-            desc = _pick(descs, i)
-            proto = _pick(prots, i) or "openid-connect"
-            payload = {"name": n, "description": desc, "protocol": proto}
-
+            payload = {"name": n, "description": _pick(descs, i), "protocol": _pick(prots, i) or "openid-connect"}
             try:
-                scope_id = kc_request("POST", f"/admin/realms/{r}/client-scopes", json=payload)
+                await keycloak_async.kc_request("POST", f"/admin/realms/{r}/client-scopes", json=payload)
             except Exception as e:
                 if "409" in str(e).lower():
+                    return "skipped", f"Client scope {n!r} already exists in realm {r!r}. Skipped."
+                raise
+            s = await _find_by_name_async(r, n)
+            idcache.remember(r, "client-scope", n, s.get("id", ""))
+            return "created", f"Created client scope {n!r} (ID: {s.get('id', '')}) in realm {r!r}."
+
+        lines, counts = _run_async(rt, [(r, i, n) for r in realms for i, n in enumerate(names)], create_one)
+        _finish_async(rt, lines, counts, "created", "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else "")))
+        return
+
+    created, skipped = 0, 0
+    lines: list[str] = []
+
+    for r in realms:
+        with trace.span("realm", realm=r):
+            for i, n in enumerate(names):
+                try:
+                    _find_by_name(r, n)
                     lines.append(f"Client scope {n!r} already exists in realm {r!r}. Skipped.")
                     skipped += 1
                     continue
-                raise
-
-            # Keycloak often returns 201 with Location, so just refetch to show ID
-            s = _find_by_name(r, n)
-            sid = s.get("id", "")
-            lines.append(f"Created client scope {n!r} (ID: {sid}) in realm {r!r}.")
-            created += 1
+                except Exception:
+                    pass
+
+                desc = _pick(descs, i)
+                proto = _pick(prots, i) or "openid-connect"
+                payload = {"name": n, "description": desc, "protocol": proto}
+
+                try:
+                    scope_id = kc_request("POST", f"/admin/realms/{r}/client-scopes", json=payload)
+                except Exception as e:
+                    if "409" in str(e).lower():
+                        lines.append(f"Client scope {n!r} already exists in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise
+
+                # Keycloak often returns 201 with Location, so just refetch to show ID
+                s = _find_by_name(r, n)
+                sid = s.get("id", "")
+                idcache.remember(r, "client-scope", n, sid)
+                lines.append(f"Created client scope {n!r} (ID: {sid}) in realm {r!r}.")
+                created += 1
 
     lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
     realm_label = "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else ""))
@@ -118,6 +255,7 @@ def update(
     all_realms: bool = typer.Option(False, "--all-realms", help="update in all realms"),
     realm: str = typer.Option("", "--realm", help="target realm"),
     ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip scopes not found instead of failing"),
+    force: bool = typer.Option(False, "--force", help="send the update even when the scope already has these values"),
 ):
     rt = ctx.obj
 
@@ -137,38 +275,72 @@ def update(
 
     realms = _resolve_realms(rt, realm=realm, all_realms=all_realms)
 
-    updated, skipped = 0, 0
-    lines: list[str] = []
-
-    for r in realms:
-        for i, n in enumerate(names):
-            try:
-                s = _find_by_name(r, n)
-            except Exception:
+    def changes_for(i: int) -> dict:
+        changes: dict = {}
+        if descs:
+            changes["description"] = _pick(descs, i)
+        if prots:
+            changes["protocol"] = _pick(prots, i)
+        if new_names:
+            changes["name"] = _pick(new_names, i)
+        return changes
+
+    if rt.async_engine:
+        async def update_one(r: str, i: int, n: str) -> tuple[str, str]:
+            s = await _cached_scope_async(r, n)
+            if s is None:
                 if ignore_missing:
-                    lines.append(f"Client scope {n!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
+                    return "skipped", f"Client scope {n!r} not found in realm {r!r}. Skipped."
                 raise RuntimeError(f"client scope {n!r} not found in realm {r}")
-
             sid = s.get("id")
             if not sid:
                 raise RuntimeError(f"client scope {n!r} missing id")
+            changes = changes_for(i)
+            if not force and _unchanged(s, changes):
+                return "unchanged", f"Client scope {n!r} in realm {r!r} unchanged."
+            s.update(changes)
+            await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/client-scopes/{sid}", json=s)
+            _renamed(r, n, s.get("name", n), sid)
+            return "updated", f"Updated client scope {n!r} in realm {r!r}. New name: {s.get('name', n)!r}."
+
+        lines, counts = _run_async(rt, [(r, i, n) for r in realms for i, n in enumerate(names)], update_one)
+        _finish_async(rt, lines, counts, "updated", "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else "")))
+        return
+
+    updated, unchanged, skipped = 0, 0, 0
+    lines: list[str] = []
 
-            if descs:
-                s["description"] = _pick(descs, i)
-            if prots:
-                s["protocol"] = _pick(prots, i)
-            if new_names:
-                s["name"] = _pick(new_names, i)
+    for r in realms:
+        with trace.span("realm", realm=r):
+            for i, n in enumerate(names):
+                # full representation: it is modified and PUT back
+                s = _cached_scope(r, n)
+                if s is None:
+                    if ignore_missing:
+                        lines.append(f"Client scope {n!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"client scope {n!r} not found in realm {r}")
+
+                sid = s.get("id")
+                if not sid:
+                    raise RuntimeError(f"client scope {n!r} missing id")
+
+                changes = changes_for(i)
+                if not force and _unchanged(s, changes):
+                    lines.append(f"Client scope {n!r} in realm {r!r} unchanged.")
+                    unchanged += 1
+                    continue
+                s.update(changes)
 
-            kc_request("PUT", f"/admin/realms/{r}/client-scopes/{sid}", json=s)
+                kc_request("PUT", f"/admin/realms/{r}/client-scopes/{sid}", json=s)
+                _renamed(r, n, s.get("name", n), sid)
 
-            final_name = s.get("name", n)
-            lines.append(f"Updated client scope {n!r} in realm {r!r}. New name: {final_name!r}.")
-            updated += 1
+                final_name = s.get("name", n)
+                lines.append(f"Updated client scope {n!r} in realm {r!r}. New name: {final_name!r}.")
+                updated += 1
 
-    lines.append(f"Done. Updated: {updated}, Skipped: {skipped}.")
+    lines.append(f"Done. Updated: {updated}, Unchanged: {unchanged}, Skipped: {skipped}.")
     realm_label = "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
 
@@ -189,24 +361,41 @@ def delete(
 
     realms = _resolve_realms(rt, realm=realm, all_realms=all_realms)
 
+    if rt.async_engine:
+        async def delete_one(r: str, i: int, n: str) -> tuple[str, str]:
+            s = await _cached_scope_async(r, n)
+            if s is None:
+                if ignore_missing:
+                    return "skipped", f"Client scope {n!r} not found in realm {r!r}. Skipped."
+                raise RuntimeError(f"client scope {n!r} not found in realm {r}")
+            sid = s.get("id")
+            await keycloak_async.kc_request("DELETE", f"/admin/realms/{r}/client-scopes/{sid}")
+            idcache.forget(r, "client-scope", n)
+            return "deleted", f"Deleted client scope {n!r} (ID: {sid}) in realm {r!r}."
+
+        lines, counts = _run_async(rt, [(r, i, n) for r in realms for i, n in enumerate(names)], delete_one)
+        _finish_async(rt, lines, counts, "deleted", "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else "")))
+        return
+
     deleted, skipped = 0, 0
     lines: list[str] = []
 
     for r in realms:
-        for n in names:
-            try:
-                s = _find_by_name(r, n)
-            except Exception:
-                if ignore_missing:
-                    lines.append(f"Client scope {n!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise RuntimeError(f"client scope {n!r} not found in realm {r}")
-
-            sid = s.get("id")
-            kc_request("DELETE", f"/admin/realms/{r}/client-scopes/{sid}")
-            lines.append(f"Deleted client scope {n!r} (ID: {sid}) in realm {r!r}.")
-            deleted += 1
+        with trace.span("realm", realm=r):
+            for n in names:
+                s = _cached_scope(r, n)
+                if s is None:
+                    if ignore_missing:
+                        lines.append(f"Client scope {n!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"client scope {n!r} not found in realm {r}")
+
+                sid = s.get("id")
+                kc_request("DELETE", f"/admin/realms/{r}/client-scopes/{sid}")
+                idcache.forget(r, "client-scope", n)
+                lines.append(f"Deleted client scope {n!r} (ID: {sid}) in realm {r!r}.")
+                deleted += 1
 
     lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
     realm_label = "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else ""))
@@ -218,22 +407,35 @@ def list_scopes(
     ctx: typer.Context,
     all_realms: bool = typer.Option(False, "--all-realms", help="list in all realms"),
     realm: str = typer.Option("", "--realm", help="target realm"),
+    count: bool = typer.Option(False, "--count", help="print only the number of client scopes per realm"),
 ):
     rt = ctx.obj
 
     realms = _resolve_realms(rt, realm=realm, all_realms=all_realms)
+    realm_label = "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else ""))
+
+    if count:
+        # client scopes can be neither counted nor paged by the server; keep only the ids
+        async def acount(r: str) -> int:
+            return len(await keycloak_async.kc_request("GET", f"/admin/realms/{r}/client-scopes", fields=("id",)))
+
+        counts = realm_counts(
+            rt, realms, lambda r: len(kc_request("GET", f"/admin/realms/{r}/client-scopes", fields=("id",))), acount
+        )
+        print_box(count_lines(counts), jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        return
 
     total = 0
     lines: list[str] = []
 
     for r in realms:
-        scopes = kc_request("GET", f"/admin/realms/{r}/client-scopes")
-        for s in scopes:
-            n = s.get("name")
-            if n:
-                lines.append(n)
-                total += 1
+        with trace.span("realm", realm=r):
+            scopes = kc_request("GET", f"/admin/realms/{r}/client-scopes", model=ClientScope)
+            for s in scopes:
+                n = s.name
+                if n:
+                    lines.append(n)
+                    total += 1
 
     lines.append(f"Total: {total}")
-    realm_label = "all realms" if all_realms else (realm or (realms[0] if len(realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
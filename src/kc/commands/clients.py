@@ -1,8 +1,16 @@
+from collections import Counter
+from typing import Callable, Optional
+
 import typer
 
+from kc.core import idcache, keycloak_async, trace
 from kc.core.box import print_box
-from kc.core.config import GLOBAL
+from kc.core.config import get_config
+from kc.core.counts import acount_pages, count_lines, count_pages, realm_counts
 from kc.core.keycloak import kc_raw_request, kc_request
+from kc.core.models import Client, ClientScope
+from kc.core.pool import run_ordered_async
+from kc.core.writes import WriteBuffer
 
 clients_app = typer.Typer(add_completion=False, help="Manage clients")
 
@@ -32,7 +40,7 @@ def _parse_bool(val: str, flag: str) -> bool:
 
 def _resolve_realms(rt, realms: list[str], all_realms: bool) -> list[str]:
     if all_realms:
-        rs = kc_request("GET", "/admin/realms")
+        rs = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
         out: list[str] = []
         for r in rs:
             name = r.get("realm")
@@ -43,20 +51,154 @@ def _resolve_realms(rt, realms: list[str], all_realms: bool) -> list[str]:
     if realms:
         return list(realms)
 
-    r = rt.default_realm or GLOBAL.realm
+    r = rt.default_realm or get_config().realm
     if not r:
         raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
     return [r]
 
 
-def _get_client_by_client_id(realm: str, client_id: str) -> dict:
-    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id})
+# Keycloak has no briefRepresentation for clients; a Client record keeps what
+# lookups read and everything `clients update` compares to skip no-op updates.
+def _get_client_by_client_id(realm: str, client_id: str) -> Client:
+    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client)
+    for c in clients:
+        if c.client_id == client_id:
+            return c
+    raise RuntimeError(f"client {client_id!r} not found")
+
+
+async def _get_client_by_client_id_async(realm: str, client_id: str) -> Client:
+    clients = await keycloak_async.kc_request(
+        "GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client
+    )
     for c in clients:
-        if c.get("clientId") == client_id:
+        if c.client_id == client_id:
             return c
     raise RuntimeError(f"client {client_id!r} not found")
 
 
+def _find_client(realm: str, client_id: str) -> Optional[Client]:
+    try:
+        return _get_client_by_client_id(realm, client_id)
+    except RuntimeError as e:
+        if "not found" in str(e):
+            return None
+        raise
+
+
+async def _find_client_async(realm: str, client_id: str) -> Optional[Client]:
+    try:
+        return await _get_client_by_client_id_async(realm, client_id)
+    except RuntimeError as e:
+        if "not found" in str(e):
+            return None
+        raise
+
+
+def _cached_client(realm: str, client_id: str) -> Optional[Client]:
+    """The client with this clientId, or None: read by its cached id, else looked up.
+
+    A client read by a cached id must still carry the clientId, so one renamed
+    elsewhere is looked up again instead of being changed under its old name.
+    """
+    found: dict[str, Client] = {}
+
+    def resolve() -> Optional[str]:
+        c = _find_client(realm, client_id)
+        if c is None or not c.id:
+            return None
+        found[c.id] = c
+        return c.id
+
+    def read(internal_id: Optional[str]) -> Optional[Client]:
+        if internal_id is None or internal_id in found:
+            return found.get(internal_id or "")
+        c = kc_request("GET", f"/admin/realms/{realm}/clients/{internal_id}", model=Client)
+        if c.client_id != client_id:
+            raise idcache.stale("client", client_id)
+        return c
+
+    return idcache.cached_call(realm, "client", client_id, resolve, read)
+
+
+async def _cached_client_async(realm: str, client_id: str) -> Optional[Client]:
+    found: dict[str, Client] = {}
+
+    async def resolve() -> Optional[str]:
+        c = await _find_client_async(realm, client_id)
+        if c is None or not c.id:
+            return None
+        found[c.id] = c
+        return c.id
+
+    async def read(internal_id: Optional[str]) -> Optional[Client]:
+        if internal_id is None or internal_id in found:
+            return found.get(internal_id or "")
+        c = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/clients/{internal_id}", model=Client)
+        if c.client_id != client_id:
+            raise idcache.stale("client", client_id)
+        return c
+
+    return await idcache.acached_call(realm, "client", client_id, resolve, read)
+
+
+def _created_id(resp) -> str:
+    # Keycloak answers a create with 201 and a Location header ending in the new id
+    location = resp.headers.get("location", "")
+    return location.rstrip("/").rsplit("/", 1)[-1] if location else ""
+
+
+def _realm_label(all_realms: bool, realm: list[str], realms: list[str]) -> str:
+    if all_realms:
+        return "all realms"
+    if realm and len(realm) == 1:
+        return realm[0]
+    return realms[0] if len(realms) == 1 else ""
+
+
+def _unchanged(current: Client, patch: dict) -> bool:
+    for k, v in patch.items():
+        cur = current.get(k)
+        if isinstance(v, list):
+            # URI lists are sets on the server side; missing means empty
+            if sorted(cur or []) != sorted(v):
+                return False
+        elif cur != v and not (cur is None and v == ""):
+            return False
+    return True
+
+
+def _run_async(rt, jobs: list[tuple[str, int, str]], fn) -> tuple[list[str], Counter]:
+    """Run fn(realm, index, client_id) for every job on the async engine.
+
+    Lines and counts come back in job order. A failing job becomes a line and is
+    counted as "failed"; the other jobs keep going.
+    """
+    results = keycloak_async.run(
+        run_ordered_async(jobs, lambda job: fn(*job), concurrency=rt.concurrency), concurrency=rt.concurrency
+    )
+    lines: list[str] = []
+    counts: Counter = Counter()
+    for (r, _, cid), (res, err) in zip(jobs, results):
+        if err is not None:
+            lines.append(f"Failed for client {cid!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        status, line = res
+        lines.append(line)
+        counts[status] += 1
+    return lines, counts
+
+
+def _finish_async(rt, lines: list[str], counts: Counter, verb: str, realm_label: str) -> None:
+    failed = f", Failed: {counts['failed']}" if counts["failed"] else ""
+    unchanged = f", Unchanged: {counts['unchanged']}" if verb == "updated" else ""
+    lines.append(f"Done. {verb.capitalize()}: {counts[verb]}{unchanged}, Skipped: {counts['skipped']}{failed}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    if counts["failed"]:
+        raise RuntimeError(f"{counts['failed']} client operation(s) failed")
+
+
 @clients_app.command("create")
 def create(
     ctx: typer.Context,
@@ -85,79 +227,103 @@ def create(
 
     realms = _resolve_realms(rt, realm or [], all_realms)
 
+    def build_payload(i: int, cid: str) -> dict:
+        nm, _ = _pick(name or [], i)
+        pub, has_pub = _pick(public or [], i)
+        en, has_en = _pick(enabled or [], i)
+        proto, _ = _pick(protocol or [], i)
+        ru, _ = _pick(root_url or [], i)
+        bu, _ = _pick(base_url or [], i)
+        std, _ = _pick(standard_flow or [], i)
+        da, _ = _pick(direct_access or [], i)
+        imp, _ = _pick(implicit_flow or [], i)
+        svc, _ = _pick(service_accounts or [], i)
+
+        payload: dict = {"clientId": cid}
+        if nm:
+            payload["name"] = nm
+
+        payload["enabled"] = _parse_bool(str(en), "--enabled") if has_en else True
+        payload["publicClient"] = _parse_bool(str(pub), "--public") if has_pub else False
+
+        if proto:
+            payload["protocol"] = proto
+        if ru:
+            payload["rootUrl"] = ru
+        if bu:
+            payload["baseUrl"] = bu
+
+        if std is not None:
+            payload["standardFlowEnabled"] = _parse_bool(str(std), "--standard-flow")
+        if da is not None:
+            payload["directAccessGrantsEnabled"] = _parse_bool(str(da), "--direct-access")
+        if imp is not None:
+            payload["implicitFlowEnabled"] = _parse_bool(str(imp), "--implicit-flow")
+        if svc is not None:
+            payload["serviceAccountsEnabled"] = _parse_bool(str(svc), "--service-accounts")
+
+        # part of the create, so each client is a single write
+        if redirect_uri:
+            payload["redirectUris"] = list(redirect_uri)
+        if web_origin:
+            payload["webOrigins"] = list(web_origin)
+        return payload
+
+    def warn_secret(i: int, cid: str, payload: dict) -> None:
+        sec, _ = _pick(secret or [], i)
+        if sec and not payload.get("publicClient", False):
+            import sys
+
+            sys.stderr.write(
+                f"Warning: --secret provided for client {cid!r} but explicit secret setting is not supported. Skipped setting secret.\n"
+            )
+
+    if rt.async_engine:
+        async def create_one(r: str, i: int, cid: str) -> tuple[str, str]:
+            try:
+                await _get_client_by_client_id_async(r, cid)
+                return "skipped", f"Client {cid!r} already exists in realm {r!r}. Skipped."
+            except Exception:
+                pass
+            payload = build_payload(i, cid)
+            resp = await keycloak_async.kc_raw_request("POST", f"/admin/realms/{r}/clients", json=payload)
+            internal_id = _created_id(resp) or (await _get_client_by_client_id_async(r, cid)).id or ""
+            idcache.remember(r, "client", cid, internal_id)
+            warn_secret(i, cid, payload)
+            return "created", f"Created client {cid!r} (ID: {internal_id}) in realm {r!r}."
+
+        lines, counts = _run_async(rt, [(r, i, cid) for r in realms for i, cid in enumerate(ids)], create_one)
+        _finish_async(rt, lines, counts, "created", _realm_label(all_realms, realm, realms))
+        return
+
     created, skipped = 0, 0
     lines: list[str] = []
 
     for r in realms:
-        for i, cid in enumerate(ids):
-            try:
-                _get_client_by_client_id(r, cid)
-                lines.append(f"Client {cid!r} already exists in realm {r!r}. Skipped.")
-                skipped += 1
-                continue
-            except Exception:
-                pass
+        with trace.span("realm", realm=r):
+            for i, cid in enumerate(ids):
+                try:
+                    _get_client_by_client_id(r, cid)
+                    lines.append(f"Client {cid!r} already exists in realm {r!r}. Skipped.")
+                    skipped += 1
+                    continue
+                except Exception:
+                    pass
+
+                payload = build_payload(i, cid)
+                resp = kc_raw_request("POST", f"/admin/realms/{r}/clients", json=payload)
 
-            nm, _ = _pick(name or [], i)
-            pub, has_pub = _pick(public or [], i)
-            en, has_en = _pick(enabled or [], i)
-            proto, _ = _pick(protocol or [], i)
-            ru, _ = _pick(root_url or [], i)
-            bu, _ = _pick(base_url or [], i)
-            std, _ = _pick(standard_flow or [], i)
-            da, _ = _pick(direct_access or [], i)
-            imp, _ = _pick(implicit_flow or [], i)
-            svc, _ = _pick(service_accounts or [], i)
-            sec, _ = _pick(secret or [], i)
-
-            payload: dict = {"clientId": cid}
-            if nm:
-                payload["name"] = nm
-
-            payload["enabled"] = _parse_bool(str(en), "--enabled") if has_en else True
-            payload["publicClient"] = _parse_bool(str(pub), "--public") if has_pub else False
-
-            if proto:
-                payload["protocol"] = proto
-            if ru:
-                payload["rootUrl"] = ru
-            if bu:
-                payload["baseUrl"] = bu
-
-            if std is not None:
-                payload["standardFlowEnabled"] = _parse_bool(str(std), "--standard-flow")
-            if da is not None:
-                payload["directAccessGrantsEnabled"] = _parse_bool(str(da), "--direct-access")
-            if imp is not None:
-                payload["implicitFlowEnabled"] = _parse_bool(str(imp), "--implicit-flow")
-            if svc is not None:
-                payload["serviceAccountsEnabled"] = _parse_bool(str(svc), "--service-accounts")
-
-            resp = kc_raw_request("POST", f"/admin/realms/{r}/clients", json=payload)
-
-            # fetch created client to get its internal id
-            created_client = _get_client_by_client_id(r, cid)
-            internal_id = created_client.get("id", "")
-
-            if sec and not payload.get("publicClient", False):
-                import sys
-
-                sys.stderr.write(
-                    f"Warning: --secret provided for client {cid!r} but explicit secret setting is not supported. Skipped setting secret.\n"
-                )
-
-            # Apply redirect URIs and web origins as full replacement (Go applies list to all clients)
-            if redirect_uri:
-                kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}", json={"id": internal_id, "redirectUris": list(redirect_uri)})
-            if web_origin:
-                kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}", json={"id": internal_id, "webOrigins": list(web_origin)})
-
-            lines.append(f"Created client {cid!r} (ID: {internal_id}) in realm {r!r}.")
-            created += 1
+                # the internal id is in the Location header; look it up only if it is not
+                internal_id = _created_id(resp) or _get_client_by_client_id(r, cid).id or ""
+                idcache.remember(r, "client", cid, internal_id)
+
+                warn_secret(i, cid, payload)
+
+                lines.append(f"Created client {cid!r} (ID: {internal_id}) in realm {r!r}.")
+                created += 1
 
     lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 @clients_app.command("update")
@@ -181,6 +347,7 @@ def update(
     ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip clients not found instead of failing"),
     realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
     all_realms: bool = typer.Option(False, "--all-realms", help="apply to all realms"),
+    force: bool = typer.Option(False, "--force", help="send the update even when the client already has these values"),
 ):
     rt = ctx.obj
 
@@ -211,75 +378,125 @@ def update(
 
     realms = _resolve_realms(rt, realm or [], all_realms)
 
-    updated, skipped = 0, 0
+    def build_patch(i: int, internal_id: str) -> dict:
+        nm, has_nm = _pick(name or [], i)
+        pub, has_pub = _pick(public or [], i)
+        en, has_en = _pick(enabled or [], i)
+        std, has_std = _pick(standard_flow or [], i)
+        da, has_da = _pick(direct_access or [], i)
+        imp, has_imp = _pick(implicit_flow or [], i)
+        svc, has_svc = _pick(service_accounts or [], i)
+
+        patch: dict = {"id": internal_id}
+        if has_nm and nm is not None:
+            patch["name"] = nm
+        if has_pub:
+            patch["publicClient"] = _parse_bool(str(pub), "--public")
+        if has_en:
+            patch["enabled"] = _parse_bool(str(en), "--enabled")
+        if has_std:
+            patch["standardFlowEnabled"] = _parse_bool(str(std), "--standard-flow")
+        if has_da:
+            patch["directAccessGrantsEnabled"] = _parse_bool(str(da), "--direct-access")
+        if has_imp:
+            patch["implicitFlowEnabled"] = _parse_bool(str(imp), "--implicit-flow")
+        if has_svc:
+            patch["serviceAccountsEnabled"] = _parse_bool(str(svc), "--service-accounts")
+        if redirect_uri:
+            patch["redirectUris"] = list(redirect_uri)
+        if web_origin:
+            patch["webOrigins"] = list(web_origin)
+        return patch
+
+    def warn_secret(i: int, cid: str, c: Client, patch: dict) -> None:
+        sec, has_sec = _pick(secret or [], i)
+        if has_sec and sec and not patch.get("publicClient", c.public_client or False):
+            import sys
+
+            sys.stderr.write(
+                f"Warning: --secret provided for client {cid!r} but explicit secret setting is not supported. Skipped setting secret.\n"
+            )
+
+    def rename_to(i: int, cid: str) -> str:
+        ncid, has_ncid = _pick(new_client_id or [], i)
+        if has_ncid and ncid and (force or ncid != cid):
+            return ncid
+        return ""
+
+    def writes_for(r: str, i: int, cid: str, c: Client) -> WriteBuffer:
+        internal_id = c.id
+        path = f"/admin/realms/{r}/clients/{internal_id}"
+        patch = build_patch(i, internal_id)
+        warn_secret(i, cid, c, patch)
+
+        # field changes and a rename go out as one PUT
+        writes = WriteBuffer()
+        if force or not _unchanged(c, patch):
+            writes.put(path, patch)
+        ncid = rename_to(i, cid)
+        if ncid:
+            writes.put(path, {"id": internal_id, "clientId": ncid})
+        return writes
+
+    def renamed(r: str, i: int, cid: str, internal_id: str) -> None:
+        ncid = rename_to(i, cid)
+        if ncid:
+            idcache.forget(r, "client", cid)
+            idcache.remember(r, "client", ncid, internal_id)
+
+    if rt.async_engine:
+        async def update_one(r: str, i: int, cid: str) -> tuple[str, str]:
+            c = await _cached_client_async(r, cid)
+            if c is None:
+                if ignore_missing:
+                    return "skipped", f"Client {cid!r} not found in realm {r!r}. Skipped."
+                raise RuntimeError(f"client {cid!r} not found in realm {r}")
+            internal_id = c.id
+            if not internal_id:
+                raise RuntimeError(f"client {cid!r} has no internal id")
+
+            writes = writes_for(r, i, cid, c)
+            if not writes:
+                return "unchanged", f"Client {cid!r} (ID: {internal_id}) in realm {r!r} unchanged."
+            await writes.aflush()
+            renamed(r, i, cid, internal_id)
+            return "updated", f"Updated client {cid!r} (ID: {internal_id}) in realm {r!r}."
+
+        lines, counts = _run_async(rt, [(r, i, cid) for r in realms for i, cid in enumerate(ids)], update_one)
+        _finish_async(rt, lines, counts, "updated", _realm_label(all_realms, realm, realms))
+        return
+
+    updated, unchanged, skipped = 0, 0, 0
     lines: list[str] = []
 
     for r in realms:
-        for i, cid in enumerate(ids):
-            try:
-                c = _get_client_by_client_id(r, cid)
-            except Exception:
-                if ignore_missing:
-                    lines.append(f"Client {cid!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
+        with trace.span("realm", realm=r):
+            for i, cid in enumerate(ids):
+                c = _cached_client(r, cid)
+                if c is None:
+                    if ignore_missing:
+                        lines.append(f"Client {cid!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"client {cid!r} not found in realm {r}")
+
+                internal_id = c.id
+                if not internal_id:
+                    raise RuntimeError(f"client {cid!r} has no internal id")
+
+                writes = writes_for(r, i, cid, c)
+                if not writes:
+                    lines.append(f"Client {cid!r} (ID: {internal_id}) in realm {r!r} unchanged.")
+                    unchanged += 1
                     continue
-                raise RuntimeError(f"client {cid!r} not found in realm {r}")
+                writes.flush()
+                renamed(r, i, cid, internal_id)
 
-            internal_id = c.get("id")
-            if not internal_id:
-                raise RuntimeError(f"client {cid!r} has no internal id")
+                lines.append(f"Updated client {cid!r} (ID: {internal_id}) in realm {r!r}.")
+                updated += 1
 
-            nm, has_nm = _pick(name or [], i)
-            pub, has_pub = _pick(public or [], i)
-            en, has_en = _pick(enabled or [], i)
-            proto, has_proto = _pick(protocol or [], i)
-            ru, has_ru = _pick(root_url or [], i)
-            bu, has_bu = _pick(base_url or [], i)
-            std, has_std = _pick(standard_flow or [], i)
-            da, has_da = _pick(direct_access or [], i)
-            imp, has_imp = _pick(implicit_flow or [], i)
-            svc, has_svc = _pick(service_accounts or [], i)
-            sec, has_sec = _pick(secret or [], i)
-            ncid, has_ncid = _pick(new_client_id or [], i)
-
-            patch: dict = {"id": internal_id}
-            if has_nm and nm is not None:
-                patch["name"] = nm
-            if has_pub:
-                patch["publicClient"] = _parse_bool(str(pub), "--public")
-            if has_en:
-                patch["enabled"] = _parse_bool(str(en), "--enabled")
-            if has_std:
-                patch["standardFlowEnabled"] = _parse_bool(str(std), "--standard-flow")
-            if has_da:
-                patch["directAccessGrantsEnabled"] = _parse_bool(str(da), "--direct-access")
-            if has_imp:
-                patch["implicitFlowEnabled"] = _parse_bool(str(imp), "--implicit-flow")
-            if has_svc:
-                patch["serviceAccountsEnabled"] = _parse_bool(str(svc), "--service-accounts")
-            if redirect_uri:
-                patch["redirectUris"] = list(redirect_uri)
-            if web_origin:
-                patch["webOrigins"] = list(web_origin)
-
-            kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}", json=patch)
-
-            if has_sec and sec and not patch.get("publicClient", c.get("publicClient", False)):
-                import sys
-
-                sys.stderr.write(
-                    f"Warning: --secret provided for client {cid!r} but explicit secret setting is not supported. Skipped setting secret.\n"
-                )
-
-            if has_ncid and ncid:
-                kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}", json={"id": internal_id, "clientId": ncid})
-
-            lines.append(f"Updated client {cid!r} (ID: {internal_id}) in realm {r!r}.")
-            updated += 1
-
-    lines.append(f"Done. Updated: {updated}, Skipped: {skipped}.")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    lines.append(f"Done. Updated: {updated}, Unchanged: {unchanged}, Skipped: {skipped}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 @clients_app.command("delete")
@@ -298,28 +515,44 @@ def delete(
 
     realms = _resolve_realms(rt, realm or [], all_realms)
 
+    if rt.async_engine:
+        async def delete_one(r: str, i: int, cid: str) -> tuple[str, str]:
+            c = await _cached_client_async(r, cid)
+            if c is None:
+                if ignore_missing:
+                    return "skipped", f"Client {cid!r} not found in realm {r!r}. Skipped."
+                raise RuntimeError(f"client {cid!r} not found in realm {r}")
+            internal_id = c.id
+            await keycloak_async.kc_request("DELETE", f"/admin/realms/{r}/clients/{internal_id}")
+            idcache.forget(r, "client", cid)
+            return "deleted", f"Deleted client {cid!r} (ID: {internal_id}) in realm {r!r}."
+
+        lines, counts = _run_async(rt, [(r, i, cid) for r in realms for i, cid in enumerate(ids)], delete_one)
+        _finish_async(rt, lines, counts, "deleted", _realm_label(all_realms, realm, realms))
+        return
+
     deleted, skipped = 0, 0
     lines: list[str] = []
 
     for r in realms:
-        for cid in ids:
-            try:
-                c = _get_client_by_client_id(r, cid)
-            except Exception:
-                if ignore_missing:
-                    lines.append(f"Client {cid!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise RuntimeError(f"client {cid!r} not found in realm {r}")
+        with trace.span("realm", realm=r):
+            for cid in ids:
+                c = _cached_client(r, cid)
+                if c is None:
+                    if ignore_missing:
+                        lines.append(f"Client {cid!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"client {cid!r} not found in realm {r}")
 
-            internal_id = c.get("id")
-            kc_request("DELETE", f"/admin/realms/{r}/clients/{internal_id}")
-            lines.append(f"Deleted client {cid!r} (ID: {internal_id}) in realm {r!r}.")
-            deleted += 1
+                internal_id = c.id
+                kc_request("DELETE", f"/admin/realms/{r}/clients/{internal_id}")
+                idcache.forget(r, "client", cid)
+                lines.append(f"Deleted client {cid!r} (ID: {internal_id}) in realm {r!r}.")
+                deleted += 1
 
     lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 @clients_app.command("list")
@@ -328,40 +561,79 @@ def list_clients(
     client_id: list[str] = typer.Option(None, "--client-id", help="filter by client-id (single value supported)"),
     realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
     all_realms: bool = typer.Option(False, "--all-realms", help="apply to all realms"),
+    count: bool = typer.Option(False, "--count", help="print only the number of clients per realm"),
 ):
     rt = ctx.obj
 
     ids = client_id or []
     realms = _resolve_realms(rt, realm or [], all_realms)
 
+    if count:
+        # no /clients/count in the admin API: page through ids only
+        params = {"clientId": ids[0]} if len(ids) == 1 else {}
+        counts = realm_counts(
+            rt,
+            realms,
+            lambda r: count_pages(f"/admin/realms/{r}/clients", params),
+            lambda r: acount_pages(f"/admin/realms/{r}/clients", params),
+        )
+        print_box(count_lines(counts), jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
+        return
+
     total = 0
     lines: list[str] = []
 
     for r in realms:
-        params = {}
-        if len(ids) == 1:
-            params["clientId"] = ids[0]
-        clients = kc_request("GET", f"/admin/realms/{r}/clients", params=params)
-        for c in clients:
-            cid = c.get("clientId")
-            if cid:
-                lines.append(cid)
-                total += 1
+        with trace.span("realm", realm=r):
+            params = {}
+            if len(ids) == 1:
+                params["clientId"] = ids[0]
+            clients = kc_request("GET", f"/admin/realms/{r}/clients", params=params, model=Client)
+            for c in clients:
+                cid = c.client_id
+                if cid:
+                    lines.append(cid)
+                    total += 1
 
     lines.append(f"Total: {total}")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 scopes_app = typer.Typer(add_completion=False, help="Manage client scope assignments")
 
 
-def _find_client_scope_id(realm: str, scope_name: str) -> str:
-    scopes = kc_request("GET", f"/admin/realms/{realm}/client-scopes")
+def _find_client_scope_id(realm: str, scope_name: str) -> Optional[str]:
+    scopes = kc_request("GET", f"/admin/realms/{realm}/client-scopes", model=ClientScope)
     for s in scopes:
-        if s.get("name") == scope_name and s.get("id"):
-            return s["id"]
-    raise RuntimeError(f"client scope {scope_name!r} not found in realm {realm}")
+        if s.name == scope_name and s.id:
+            return s.id
+    return None
+
+
+def _with_scope_ids(realm: str, client_id: str, scope_name: str, fn: Callable[[str, str], None]) -> bool:
+    """fn(internal client id, scope id), both from the id cache; False if the scope does not exist.
+
+    A 404 from fn resolves the scope again, then the client; it is raised if
+    neither id changed.
+    """
+    def client_id_or_raise() -> str:
+        c = _find_client(realm, client_id)
+        if c is None or not c.id:
+            raise RuntimeError(f"client {client_id!r} not found in realm {realm}")
+        return c.id
+
+    def with_client(internal_id: Optional[str]) -> bool:
+        def with_scope(scope_id: Optional[str]) -> bool:
+            if scope_id is None:
+                return False
+            fn(internal_id, scope_id)
+            return True
+
+        return idcache.cached_call(
+            realm, "client-scope", scope_name, lambda: _find_client_scope_id(realm, scope_name), with_scope
+        )
+
+    return idcache.cached_call(realm, "client", client_id, client_id_or_raise, with_client)
 
 
 @scopes_app.command("assign")
@@ -389,38 +661,27 @@ def scopes_assign(
     lines: list[str] = []
 
     for r in realms:
-        c = _get_client_by_client_id(r, client_id)
-        internal_id = c.get("id")
-        if not internal_id:
-            raise RuntimeError(f"client {client_id!r} not found in realm {r}")
-
-        for sn in scopes:
-            scope_id = _find_client_scope_id(r, sn)
-            if type == "default":
-                try:
-                    kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}/default-client-scopes/{scope_id}")
-                except Exception as e:
-                    if "409" in str(e).lower():
-                        lines.append(f"Scope {sn!r} already default for client {client_id!r} in realm {r!r}. Skipped.")
-                        skipped += 1
-                        continue
-                    raise
-            else:
+        with trace.span("realm", realm=r):
+            for sn in scopes:
+                # ids come from the id cache; only the PUT goes out once they are known
                 try:
-                    kc_request("PUT", f"/admin/realms/{r}/clients/{internal_id}/optional-client-scopes/{scope_id}")
+                    found = _with_scope_ids(
+                        r, client_id, sn, lambda iid, sid: kc_request("PUT", f"/admin/realms/{r}/clients/{iid}/{type}-client-scopes/{sid}")
+                    )
                 except Exception as e:
                     if "409" in str(e).lower():
-                        lines.append(f"Scope {sn!r} already optional for client {client_id!r} in realm {r!r}. Skipped.")
+                        lines.append(f"Scope {sn!r} already {type} for client {client_id!r} in realm {r!r}. Skipped.")
                         skipped += 1
                         continue
                     raise
+                if not found:
+                    raise RuntimeError(f"client scope {sn!r} not found in realm {r}")
 
-            lines.append(f"Assigned {type} scope {sn!r} to client {client_id!r} in realm {r!r}.")
-            assigned += 1
+                lines.append(f"Assigned {type} scope {sn!r} to client {client_id!r} in realm {r!r}.")
+                assigned += 1
 
     lines.append(f"Done. Assigned: {assigned}, Skipped: {skipped}.")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 @scopes_app.command("remove")
@@ -449,39 +710,30 @@ def scopes_remove(
     lines: list[str] = []
 
     for r in realms:
-        c = _get_client_by_client_id(r, client_id)
-        internal_id = c.get("id")
-        if not internal_id:
-            raise RuntimeError(f"client {client_id!r} not found in realm {r}")
-
-        for sn in scopes:
-            try:
-                scope_id = _find_client_scope_id(r, sn)
-            except Exception:
-                if ignore_missing:
-                    lines.append(f"Client scope {sn!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise
-
-            try:
-                if type == "default":
-                    kc_request("DELETE", f"/admin/realms/{r}/clients/{internal_id}/default-client-scopes/{scope_id}")
-                else:
-                    kc_request("DELETE", f"/admin/realms/{r}/clients/{internal_id}/optional-client-scopes/{scope_id}")
-            except Exception as e:
-                if _is_404(e) and ignore_missing:
-                    lines.append(f"{type.capitalize()} scope {sn!r} not assigned to client {client_id!r} in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise
+        with trace.span("realm", realm=r):
+            for sn in scopes:
+                try:
+                    found = _with_scope_ids(
+                        r, client_id, sn, lambda iid, sid: kc_request("DELETE", f"/admin/realms/{r}/clients/{iid}/{type}-client-scopes/{sid}")
+                    )
+                except Exception as e:
+                    if _is_404(e) and ignore_missing:
+                        lines.append(f"{type.capitalize()} scope {sn!r} not assigned to client {client_id!r} in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise
+                if not found:
+                    if ignore_missing:
+                        lines.append(f"Client scope {sn!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"client scope {sn!r} not found in realm {r}")
 
-            lines.append(f"Removed {type} scope {sn!r} from client {client_id!r} in realm {r!r}.")
-            removed += 1
+                lines.append(f"Removed {type} scope {sn!r} from client {client_id!r} in realm {r!r}.")
+                removed += 1
 
     lines.append(f"Done. Removed: {removed}, Skipped: {skipped}.")
-    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (realms[0] if len(realms) == 1 else ""))
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, realms))
 
 
 clients_app.add_typer(scopes_app, name="scopes")
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import sys
+
+import typer
+
+from kc.core import keycloak_async
+from kc.core.config import get_config
+from kc.core.event_tail import KINDS, EventStream, tail
+from kc.core.keycloak import kc_request
+
+events_app = typer.Typer(add_completion=False, help="Watch admin and login events")
+
+
+def _resolve_target_realms(rt, realms: list[str], all_realms: bool) -> list[str]:
+    if all_realms:
+        rs = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
+        out: list[str] = []
+        for r in rs:
+            name = r.get("realm")
+            if name:
+                out.append(name)
+        return out
+
+    if realms:
+        return list(realms)
+
+    r = rt.default_realm or get_config().realm
+    if not r:
+        raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
+    return [r]
+
+
+async def _warn_disabled(realms: list[str], kinds: list[str]) -> None:
+    """Tell on stderr about realms that do not record the events asked for; their streams stay empty."""
+    reps = await asyncio.gather(
+        *(keycloak_async.kc_request("GET", f"/admin/realms/{r}") for r in realms), return_exceptions=True
+    )
+    for r, rep in zip(realms, reps):
+        if isinstance(rep, BaseException):
+            continue
+        for kind in kinds:
+            if not rep.get(KINDS[kind][1]):
+                sys.stderr.write(f"Warning: {kind} events are not recorded in realm {r!r} ({KINDS[kind][1]} is off)\n")
+
+
+@events_app.command("tail")
+def tail_events(
+    ctx: typer.Context,
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="watch all realms"),
+    kind: list[str] = typer.Option(None, "--kind", help="admin or login; repeatable (default: both)"),
+    min_interval: float = typer.Option(1.0, "--min-interval", min=0.1, help="shortest wait between polls of a realm, in seconds"),
+    max_interval: float = typer.Option(30.0, "--max-interval", min=0.1, help="longest wait between polls of an idle realm, in seconds"),
+    duration: float = typer.Option(0.0, "--duration", min=0, help="stop after this many seconds (0: run until Ctrl+C)"),
+):
+    """Stream new events as NDJSON on stdout, one event per line, until stopped.
+
+    Each line is the event as the server returns it, plus "realm" and "kind".
+    Realms are polled concurrently on the asyncio engine, sharing its connection
+    pool; each backs off while idle and polls faster while events arrive.
+    """
+    rt = ctx.obj
+
+    kinds = list(dict.fromkeys(kind or KINDS))
+    for k in kinds:
+        if k not in KINDS:
+            raise RuntimeError(f"invalid --kind {k!r}; use admin or login")
+    if max_interval < min_interval:
+        raise RuntimeError("--max-interval must not be below --min-interval")
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    streams = [EventStream(r, k, min_interval, max_interval) for r in target_realms for k in kinds]
+    emitted = 0
+
+    def emit(s: EventStream, events: list[dict]) -> None:
+        nonlocal emitted
+        emitted += len(events)
+        sys.stdout.write(
+            "".join(json.dumps({"realm": s.realm, "kind": s.kind, **ev}, ensure_ascii=False) + "\n" for ev in events)
+        )
+        sys.stdout.flush()
+
+    def on_error(s: EventStream, err: Exception) -> None:
+        sys.stderr.write(f"Polling {s.kind} events of realm {s.realm!r} failed: {err}\n")
+
+    async def main() -> None:
+        await _warn_disabled(target_realms, kinds)
+        await tail(streams, emit, duration=duration, on_error=on_error)
+
+    sys.stderr.write(f"Watching {', '.join(kinds)} events of {len(target_realms)} realm(s).\n")
+    try:
+        # always on the asyncio engine: one loop carries every realm, however many there are
+        keycloak_async.run(main(), concurrency=rt.concurrency)
+    except KeyboardInterrupt:
+        pass
+    sys.stderr.write(f"Streamed {emitted} event(s).\n")
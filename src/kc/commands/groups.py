@@ -0,0 +1,639 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import typer
+
+from kc.core import idcache, keycloak_async, trace
+from kc.core.box import print_box
+from kc.core.config import get_config
+from kc.core.counts import count_lines, realm_counts
+from kc.core.directory import UserDirectory
+from kc.core.keycloak import kc_request
+from kc.core.models import Group, User
+from kc.core.pool import run_ordered, run_ordered_async
+from kc.core.progress import Progress
+
+groups_app = typer.Typer(add_completion=False, help="Manage groups")
+members_app = typer.Typer(add_completion=False, help="Manage group members")
+groups_app.add_typer(members_app, name="members")
+
+_PAGE_SIZE = 500
+
+
+def _is_404(err: Exception) -> bool:
+    return "404" in str(err).lower()
+
+
+def _validate_0_1_n(flag: str, values: list[str], n: int) -> None:
+    if not (len(values) == 0 or len(values) == 1 or len(values) == n):
+        raise RuntimeError(
+            f"invalid {flag}: when using multiple --group, you must pass either no {flag}, a single {flag} to apply to all, or one {flag} per --group (in order)"
+        )
+
+
+def _pick(values: list[str], i: int) -> str:
+    if len(values) == 0:
+        return ""
+    if len(values) == 1:
+        return values[0]
+    return values[i]
+
+
+def _resolve_target_realms(rt, realms: list[str], all_realms: bool) -> list[str]:
+    if all_realms:
+        rs = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
+        out: list[str] = []
+        for r in rs:
+            name = r.get("realm")
+            if name:
+                out.append(name)
+        return out
+
+    if realms:
+        return list(realms)
+
+    r = rt.default_realm or get_config().realm
+    if not r:
+        raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
+    return [r]
+
+
+def _realm_label(realm: Optional[list[str]], all_realms: bool, target_realms: list[str]) -> str:
+    if all_realms:
+        return "all realms"
+    if realm and len(realm) == 1:
+        return realm[0]
+    return target_realms[0] if len(target_realms) == 1 else ""
+
+
+def _normalize_path(path: str) -> str:
+    """"a/b", "/a/b/" and "/a/b" all name the group b under a."""
+    segments = [s for s in path.strip().split("/") if s]
+    if not segments:
+        raise RuntimeError(f"invalid group path {path!r}")
+    return "/" + "/".join(segments)
+
+
+def _by_path_url(realm: str, path: str) -> str:
+    return f"/admin/realms/{realm}/group-by-path/" + "/".join(quote(s, safe="") for s in path.strip("/").split("/"))
+
+
+def _find_group(realm: str, path: str, keep_raw: bool = False) -> Optional[Group]:
+    try:
+        return kc_request("GET", _by_path_url(realm, path), model=Group, keep_raw=keep_raw)
+    except RuntimeError as e:
+        if _is_404(e):
+            return None
+        raise
+
+
+async def _find_group_async(realm: str, path: str) -> Optional[Group]:
+    try:
+        return await keycloak_async.kc_request("GET", _by_path_url(realm, path), model=Group)
+    except RuntimeError as e:
+        if _is_404(e):
+            return None
+        raise
+
+
+def _require_group(realm: str, path: str) -> Group:
+    g = _find_group(realm, path)
+    if g is None or not g.id:
+        raise RuntimeError(f"group {path!r} not found in realm {realm}")
+    return g
+
+
+def _parse_attributes(values: list[str]) -> dict[str, list[str]]:
+    """--attribute key=value pairs; a key given twice gets both values, "key=" removes the key."""
+    out: dict[str, list[str]] = {}
+    for v in values:
+        key, sep, value = v.partition("=")
+        if not sep or not key:
+            raise RuntimeError(f"invalid --attribute {v!r}: expected key=value")
+        out.setdefault(key, [])
+        if value:
+            out[key].append(value)
+    return out
+
+
+def _read_usernames(usernames: list[str], file: str) -> list[str]:
+    """--username values, then the file's lines; blank lines and '#' comments are skipped.
+
+    Keycloak stores usernames in lower case, so duplicates are dropped regardless of case.
+    """
+    names = list(usernames)
+    if file:
+        for raw in Path(file).read_text(encoding="utf-8").splitlines():
+            line = raw.strip()
+            if line and not line.startswith("#"):
+                names.append(line)
+    seen: set[str] = set()
+    out: list[str] = []
+    for un in names:
+        if un.lower() not in seen:
+            seen.add(un.lower())
+            out.append(un)
+    return out
+
+
+def _pages(realm: str, path: str, model, params: Optional[dict] = None):
+    first = 0
+    while True:
+        page = kc_request(
+            "GET", f"/admin/realms/{realm}{path}", params={**(params or {}), "first": first, "max": _PAGE_SIZE}, model=model
+        )
+        yield from page
+        if len(page) < _PAGE_SIZE:
+            return
+        first += len(page)
+
+
+async def _pages_async(realm: str, path: str, model, params: Optional[dict] = None) -> list:
+    out: list = []
+    first = 0
+    while True:
+        page = await keycloak_async.kc_request(
+            "GET", f"/admin/realms/{realm}{path}", params={**(params or {}), "first": first, "max": _PAGE_SIZE}, model=model
+        )
+        out.extend(page)
+        if len(page) < _PAGE_SIZE:
+            return out
+        first += len(page)
+
+
+def _walk(realm: str, groups: list[Group]):
+    """Every group of the list and below it, parents first.
+
+    Older Keycloak versions send the whole tree inline in subGroups; newer ones
+    send subGroupCount and the children are read page by page.
+    """
+    for g in groups:
+        yield g
+        if g.sub_groups:
+            yield from _walk(realm, Group.build(realm, g.sub_groups))
+        elif g.sub_group_count:
+            yield from _walk(realm, list(_pages(realm, f"/groups/{g.id}/children", Group, {"briefRepresentation": "true"})))
+
+
+@groups_app.command("list")
+def list_groups(
+    ctx: typer.Context,
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="list groups in all realms"),
+    search: str = typer.Option("", "--search", help="list only groups whose name contains this (case-insensitive)"),
+    count: bool = typer.Option(False, "--count", help="print only the number of groups per realm"),
+):
+    """List group paths, subgroups under their parents."""
+    rt = ctx.obj
+
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+    realm_label = _realm_label(realm, all_realms, target_realms)
+
+    if count:
+        params = {"search": search} if search else {}
+
+        async def acount(r: str) -> int:
+            return (await keycloak_async.kc_request("GET", f"/admin/realms/{r}/groups/count", params=params))["count"]
+
+        counts = realm_counts(
+            rt, target_realms, lambda r: kc_request("GET", f"/admin/realms/{r}/groups/count", params=params)["count"], acount
+        )
+        print_box(count_lines(counts), jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        return
+
+    total = 0
+    lines: list[str] = []
+    needle = search.lower()
+
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            top = list(_pages(r, "/groups", Group, {"briefRepresentation": "true"}))
+            for g in _walk(r, top):
+                if needle and needle not in (g.name or "").lower():
+                    continue
+                prefix = f"[{r}] " if len(target_realms) > 1 else ""
+                lines.append(f"{prefix}{g.path}")
+                total += 1
+
+    lines.append(f"Total: {total}")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+
+
+@groups_app.command("create")
+def create(
+    ctx: typer.Context,
+    name: list[str] = typer.Option(None, "--name", help="group name(s). Repeatable; required."),
+    parent: str = typer.Option("", "--parent", help="path of the parent group, e.g. /staff/it. Default: top level"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="create in all realms"),
+):
+    rt = ctx.obj
+
+    names = name or []
+    if len(names) == 0:
+        raise RuntimeError("missing --name: provide at least one --name")
+    for n in names:
+        if "/" in n:
+            raise RuntimeError(f"invalid --name {n!r}: use --parent for subgroups")
+    parent_path = _normalize_path(parent) if parent else ""
+
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    created, skipped = 0, 0
+    lines: list[str] = []
+
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            url = f"/admin/realms/{r}/groups"
+            if parent_path:
+                url = f"/admin/realms/{r}/groups/{_require_group(r, parent_path).id}/children"
+
+            for n in names:
+                path = f"{parent_path}/{n}"
+                if _find_group(r, path) is not None:
+                    lines.append(f"Group {path!r} already exists in realm {r!r}. Skipped.")
+                    skipped += 1
+                    continue
+                try:
+                    kc_request("POST", url, json={"name": n})
+                except RuntimeError as e:
+                    if "409" in str(e).lower():
+                        lines.append(f"Group {path!r} already exists in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise
+                g = _require_group(r, path)
+                lines.append(f"Created group {path!r} (ID: {g.id}) in realm {r!r}.")
+                created += 1
+
+    lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(realm, all_realms, target_realms))
+
+
+@groups_app.command("update")
+def update(
+    ctx: typer.Context,
+    group: list[str] = typer.Option(None, "--group", help="path(s) of the group(s) to update. Repeatable; required."),
+    new_name: list[str] = typer.Option(None, "--new-name", help="new name(s). Optional; 0,1 or N"),
+    attribute: list[str] = typer.Option(None, "--attribute", help="key=value to set on every group; repeat a key for several values, key= removes it"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="update in all realms"),
+    ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip groups not found instead of failing"),
+):
+    rt = ctx.obj
+
+    paths = [_normalize_path(p) for p in group or []]
+    new_names = new_name or []
+    attributes = _parse_attributes(attribute or [])
+
+    if len(paths) == 0:
+        raise RuntimeError("missing --group: provide at least one --group")
+    if len(new_names) == 0 and not attributes:
+        raise RuntimeError("nothing to update: provide --new-name/--attribute")
+    _validate_0_1_n("--new-name", new_names, len(paths))
+
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    updated, unchanged, skipped = 0, 0, 0
+    lines: list[str] = []
+
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            for i, path in enumerate(paths):
+                # full representation: it is modified and PUT back
+                g = _find_group(r, path, keep_raw=True)
+                if g is None:
+                    if ignore_missing:
+                        lines.append(f"Group {path!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"group {path!r} not found in realm {r}")
+
+                rep = g.raw()
+                wanted = dict(rep.get("attributes") or {})
+                for key, values in attributes.items():
+                    if values:
+                        wanted[key] = values
+                    else:
+                        wanted.pop(key, None)
+                name = _pick(new_names, i) or rep.get("name")
+                if name == rep.get("name") and wanted == (rep.get("attributes") or {}):
+                    lines.append(f"Group {path!r} in realm {r!r} unchanged.")
+                    unchanged += 1
+                    continue
+
+                rep.update(name=name, attributes=wanted)
+                rep.pop("subGroups", None)
+                kc_request("PUT", f"/admin/realms/{r}/groups/{g.id}", json=rep)
+                lines.append(f"Updated group {path!r} in realm {r!r}. New path: {path.rsplit('/', 1)[0] + '/' + name!r}.")
+                updated += 1
+
+    lines.append(f"Done. Updated: {updated}, Unchanged: {unchanged}, Skipped: {skipped}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(realm, all_realms, target_realms))
+
+
+@groups_app.command("delete")
+def delete(
+    ctx: typer.Context,
+    group: list[str] = typer.Option(None, "--group", help="path(s) of the group(s) to delete, subgroups included. Repeatable; required."),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="delete in all realms"),
+    ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip groups not found instead of failing"),
+):
+    rt = ctx.obj
+
+    paths = [_normalize_path(p) for p in group or []]
+    if len(paths) == 0:
+        raise RuntimeError("missing --group: provide at least one --group")
+
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    deleted, skipped = 0, 0
+    lines: list[str] = []
+
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            for path in paths:
+                g = _find_group(r, path)
+                if g is None:
+                    if ignore_missing:
+                        lines.append(f"Group {path!r} not found in realm {r!r}. Skipped.")
+                        skipped += 1
+                        continue
+                    raise RuntimeError(f"group {path!r} not found in realm {r}")
+
+                kc_request("DELETE", f"/admin/realms/{r}/groups/{g.id}")
+                lines.append(f"Deleted group {path!r} (ID: {g.id}) in realm {r!r}.")
+                deleted += 1
+
+    lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(realm, all_realms, target_realms))
+
+
+@members_app.command("list")
+def list_members(
+    ctx: typer.Context,
+    group: str = typer.Option(..., "--group", help="path of the group, e.g. /staff/it"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="list members in all realms"),
+):
+    """List the usernames of a group's direct members."""
+    rt = ctx.obj
+
+    path = _normalize_path(group)
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    total = 0
+    lines: list[str] = []
+
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            g = _require_group(r, path)
+            for u in _pages(r, f"/groups/{g.id}/members", User, {"briefRepresentation": "true"}):
+                prefix = f"[{r}] " if len(target_realms) > 1 else ""
+                lines.append(f"{prefix}{u.username}")
+                total += 1
+
+    lines.append(f"Total: {total}")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(realm, all_realms, target_realms))
+
+
+@dataclass
+class _Plan:
+    """Membership changes for one group in one realm."""
+
+    realm: str
+    path: str
+    group_id: str
+    add: list[str] = field(default_factory=list)
+    # members to remove, with their ids from the member listing
+    remove: list[User] = field(default_factory=list)
+    unchanged: int = 0
+
+
+def _diff(realm: str, path: str, group: Group, members: list[User], usernames: list[str], mode: str) -> _Plan:
+    current = {u.username.lower(): u for u in members if u.username}
+    plan = _Plan(realm, path, group.id)
+    if mode in ("add", "sync"):
+        plan.add = [un for un in usernames if un.lower() not in current]
+    if mode == "remove":
+        plan.remove = [current[un.lower()] for un in usernames if un.lower() in current]
+    if mode == "sync":
+        wanted = {un.lower() for un in usernames}
+        plan.remove = [u for key, u in current.items() if key not in wanted]
+    plan.unchanged = len(usernames) - len(plan.add) - (len(plan.remove) if mode == "remove" else 0)
+    return plan
+
+
+def _plan_realms(rt, target_realms: list[str], path: str, usernames: list[str], mode: str) -> list[_Plan]:
+    """Read each realm's group and its current members once; only the differences become requests."""
+    if rt.async_engine:
+        async def plan_realm(r: str) -> _Plan:
+            g = await _find_group_async(r, path)
+            if g is None or not g.id:
+                raise RuntimeError(f"group {path!r} not found in realm {r}")
+            members = await _pages_async(r, f"/groups/{g.id}/members", User, {"briefRepresentation": "true"})
+            return _diff(r, path, g, members, usernames, mode)
+
+        results = keycloak_async.run(
+            run_ordered_async(target_realms, plan_realm, concurrency=rt.concurrency), concurrency=rt.concurrency
+        )
+        plans: list[_Plan] = []
+        for plan, err in results:
+            if err is not None:
+                raise err
+            plans.append(plan)
+        return plans
+
+    plans = []
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            g = _require_group(r, path)
+            members = list(_pages(r, f"/groups/{g.id}/members", User, {"briefRepresentation": "true"}))
+            plans.append(_diff(r, path, g, members, usernames, mode))
+    return plans
+
+
+def _apply(rt, plans: list[_Plan], *, workers: int, ignore_missing: bool) -> tuple[list[str], Counter]:
+    """Send the PUT/DELETE membership requests of every plan, several at once.
+
+    Usernames to add take their ids from the id cache; the others are resolved
+    in bulk per realm first (see UserDirectory). Only failures and users not
+    found get a line; the rest is counted.
+    """
+    # (plan, "add" | "remove", username, user id of a member to remove)
+    jobs = [(p, "add", un, "") for p in plans for un in p.add]
+    jobs += [(p, "remove", u.username, u.id) for p in plans for u in p.remove]
+
+    directory = UserDirectory()
+    progress = Progress("Membership changes", len(jobs))
+
+    def missing(p: _Plan, un: str) -> str:
+        if ignore_missing:
+            return "skipped"
+        raise RuntimeError(f"user {un!r} not found in realm {p.realm}")
+
+    if rt.async_engine:
+        async def apply_one(job) -> str:
+            p, op, un, user_id = job
+            url = f"/admin/realms/{p.realm}/users/{{}}/groups/{p.group_id}"
+            if op == "remove":
+                await keycloak_async.kc_request("DELETE", url.format(user_id))
+                return "removed"
+
+            async def resolve() -> Optional[str]:
+                u = await directory.aget(p.realm, un)
+                return u.id if u is not None else None
+
+            async def join(uid: Optional[str]) -> bool:
+                if not uid:
+                    return False
+                await keycloak_async.kc_request("PUT", url.format(uid))
+                return True
+
+            if not await idcache.acached_call(p.realm, "user", un, resolve, join):
+                return missing(p, un)
+            return "added"
+
+        async def apply_all() -> list:
+            for p in plans:
+                await directory.aprefetch(p.realm, [un for un in p.add if not idcache.known(p.realm, "user", un)])
+            return await run_ordered_async(jobs, progress.awrap(apply_one), concurrency=workers)
+
+        results = keycloak_async.run(apply_all(), concurrency=rt.concurrency)
+    else:
+        for p in plans:
+            directory.prefetch(p.realm, [un for un in p.add if not idcache.known(p.realm, "user", un)])
+
+        def apply_one(job) -> str:
+            p, op, un, user_id = job
+            url = f"/admin/realms/{p.realm}/users/{{}}/groups/{p.group_id}"
+            if op == "remove":
+                kc_request("DELETE", url.format(user_id))
+                return "removed"
+
+            def resolve() -> Optional[str]:
+                u = directory.get(p.realm, un)
+                return u.id if u is not None else None
+
+            def join(uid: Optional[str]) -> bool:
+                if not uid:
+                    return False
+                kc_request("PUT", url.format(uid))
+                return True
+
+            # a cached id saves the lookup; a 404 (user deleted) resolves the name again
+            if not idcache.cached_call(p.realm, "user", un, resolve, join):
+                return missing(p, un)
+            return "added"
+
+        results = run_ordered(jobs, progress.wrap(apply_one), workers=workers)
+    progress.close()
+
+    lines: list[str] = []
+    counts: Counter = Counter()
+    for (p, op, un, _), (status, err) in zip(jobs, results):
+        if err is not None:
+            verb = "add user {!r} to" if op == "add" else "remove user {!r} from"
+            lines.append(f"Failed to {verb.format(un)} group {p.path!r} in realm {p.realm!r}: {err}")
+            counts["failed"] += 1
+            continue
+        if status == "skipped":
+            lines.append(f"User {un!r} not found in realm {p.realm!r}. Skipped.")
+        counts[status] += 1
+    return lines, counts
+
+
+def _plan_lines(plans: list[_Plan]) -> list[str]:
+    return [
+        f"Group {p.path!r} in realm {p.realm!r}: {len(p.add)} to add, {len(p.remove)} to remove, {p.unchanged} unchanged."
+        for p in plans
+    ]
+
+
+def _change_members(
+    rt, mode: str, group: str, usernames: list[str], realm: Optional[list[str]], all_realms: bool,
+    workers: int, ignore_missing: bool, dry_run: bool = False,
+) -> None:
+    path = _normalize_path(group)
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+    realm_label = _realm_label(realm, all_realms, target_realms)
+
+    plans = _plan_realms(rt, target_realms, path, usernames, mode)
+    lines = _plan_lines(plans)
+    if dry_run:
+        for p in plans:
+            lines.extend(f"Would add {un!r} to {p.path!r} in realm {p.realm!r}." for un in p.add)
+            lines.extend(f"Would remove {u.username!r} from {p.path!r} in realm {p.realm!r}." for u in p.remove)
+        lines.append("Dry run: nothing was changed.")
+        print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        return
+
+    applied, counts = _apply(rt, plans, workers=workers, ignore_missing=ignore_missing)
+    lines.extend(applied)
+    failed = f", Failed: {counts['failed']}" if counts["failed"] else ""
+    lines.append(
+        f"Done. Added: {counts['added']}, Removed: {counts['removed']}, "
+        f"Unchanged: {sum(p.unchanged for p in plans)}, Skipped: {counts['skipped']}{failed}."
+    )
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    if counts["failed"]:
+        raise RuntimeError(f"{counts['failed']} membership change(s) failed")
+
+
+@members_app.command("add")
+def add_members(
+    ctx: typer.Context,
+    group: str = typer.Option(..., "--group", help="path of the group, e.g. /staff/it"),
+    username: list[str] = typer.Option(None, "--username", help="username(s) to add. Repeatable"),
+    file: str = typer.Option("", "--file", help="file with one username per line ('#' starts a comment)"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="add in all realms"),
+    ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip users not found instead of failing"),
+    workers: int = typer.Option(4, "--workers", min=1, help="membership requests in flight at once"),
+):
+    """Add users to a group; users that are already members are left alone."""
+    usernames = _read_usernames(username or [], file)
+    if not usernames:
+        raise RuntimeError("no usernames: provide --username or --file")
+    _change_members(ctx.obj, "add", group, usernames, realm, all_realms, workers, ignore_missing)
+
+
+@members_app.command("remove")
+def remove_members(
+    ctx: typer.Context,
+    group: str = typer.Option(..., "--group", help="path of the group, e.g. /staff/it"),
+    username: list[str] = typer.Option(None, "--username", help="username(s) to remove. Repeatable"),
+    file: str = typer.Option("", "--file", help="file with one username per line ('#' starts a comment)"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="remove in all realms"),
+    workers: int = typer.Option(4, "--workers", min=1, help="membership requests in flight at once"),
+):
+    """Remove users from a group; users that are not members are left alone."""
+    usernames = _read_usernames(username or [], file)
+    if not usernames:
+        raise RuntimeError("no usernames: provide --username or --file")
+    # members come with their ids, so removal never looks a user up
+    _change_members(ctx.obj, "remove", group, usernames, realm, all_realms, workers, ignore_missing=False)
+
+
+@members_app.command("sync")
+def sync_members(
+    ctx: typer.Context,
+    group: str = typer.Option(..., "--group", help="path of the group, e.g. /staff/it"),
+    file: str = typer.Option(..., "--file", help="file with the wanted members, one username per line"),
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="sync in all realms"),
+    ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip users not found instead of failing"),
+    workers: int = typer.Option(4, "--workers", min=1, help="membership requests in flight at once"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="only show what would be added and removed"),
+):
+    """Make the file the group's exact member list: add the missing users, remove the others."""
+    usernames = _read_usernames([], file)
+    if not usernames:
+        # an empty file would remove every member; that is almost always a mistake
+        raise RuntimeError(f"{file} lists no usernames; use `groups members remove` to empty a group")
+    _change_members(ctx.obj, "sync", group, usernames, realm, all_realms, workers, ignore_missing, dry_run)
@@ -0,0 +1,313 @@
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import typer
+
+from kc.core import admin_events, keycloak_async
+from kc.core.admin_events import changes_from, cursor_of, resync_reason
+from kc.core.box import print_box
+from kc.core.config import get_config
+from kc.core.index import DEFAULT_PATH, Index, afetch_changes, afetch_realm, fetch_changes, fetch_realm
+from kc.core.keycloak import kc_request
+from kc.core.pool import run_ordered, run_ordered_async
+
+index_app = typer.Typer(add_completion=False, help="Build the local index used by `kc find`")
+find_app = typer.Typer(add_completion=False, help="Find users, clients, roles and client scopes across realms in the local index")
+
+
+def _all_realms() -> list[str]:
+    realms = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
+    return [r["realm"] for r in realms if r.get("realm")]
+
+
+def _format_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def _format_age(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f"{hours}h {minutes}m"
+    return f"{hours // 24}d {hours % 24}h"
+
+
+def _columns(rows: list[tuple]) -> list[str]:
+    """Left-aligned columns, two spaces apart; None is shown as "-"."""
+    cells = [["-" if v is None else str(v) for v in row] for row in rows]
+    if not cells:
+        return []
+    widths = [max(len(row[i]) for row in cells) for i in range(len(cells[0]))]
+    return ["  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip() for row in cells]
+
+
+@index_app.command("build")
+def build(
+    ctx: typer.Context,
+    realm: list[str] = typer.Option(None, "--realm", help="index only these realm(s); default: all realms"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    workers: int = typer.Option(8, "--workers", min=1, help="number of realms indexed concurrently"),
+):
+    rt = ctx.obj
+
+    server = get_config().server_url
+    full = not realm
+    realms = list(realm) if realm else _all_realms()
+
+    with Index(db) as idx:
+        if rt.async_engine:
+            async def index_one_async(r: str):
+                snap = await afetch_realm(r)
+                idx.replace_realm(server, snap)
+                return snap
+
+            results = keycloak_async.run(
+                run_ordered_async(realms, index_one_async, concurrency=rt.concurrency), concurrency=rt.concurrency
+            )
+        else:
+            def index_one(r: str):
+                snap = fetch_realm(r)
+                idx.replace_realm(server, snap)
+                return snap
+
+            results = run_ordered(realms, index_one, workers=workers)
+
+        lines: list[str] = []
+        failed = 0
+        totals = [0, 0, 0, 0]
+        for r, (snap, err) in zip(realms, results):
+            if err is not None:
+                lines.append(f"Failed for realm {r!r}: {err}")
+                failed += 1
+                continue
+            counts = (len(snap.users), len(snap.clients), len(snap.roles), len(snap.scopes))
+            totals = [t + n for t, n in zip(totals, counts)]
+            lines.append(
+                f"Indexed realm {r!r}. Users: {counts[0]}, Clients: {counts[1]}, Roles: {counts[2]}, Client scopes: {counts[3]}."
+            )
+
+        # only a complete build dates the index and forgets realms that are gone
+        if full and not failed:
+            idx.finish_build(server, realms)
+
+    failed_part = f", Failed: {failed}" if failed else ""
+    lines.append(
+        f"Done. Realms: {len(realms) - failed}, Users: {totals[0]}, Clients: {totals[1]}, Roles: {totals[2]}, "
+        f"Client scopes: {totals[3]}{failed_part}."
+    )
+    lines.append(f"Index: {db}")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label="all realms" if full else ", ".join(realms))
+    if failed:
+        raise RuntimeError(f"{failed} realm(s) could not be indexed")
+
+
+def _refresh_realm(idx: Index, server: str, realm: str):
+    """Apply a realm's admin events since its cursor; falls back to a full sync when they cannot tell.
+
+    Returns (full sync reason or "", number of events, RealmSnapshot or RealmChanges).
+    """
+    cursor = idx.cursor(server, realm)
+    reason = resync_reason(kc_request("GET", f"/admin/realms/{realm}"), cursor)
+    if not reason:
+        try:
+            events, reached = admin_events.events_since(realm, cursor)
+        except RuntimeError as e:
+            reason = f"admin events could not be read: {e}"
+        else:
+            if not reached:
+                reason = "admin events since the cursor are gone"
+    if reason:
+        snap = fetch_realm(realm)
+        idx.replace_realm(server, snap)
+        return reason, 0, snap
+    changes = fetch_changes(realm, changes_from(events), cursor_of(events[0]) if events else cursor)
+    idx.apply_changes(server, changes)
+    return "", len(events), changes
+
+
+async def _arefresh_realm(idx: Index, server: str, realm: str):
+    cursor = idx.cursor(server, realm)
+    reason = resync_reason(await keycloak_async.kc_request("GET", f"/admin/realms/{realm}"), cursor)
+    if not reason:
+        try:
+            events, reached = await admin_events.aevents_since(realm, cursor)
+        except RuntimeError as e:
+            reason = f"admin events could not be read: {e}"
+        else:
+            if not reached:
+                reason = "admin events since the cursor are gone"
+    if reason:
+        snap = await afetch_realm(realm)
+        idx.replace_realm(server, snap)
+        return reason, 0, snap
+    changes = await afetch_changes(realm, changes_from(events), cursor_of(events[0]) if events else cursor)
+    idx.apply_changes(server, changes)
+    return "", len(events), changes
+
+
+@index_app.command("refresh")
+def refresh(
+    ctx: typer.Context,
+    realm: list[str] = typer.Option(None, "--realm", help="refresh only these realm(s); default: all realms"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    workers: int = typer.Option(8, "--workers", min=1, help="number of realms refreshed concurrently"),
+):
+    """Bring the index up to date from the admin events since the last build or refresh.
+
+    Only the objects the events name are read again. A realm without admin events,
+    or whose events since the last run have expired, is indexed in full instead.
+    """
+    rt = ctx.obj
+
+    server = get_config().server_url
+    full = not realm
+    realms = list(realm) if realm else _all_realms()
+
+    with Index(db) as idx:
+        if rt.async_engine:
+            results = keycloak_async.run(
+                run_ordered_async(realms, lambda r: _arefresh_realm(idx, server, r), concurrency=rt.concurrency),
+                concurrency=rt.concurrency,
+            )
+        else:
+            results = run_ordered(realms, lambda r: _refresh_realm(idx, server, r), workers=workers)
+
+        lines: list[str] = []
+        failed = resynced = events_total = 0
+        for r, (res, err) in zip(realms, results):
+            if err is not None:
+                lines.append(f"Failed for realm {r!r}: {err}")
+                failed += 1
+                continue
+            reason, n_events, rows = res
+            if reason:
+                resynced += 1
+                lines.append(f"Realm {r!r}: indexed in full ({reason}).")
+            else:
+                events_total += n_events
+                lines.append(f"Realm {r!r}: {n_events} event(s), {len(rows.changes)} object(s) read again.")
+
+        if full and not failed:
+            idx.finish_build(server, realms)
+
+    failed_part = f", Failed: {failed}" if failed else ""
+    lines.append(f"Done. Realms: {len(realms) - failed}, Events: {events_total}, Indexed in full: {resynced}{failed_part}.")
+    lines.append(f"Index: {db}")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label="all realms" if full else ", ".join(realms))
+    if failed:
+        raise RuntimeError(f"{failed} realm(s) could not be refreshed")
+
+
+@index_app.command("status")
+def status(
+    ctx: typer.Context,
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+):
+    rt = ctx.obj
+
+    server = get_config().server_url
+    with Index(db) as idx:
+        built_at = idx.built_at(server)
+        totals = idx.totals(server)
+
+    lines = [f"Server: {server}", f"Index: {db}"]
+    if built_at is None:
+        lines.append("Built: never (run `kc index build`)")
+    else:
+        lines.append(f"Built: {_format_time(built_at)} ({_format_age(time.time() - built_at)} ago)")
+    lines.append(
+        f"Realms: {totals['realms']}, Users: {totals['users']}, Clients: {totals['clients']}, Roles: {totals['roles']}, "
+        f"Client scopes: {totals['scopes']}"
+    )
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label="all realms")
+
+
+def _open_for_find(db: str, max_age: float) -> tuple[Index, str, str]:
+    """Open the index and check it covers the configured server; returns (index, server, age line)."""
+    server = get_config().server_url
+    if not Path(db).exists():
+        raise RuntimeError(f"index {db} not found; run `kc index build` first")
+    idx = Index(db)
+    built_at = idx.built_at(server)
+    if built_at is None:
+        idx.close()
+        raise RuntimeError(f"{db} has no index of {server}; run `kc index build` first")
+    age = time.time() - built_at
+    if max_age and age > max_age * 3600:
+        idx.close()
+        raise RuntimeError(
+            f"the index of {server} is {_format_age(age)} old, more than --max-age {max_age:g}h; run `kc index build`"
+        )
+    return idx, server, f"Index built {_format_time(built_at)} ({_format_age(age)} ago)."
+
+
+def _print_found(rt, rows: list[tuple], age_line: str) -> None:
+    lines = _columns(rows)
+    lines.append(f"Total: {len(rows)}")
+    lines.append(age_line)
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label="all realms")
+
+
+@find_app.command("user")
+def find_user(
+    ctx: typer.Context,
+    text: str = typer.Argument(..., help="username or email; * matches any text"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    max_age: float = typer.Option(0, "--max-age", help="fail if the index is older than this many hours (0: no limit)"),
+):
+    rt = ctx.obj
+    idx, server, age_line = _open_for_find(db, max_age)
+    with idx:
+        rows = idx.find_users(server, text)
+    _print_found(rt, rows, age_line)
+
+
+@find_app.command("client")
+def find_client(
+    ctx: typer.Context,
+    text: str = typer.Argument("", help="clientId; * matches any text"),
+    redirect_uri: str = typer.Option("", "--redirect-uri", help="find clients with this redirect URI instead; * matches any text"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    max_age: float = typer.Option(0, "--max-age", help="fail if the index is older than this many hours (0: no limit)"),
+):
+    rt = ctx.obj
+    if bool(text) == bool(redirect_uri):
+        raise RuntimeError("pass either a clientId or --redirect-uri")
+    idx, server, age_line = _open_for_find(db, max_age)
+    with idx:
+        rows = idx.find_clients_by_redirect_uri(server, redirect_uri) if redirect_uri else idx.find_clients(server, text)
+    _print_found(rt, rows, age_line)
+
+
+@find_app.command("role")
+def find_role(
+    ctx: typer.Context,
+    text: str = typer.Argument(..., help="role name; * matches any text"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    max_age: float = typer.Option(0, "--max-age", help="fail if the index is older than this many hours (0: no limit)"),
+):
+    rt = ctx.obj
+    idx, server, age_line = _open_for_find(db, max_age)
+    with idx:
+        rows = [
+            (r, name, f"client {client}" if client else "realm role", description)
+            for r, name, client, description in idx.find_roles(server, text)
+        ]
+    _print_found(rt, rows, age_line)
+
+
+@find_app.command("scope")
+def find_scope(
+    ctx: typer.Context,
+    text: str = typer.Argument(..., help="client scope name; * matches any text"),
+    db: str = typer.Option(DEFAULT_PATH, "--db", help="index database file"),
+    max_age: float = typer.Option(0, "--max-age", help="fail if the index is older than this many hours (0: no limit)"),
+):
+    rt = ctx.obj
+    idx, server, age_line = _open_for_find(db, max_age)
+    with idx:
+        rows = idx.find_scopes(server, text)
+    _print_found(rt, rows, age_line)
@@ -7,10 +7,16 @@ realms_app = typer.Typer(add_completion=False, help="Manage realms")
 
 
 @realms_app.command("list")
-def list_realms(ctx: typer.Context):
+def list_realms(
+    ctx: typer.Context,
+    count: bool = typer.Option(False, "--count", help="print only the number of realms"),
+):
     rt = ctx.obj
     try:
-        realms = kc_request("GET", "/admin/realms")
+        realms = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
+        if count:
+            print_box([f"Total: {len(realms)}"], jira_ticket=rt.jira_ticket, realm_label="all realms")
+            return
         lines = []
         for r in realms:
             name = r.get("realm")
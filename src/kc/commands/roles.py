@@ -1,15 +1,19 @@
+from collections import Counter
+
 import typer
 
+from kc.core import keycloak_async, trace
 from kc.core.box import print_box
-from kc.core.config import GLOBAL
+from kc.core.config import get_config
 from kc.core.keycloak import kc_request
+from kc.core.pool import run_ordered_async
 
 roles_app = typer.Typer(add_completion=False, help="Manage roles")
 
 
 def _resolve_target_realms(rt, realm: str, all_realms: bool) -> list[str]:
     if all_realms:
-        realms = kc_request("GET", "/admin/realms")
+        realms = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
         out: list[str] = []
         for r in realms:
             name = r.get("realm")
@@ -17,7 +21,7 @@ def _resolve_target_realms(rt, realm: str, all_realms: bool) -> list[str]:
                 out.append(name)
         return out
 
-    r = realm or rt.default_realm or GLOBAL.realm
+    r = realm or rt.default_realm or get_config().realm
     if not r:
         raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
     return [r]
@@ -42,6 +46,52 @@ def _pick(values: list[str], i: int) -> str:
     return values[i]
 
 
+def _realm_label(all_realms: bool, realm: str, target_realms: list[str]) -> str:
+    if all_realms:
+        return "all realms"
+    if realm:
+        return realm
+    if len(target_realms) == 1:
+        return target_realms[0]
+    return ""
+
+
+def _unchanged(current: dict, changes: dict) -> bool:
+    # Keycloak leaves an empty description out of the representation
+    return all((current.get(k) or "") == v for k, v in changes.items())
+
+
+def _run_async(rt, jobs: list[tuple[str, int, str]], fn) -> tuple[list[str], Counter]:
+    """Run fn(realm, index, name) for every job on the async engine.
+
+    Lines and counts come back in job order. A failing job becomes a line and is
+    counted as "failed"; the other jobs keep going.
+    """
+    results = keycloak_async.run(
+        run_ordered_async(jobs, lambda job: fn(*job), concurrency=rt.concurrency), concurrency=rt.concurrency
+    )
+    lines: list[str] = []
+    counts: Counter = Counter()
+    for (r, _, rn), (res, err) in zip(jobs, results):
+        if err is not None:
+            lines.append(f"Failed for role {rn!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        status, line = res
+        lines.append(line)
+        counts[status] += 1
+    return lines, counts
+
+
+def _finish_async(rt, lines: list[str], counts: Counter, verb: str, realm_label: str) -> None:
+    failed = f", Failed: {counts['failed']}" if counts["failed"] else ""
+    unchanged = f", Unchanged: {counts['unchanged']}" if verb == "updated" else ""
+    lines.append(f"Done. {verb.capitalize()}: {counts[verb]}{unchanged}, Skipped: {counts['skipped']}{failed}.")
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    if counts["failed"]:
+        raise RuntimeError(f"{counts['failed']} role operation(s) failed")
+
+
 @roles_app.command("create")
 def roles_create(
     ctx: typer.Context,
@@ -81,38 +131,48 @@ def roles_create(
 
     target_realms = _resolve_target_realms(rt, realm=realm, all_realms=all_realms)
 
-    created = 0
-    skipped = 0
-    lines: list[str] = []
-
-    for r in target_realms:
-        for i, rn in enumerate(role_names):
+    if rt.async_engine:
+        async def create_one(r: str, i: int, rn: str) -> tuple[str, str]:
             try:
-                kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
-                lines.append(f"Role {rn!r} already exists in realm {r!r}. Skipped.")
-                skipped += 1
-                continue
+                await keycloak_async.kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
+                return "skipped", f"Role {rn!r} already exists in realm {r!r}. Skipped."
             except Exception as e:
                 if not _is_404(e):
                     raise RuntimeError(f"failed checking role in realm {r}: {e}")
+            payload = {"name": rn, "description": _pick(role_descs, i)}
+            await keycloak_async.kc_request("POST", f"/admin/realms/{r}/roles", json=payload)
+            return "created", f"Created role {rn!r} in realm {r!r}."
 
-            desc = _pick(role_descs, i)
-            payload = {"name": rn, "description": desc}
-            kc_request("POST", f"/admin/realms/{r}/roles", json=payload)
-            lines.append(f"Created role {rn!r} in realm {r!r}.")
-            created += 1
+        jobs = [(r, i, rn) for r in target_realms for i, rn in enumerate(role_names)]
+        lines, counts = _run_async(rt, jobs, create_one)
+        _finish_async(rt, lines, counts, "created", _realm_label(all_realms, realm, target_realms))
+        return
 
-    lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
+    created = 0
+    skipped = 0
+    lines: list[str] = []
 
-    realm_label = ""
-    if all_realms:
-        realm_label = "all realms"
-    elif realm:
-        realm_label = realm
-    elif len(target_realms) == 1:
-        realm_label = target_realms[0]
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            for i, rn in enumerate(role_names):
+                try:
+                    kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
+                    lines.append(f"Role {rn!r} already exists in realm {r!r}. Skipped.")
+                    skipped += 1
+                    continue
+                except Exception as e:
+                    if not _is_404(e):
+                        raise RuntimeError(f"failed checking role in realm {r}: {e}")
+
+                desc = _pick(role_descs, i)
+                payload = {"name": rn, "description": desc}
+                kc_request("POST", f"/admin/realms/{r}/roles", json=payload)
+                lines.append(f"Created role {rn!r} in realm {r!r}.")
+                created += 1
 
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
+
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, target_realms))
 
 
 @roles_app.command("update")
@@ -124,6 +184,7 @@ def roles_update(
     all_realms: bool = typer.Option(False, "--all-realms", help="update role(s) in all realms"),
     realm: str = typer.Option("", "--realm", help="target realm"),
     ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip roles not found instead of failing"),
+    force: bool = typer.Option(False, "--force", help="send the update even when the role already has these values"),
 ):
     rt = ctx.obj
 
@@ -141,44 +202,70 @@ def roles_update(
 
     target_realms = _resolve_target_realms(rt, realm=realm, all_realms=all_realms)
 
-    updated = 0
-    skipped = 0
-    lines: list[str] = []
+    def changes_for(i: int) -> dict:
+        changes: dict = {}
+        if len(role_descs) > 0:
+            changes["description"] = _pick(role_descs, i)
+        if len(new_names) > 0:
+            changes["name"] = _pick(new_names, i)
+        return changes
 
-    for r in target_realms:
-        for i, rn in enumerate(role_names):
+    if rt.async_engine:
+        async def update_one(r: str, i: int, rn: str) -> tuple[str, str]:
             try:
-                role = kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
+                role = await keycloak_async.kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
             except Exception as e:
                 if _is_404(e):
                     if ignore_missing:
-                        lines.append(f"Role {rn!r} not found in realm {r!r}. Skipped.")
-                        skipped += 1
-                        continue
+                        return "skipped", f"Role {rn!r} not found in realm {r!r}. Skipped."
                     raise RuntimeError(f"role {rn!r} not found in realm {r}")
                 raise RuntimeError(f"failed fetching role {rn!r} in realm {r}: {e}")
+            changes = changes_for(i)
+            if not force and _unchanged(role, changes):
+                return "unchanged", f"Role {rn!r} in realm {r!r} unchanged."
+            role.update(changes)
+            await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/roles/{rn}", json=role)
+            return "updated", f"Updated role {rn!r} in realm {r!r}. New name: {role.get('name', rn)!r}."
+
+        jobs = [(r, i, rn) for r in target_realms for i, rn in enumerate(role_names)]
+        lines, counts = _run_async(rt, jobs, update_one)
+        _finish_async(rt, lines, counts, "updated", _realm_label(all_realms, realm, target_realms))
+        return
 
-            if len(role_descs) > 0:
-                role["description"] = _pick(role_descs, i)
-            if len(new_names) > 0:
-                role["name"] = _pick(new_names, i)
-
-            kc_request("PUT", f"/admin/realms/{r}/roles/{rn}", json=role)
-            final_name = role.get("name", rn)
-            lines.append(f"Updated role {rn!r} in realm {r!r}. New name: {final_name!r}.")
-            updated += 1
-
-    lines.append(f"Done. Updated: {updated}, Skipped: {skipped}.")
-
-    realm_label = ""
-    if all_realms:
-        realm_label = "all realms"
-    elif realm:
-        realm_label = realm
-    elif len(target_realms) == 1:
-        realm_label = target_realms[0]
+    updated = 0
+    unchanged = 0
+    skipped = 0
+    lines: list[str] = []
 
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            for i, rn in enumerate(role_names):
+                try:
+                    role = kc_request("GET", f"/admin/realms/{r}/roles/{rn}")
+                except Exception as e:
+                    if _is_404(e):
+                        if ignore_missing:
+                            lines.append(f"Role {rn!r} not found in realm {r!r}. Skipped.")
+                            skipped += 1
+                            continue
+                        raise RuntimeError(f"role {rn!r} not found in realm {r}")
+                    raise RuntimeError(f"failed fetching role {rn!r} in realm {r}: {e}")
+
+                changes = changes_for(i)
+                if not force and _unchanged(role, changes):
+                    lines.append(f"Role {rn!r} in realm {r!r} unchanged.")
+                    unchanged += 1
+                    continue
+                role.update(changes)
+
+                kc_request("PUT", f"/admin/realms/{r}/roles/{rn}", json=role)
+                final_name = role.get("name", rn)
+                lines.append(f"Updated role {rn!r} in realm {r!r}. New name: {final_name!r}.")
+                updated += 1
+
+    lines.append(f"Done. Updated: {updated}, Unchanged: {unchanged}, Skipped: {skipped}.")
+
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, target_realms))
 
 
 @roles_app.command("delete")
@@ -197,33 +284,43 @@ def roles_delete(
 
     target_realms = _resolve_target_realms(rt, realm=realm, all_realms=all_realms)
 
-    deleted = 0
-    skipped = 0
-    lines: list[str] = []
-
-    for r in target_realms:
-        for rn in role_names:
+    if rt.async_engine:
+        async def delete_one(r: str, i: int, rn: str) -> tuple[str, str]:
             try:
-                kc_request("DELETE", f"/admin/realms/{r}/roles/{rn}")
-                lines.append(f"Deleted role {rn!r} in realm {r!r}.")
-                deleted += 1
+                await keycloak_async.kc_request("DELETE", f"/admin/realms/{r}/roles/{rn}")
+                return "deleted", f"Deleted role {rn!r} in realm {r!r}."
             except Exception as e:
                 if _is_404(e):
                     if ignore_missing:
-                        lines.append(f"Role {rn!r} not found in realm {r!r}. Skipped.")
-                        skipped += 1
-                        continue
+                        return "skipped", f"Role {rn!r} not found in realm {r!r}. Skipped."
                     raise RuntimeError(f"role {rn!r} not found in realm {r}")
                 raise RuntimeError(f"failed deleting role {rn!r} in realm {r}: {e}")
 
-    lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
+        jobs = [(r, i, rn) for r in target_realms for i, rn in enumerate(role_names)]
+        lines, counts = _run_async(rt, jobs, delete_one)
+        _finish_async(rt, lines, counts, "deleted", _realm_label(all_realms, realm, target_realms))
+        return
 
-    realm_label = ""
-    if all_realms:
-        realm_label = "all realms"
-    elif realm:
-        realm_label = realm
-    elif len(target_realms) == 1:
-        realm_label = target_realms[0]
+    deleted = 0
+    skipped = 0
+    lines: list[str] = []
 
-    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    for r in target_realms:
+        with trace.span("realm", realm=r):
+            for rn in role_names:
+                try:
+                    kc_request("DELETE", f"/admin/realms/{r}/roles/{rn}")
+                    lines.append(f"Deleted role {rn!r} in realm {r!r}.")
+                    deleted += 1
+                except Exception as e:
+                    if _is_404(e):
+                        if ignore_missing:
+                            lines.append(f"Role {rn!r} not found in realm {r!r}. Skipped.")
+                            skipped += 1
+                            continue
+                        raise RuntimeError(f"role {rn!r} not found in realm {r}")
+                    raise RuntimeError(f"failed deleting role {rn!r} in realm {r}: {e}")
+
+    lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
+
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=_realm_label(all_realms, realm, target_realms))
@@ -0,0 +1,157 @@
+import time
+
+import typer
+
+from kc.core import keycloak_async
+from kc.core.box import print_box
+from kc.core.config import get_config
+from kc.core.keycloak import kc_request
+from kc.core.pool import run_ordered, run_ordered_async
+from kc.core.seed import SeedProgress, SeedSpec
+
+
+def _is_404(err: Exception) -> bool:
+    return "404" in str(err).lower()
+
+
+def _resolve_target_realms(rt, realms: list[str]) -> list[str]:
+    if realms:
+        return list(realms)
+
+    r = rt.default_realm or get_config().realm
+    if not r:
+        raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
+    return [r]
+
+
+def _ensure_realm(realm: str) -> bool:
+    """Create the realm if it does not exist; True if it was created."""
+    try:
+        kc_request("GET", f"/admin/realms/{realm}")
+        return False
+    except RuntimeError as e:
+        if not _is_404(e):
+            raise
+    kc_request("POST", "/admin/realms", json={"realm": realm, "enabled": True})
+    return True
+
+
+def _rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:.0f}/s" if seconds > 0 else "-"
+
+
+def _seed_scopes(spec: SeedSpec, realm: str) -> tuple[int, int]:
+    """Create the spec's client scopes that are missing; (added, skipped)."""
+    names = {s.get("name") for s in kc_request("GET", f"/admin/realms/{realm}/client-scopes", fields=("name",))}
+    missing = [n for n in range(1, spec.count("client_scopes") + 1) if spec.scope_name(n) not in names]
+    for n in missing:
+        kc_request("POST", f"/admin/realms/{realm}/client-scopes", json=spec.scope(n))
+    return len(missing), spec.count("client_scopes") - len(missing)
+
+
+def seed(
+    ctx: typer.Context,
+    spec_file: str = typer.Argument(..., help="JSON spec with counts, name patterns and a random seed"),
+    realm: list[str] = typer.Option(None, "--realm", help="realm(s) to seed; created if missing. If omitted, uses default or config.json"),
+    batch_size: int = typer.Option(500, "--batch-size", min=1, help="users or realm roles per import request (clients: a tenth)"),
+    workers: int = typer.Option(4, "--workers", min=1, help="import requests in flight at once (also with --async)"),
+    progress_file: str = typer.Option("", "--progress", help="progress file for re-runs (default: <spec>.progress)"),
+):
+    """Create synthetic users, roles, clients, client roles and client scopes for scale tests.
+
+    Objects go in through partialImport in batches, several at once, skipping any
+    that already exist. Finished batches are recorded in the progress file, so a
+    re-run of the same spec continues where the last one stopped.
+    """
+    rt = ctx.obj
+
+    spec = SeedSpec.load(spec_file)
+    target_realms = _resolve_target_realms(rt, realm or [])
+    server = get_config().server_url
+    client_batch = max(1, batch_size // 10)
+    # (phase, label, objects, objects per batch, body builder)
+    phases = [
+        ("roles", "Realm roles", spec.count("roles"), batch_size, spec.roles_import),
+        ("clients", "Clients and client roles", spec.count("clients"), client_batch, spec.clients_import),
+        ("users", "Users", spec.count("users"), batch_size, spec.users_import),
+    ]
+
+    lines: list[str] = []
+    failed = 0
+    total_added = total_skipped = 0
+    started = time.perf_counter()
+    with SeedProgress(progress_file or f"{spec_file}.progress", spec.digest, batch_size) as progress:
+        for r in target_realms:
+            if _ensure_realm(r):
+                lines.append(f"Created realm {r!r}.")
+            path = f"/admin/realms/{r}/partialImport"
+
+            if spec.count("client_scopes"):
+                t0 = time.perf_counter()
+                added, skipped = _seed_scopes(spec, r)
+                seconds = time.perf_counter() - t0
+                total_added += added
+                total_skipped += skipped
+                lines.append(f"[{r}] Client scopes: added {added}, skipped {skipped}, {seconds:.1f}s ({_rate(added, seconds)}).")
+
+            for phase, label, count, per_batch, build in phases:
+                if not count:
+                    continue
+                batches = [b for b in range((count + per_batch - 1) // per_batch) if not progress.is_done(server, r, phase, b)]
+                already = (count + per_batch - 1) // per_batch - len(batches)
+
+                def bounds(b: int) -> tuple[int, int]:
+                    return b * per_batch, min(count, (b + 1) * per_batch)
+
+                if rt.async_engine:
+                    async def import_batch_async(b: int):
+                        res = await keycloak_async.kc_request("POST", path, json=build(*bounds(b)))
+                        progress.mark(server, r, phase, b)
+                        return res
+
+                    t0 = time.perf_counter()
+                    results = keycloak_async.run(
+                        run_ordered_async(batches, import_batch_async, concurrency=workers), concurrency=rt.concurrency
+                    )
+                else:
+                    def import_batch(b: int):
+                        res = kc_request("POST", path, json=build(*bounds(b)))
+                        progress.mark(server, r, phase, b)
+                        return res
+
+                    t0 = time.perf_counter()
+                    results = run_ordered(batches, import_batch, workers=workers)
+                seconds = time.perf_counter() - t0
+
+                added = skipped = phase_failed = 0
+                for b, (res, err) in zip(batches, results):
+                    if err is not None:
+                        lines.append(f"[{r}] Failed {phase} batch {b}: {err}")
+                        phase_failed += 1
+                        continue
+                    # partialImport counts client roles along with their clients
+                    added += int((res or {}).get("added") or 0)
+                    skipped += int((res or {}).get("skipped") or 0)
+                total_added += added
+                total_skipped += skipped
+                resumed = f", {already} batch(es) already done" if already else ""
+                lines.append(
+                    f"[{r}] {label}: added {added}, skipped {skipped} in {len(batches)} request(s){resumed}, "
+                    f"{seconds:.1f}s ({_rate(added + skipped, seconds)})."
+                )
+                if phase_failed:
+                    # later phases refer to these objects (users map roles, clients use scopes)
+                    failed += phase_failed
+                    if phase != phases[-1][0]:
+                        lines.append(f"[{r}] Stopped after {label.lower()}; nothing later is seeded in this realm.")
+                    break
+
+    seconds = time.perf_counter() - started
+    failed_part = f", Failed batches: {failed}" if failed else ""
+    lines.append(
+        f"Done. Added: {total_added}, Skipped: {total_skipped} in {seconds:.1f}s "
+        f"({_rate(total_added + total_skipped, seconds)}){failed_part}."
+    )
+    print_box(lines, jira_ticket=rt.jira_ticket, realm_label=", ".join(target_realms))
+    if failed:
+        raise RuntimeError(f"{failed} batch(es) failed; run the same command again to retry them")
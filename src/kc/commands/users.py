@@ -1,12 +1,22 @@
 import secrets
 import string
-from typing import Optional
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
 
 import typer
 
+from kc.core import idcache, keycloak_async, trace
 from kc.core.box import print_box
-from kc.core.config import GLOBAL
-from kc.core.keycloak import kc_request
+from kc.core.config import get_config
+from kc.core.counts import count_lines, realm_counts
+from kc.core.directory import UserDirectory, asearch_user, search_user
+from kc.core.keycloak import kc_raw_request, kc_request
+from kc.core.models import Client, Role, User
+from kc.core.pool import run_ordered, run_ordered_async
+from kc.core.progress import Progress
+from kc.core.ratelimit import RateLimit
+from kc.core.userquery import ResultLog, UserQuery, afind_users, find_users
 
 users_app = typer.Typer(add_completion=False, help="Manage users")
 
@@ -32,7 +42,7 @@ def _pick(values: list[str], i: int) -> str:
 
 def _resolve_target_realms(rt, realms: list[str], all_realms: bool) -> list[str]:
     if all_realms:
-        rs = kc_request("GET", "/admin/realms")
+        rs = kc_request("GET", "/admin/realms", params={"briefRepresentation": "true"}, fields=("realm",))
         out: list[str] = []
         for r in rs:
             name = r.get("realm")
@@ -43,18 +53,16 @@ def _resolve_target_realms(rt, realms: list[str], all_realms: bool) -> list[str]
     if realms:
         return list(realms)
 
-    r = rt.default_realm or GLOBAL.realm
+    r = rt.default_realm or get_config().realm
     if not r:
         raise RuntimeError("target realm not specified. Use --realm or set realm in config.json")
     return [r]
 
 
-def _search_user(realm: str, username: str) -> Optional[dict]:
-    users = kc_request("GET", f"/admin/realms/{realm}/users", params={"username": username})
-    for u in users:
-        if u.get("username") == username:
-            return u
-    return None
+def _created_id(resp) -> str:
+    # Keycloak answers a create with 201 and a Location header ending in the new id
+    location = resp.headers.get("location", "")
+    return location.rstrip("/").rsplit("/", 1)[-1] if location else ""
 
 
 def _validate_password_strength(pw: str) -> None:
@@ -93,19 +101,252 @@ def _generate_strong_password(n: int) -> str:
 
 
 def _get_client_internal_id(realm: str, client_id: str) -> str:
-    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id})
+    clients = kc_request("GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client)
     for c in clients:
-        if c.get("clientId") == client_id and c.get("id"):
-            return c["id"]
+        if c.client_id == client_id and c.id:
+            return c.id
     raise RuntimeError(f"client {client_id!r} not found in realm {realm}")
 
 
-def _get_realm_role(realm: str, role_name: str) -> dict:
-    return kc_request("GET", f"/admin/realms/{realm}/roles/{role_name}")
+async def _get_client_internal_id_async(realm: str, client_id: str) -> str:
+    clients = await keycloak_async.kc_request(
+        "GET", f"/admin/realms/{realm}/clients", params={"clientId": client_id}, model=Client
+    )
+    for c in clients:
+        if c.client_id == client_id and c.id:
+            return c.id
+    raise RuntimeError(f"client {client_id!r} not found in realm {realm}")
+
+
+@dataclass
+class _UserOutcome:
+    status: str
+    lines: list[str] = field(default_factory=list)
+    password: str = ""
+
+
+def _run_user_pipelines(
+    jobs: list[tuple[str, int, str]],
+    pipeline: Callable[[tuple[str, int, str]], _UserOutcome],
+    *,
+    workers: int,
+    verb: str,
+) -> tuple[list[str], Counter, list[str]]:
+    """Run one pipeline per (realm, index, username) job and merge the outcomes in input order.
+
+    Jobs for the same username in the same realm never overlap. A failing job is
+    reported as a line and counted as "failed"; the other jobs keep going.
+    """
+    def traced(job: tuple[str, int, str]) -> _UserOutcome:
+        with trace.span("user", realm=job[0], username=job[2]) as sp:
+            outcome = pipeline(job)
+            sp.set(status=outcome.status)
+            return outcome
+
+    results = run_ordered(jobs, traced, workers=workers, key=_job_key)
+    return _merge_outcomes(jobs, results, verb)
 
 
-def _get_client_role(realm: str, internal_client_id: str, role_name: str) -> dict:
-    return kc_request("GET", f"/admin/realms/{realm}/clients/{internal_client_id}/roles/{role_name}")
+def _job_key(job: tuple[str, int, str]) -> tuple[str, str]:
+    # jobs for the same username in the same realm never overlap
+    return job[0], job[2].lower()
+
+
+def _merge_outcomes(
+    jobs: list[tuple[str, int, str]], results: list, verb: str
+) -> tuple[list[str], Counter, list[str]]:
+    lines: list[str] = []
+    counts: Counter = Counter()
+    passwords: list[str] = []
+    for (r, _, un), (outcome, err) in zip(jobs, results):
+        if err is not None:
+            lines.append(f"Failed to {verb} user {un!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        lines.extend(outcome.lines)
+        counts[outcome.status] += 1
+        if outcome.password:
+            passwords.append(outcome.password)
+    return lines, counts, passwords
+
+
+async def _run_user_pipelines_async(
+    directory: UserDirectory,
+    usernames: list[str],
+    jobs: list[tuple[str, int, str]],
+    pipeline: Callable[[tuple[str, int, str]], Awaitable[_UserOutcome]],
+    *,
+    concurrency: int,
+    prepare_realm: Optional[Callable[[str], Awaitable[None]]] = None,
+    skip_cached: bool = False,
+) -> list:
+    """Async _run_user_pipelines: prefetch every target realm, then run the jobs.
+
+    With skip_cached, usernames the id cache knows are left out of the prefetch.
+    Realm preparation fails the whole command, as in the threaded path; the
+    (outcome, error) pairs of the jobs are merged by the caller.
+    """
+    async def prepare(r: str) -> None:
+        await directory.aprefetch(r, _uncached(r, usernames) if skip_cached else usernames)
+        if prepare_realm is not None:
+            await prepare_realm(r)
+
+    realms = list(dict.fromkeys(j[0] for j in jobs))
+    for _, err in await run_ordered_async(realms, prepare, concurrency=concurrency):
+        if err is not None:
+            raise err
+    return await run_ordered_async(jobs, pipeline, concurrency=concurrency, key=_job_key)
+
+
+def _uncached(realm: str, usernames: list[str]) -> list[str]:
+    # users with an id in the id cache are read by id instead of being looked up
+    return [un for un in usernames if not idcache.known(realm, "user", un)]
+
+
+def _unchanged(current: User, patch: dict) -> bool:
+    return all(current.get(k) == v for k, v in patch.items())
+
+
+def _failed_suffix(counts: Counter) -> str:
+    return f", Failed: {counts['failed']}" if counts["failed"] else ""
+
+
+def _raise_if_failed(counts: Counter) -> None:
+    if counts["failed"]:
+        raise RuntimeError(f"{counts['failed']} user operation(s) failed")
+
+
+def _parse_query(
+    usernames: list[str], match: str, search: str, attributes: list[str], created_before: str, disabled: bool,
+    dry_run: bool, rate: float, results: str,
+) -> UserQuery:
+    query = UserQuery.parse(match, search, attributes, created_before, disabled)
+    if query and usernames:
+        raise RuntimeError("--username cannot be combined with --match/--search/--attribute/--created-before/--disabled")
+    if not query and (dry_run or rate or results):
+        raise RuntimeError(
+            "--dry-run, --rate and --results need a selector: --match, --search, --attribute, --created-before or --disabled"
+        )
+    return query
+
+
+def _run_query(
+    rt,
+    target_realms: list[str],
+    query: UserQuery,
+    verb: str,
+    apply_one: Callable[[str, User], str],
+    aapply_one: Callable[[str, User], Awaitable[str]],
+    *,
+    dry_run: bool,
+    rate: float,
+    results: str,
+    workers: int,
+) -> tuple[list[str], Counter]:
+    """Apply a change to every user the query matches in the target realms.
+
+    All matches are listed before the first change: deleting or updating users
+    while paging through them would shift the pages under the walk. The changes
+    then run `workers` (or --concurrency) at a time, paced by `rate`, and each
+    finished user is written to the `results` log. apply_one returns the status
+    to count; a user that is gone by then (404) counts as skipped. With dry_run,
+    the matches are only counted (as "matched") and logged.
+    """
+    if rt.async_engine:
+        async def afind(r: str) -> list[User]:
+            return await afind_users(r, query)
+
+        found = keycloak_async.run(
+            run_ordered_async(target_realms, afind, concurrency=rt.concurrency), concurrency=rt.concurrency
+        )
+    else:
+        found = []
+        for r in target_realms:
+            with trace.span("realm", realm=r):
+                found.append((find_users(r, query), None))
+
+    lines: list[str] = []
+    jobs: list[tuple[str, User]] = []
+    for r, (users, err) in zip(target_realms, found):
+        if err is not None:
+            raise err
+        lines.append(f"{len(users)} user(s) in realm {r!r} match {query.describe()}.")
+        jobs.extend((r, u) for u in users)
+
+    counts: Counter = Counter()
+    with ResultLog(results) as log:
+        if dry_run:
+            for r, u in jobs:
+                log.write(r, u, "matched")
+            counts["matched"] = len(jobs)
+            return lines, counts
+
+        limit = RateLimit(rate)
+        progress = Progress(f"Users to {verb}", len(jobs))
+
+        def settle(r: str, u: User, err: Exception) -> str:
+            # the user was deleted since the listing; anything else fails this user
+            if isinstance(err, RuntimeError) and _is_404(err):
+                return "skipped"
+            log.write(r, u, "failed", str(err))
+            raise err
+
+        if rt.async_engine:
+            async def run_one(job: tuple[str, User]) -> str:
+                r, u = job
+                await limit.await_slot()
+                try:
+                    status = await aapply_one(r, u)
+                except Exception as e:
+                    status = settle(r, u, e)
+                log.write(r, u, status)
+                return status
+
+            outcomes = keycloak_async.run(
+                run_ordered_async(jobs, progress.awrap(run_one), concurrency=rt.concurrency),
+                concurrency=rt.concurrency,
+            )
+        else:
+            def run_one(job: tuple[str, User]) -> str:
+                r, u = job
+                limit.wait()
+                with trace.span("user", realm=r, username=u.username) as sp:
+                    try:
+                        status = apply_one(r, u)
+                    except Exception as e:
+                        status = settle(r, u, e)
+                    sp.set(status=status)
+                log.write(r, u, status)
+                return status
+
+            outcomes = run_ordered(jobs, progress.wrap(run_one), workers=workers)
+        progress.close()
+
+    for (r, u), (status, err) in zip(jobs, outcomes):
+        if err is not None:
+            lines.append(f"Failed to {verb} user {u.username!r} in realm {r!r}: {err}")
+            counts["failed"] += 1
+            continue
+        counts[status] += 1
+    return lines, counts
+
+
+def _get_realm_role(realm: str, role_name: str) -> Role:
+    return kc_request("GET", f"/admin/realms/{realm}/roles/{role_name}", model=Role)
+
+
+def _get_client_role(realm: str, internal_client_id: str, role_name: str) -> Role:
+    return kc_request("GET", f"/admin/realms/{realm}/clients/{internal_client_id}/roles/{role_name}", model=Role)
+
+
+async def _get_realm_role_async(realm: str, role_name: str) -> Role:
+    return await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/roles/{role_name}", model=Role)
+
+
+async def _get_client_role_async(realm: str, internal_client_id: str, role_name: str) -> Role:
+    return await keycloak_async.kc_request(
+        "GET", f"/admin/realms/{realm}/clients/{internal_client_id}/roles/{role_name}", model=Role
+    )
 
 
 @users_app.command("create")
@@ -122,6 +363,7 @@ def create(
     realm_role: list[str] = typer.Option(None, "--realm-role", help="realm role name(s) to assign to each created user"),
     client_role: list[str] = typer.Option(None, "--client-role", help="client role name(s) to assign to each created user"),
     client_id: str = typer.Option("", "--client-id", help="client-id whose roles will be assigned to created users"),
+    workers: int = typer.Option(4, "--workers", min=1, help="number of users processed concurrently"),
 ):
     rt = ctx.obj
 
@@ -144,87 +386,158 @@ def create(
 
     target_realms = _resolve_target_realms(rt, realm or [], all_realms)
 
-    created = 0
-    skipped = 0
-    lines: list[str] = []
-    pw_audit: list[str] = []
+    directory = UserDirectory()
+    internal_client_ids: dict[str, str] = {}
+    realm_role_payloads: dict[str, list[dict]] = {}
+    client_role_payloads: dict[str, list[dict]] = {}
+
+    def prepare(r: str, i: int, un: str) -> tuple[_UserOutcome, dict, str]:
+        out = _UserOutcome("created")
+
+        em = _pick(emails, i)
+        fn = _pick(firsts, i)
+        ln = _pick(lasts, i)
+        pw = _pick(passwords, i)
+
+        if not pw:
+            pw = _generate_strong_password(12)
+            out.lines.append(f"Generated password for user {un!r} in realm {r!r}.")
+
+        _validate_password_strength(pw)
+
+        payload: dict = {
+            "username": un,
+            "enabled": enabled,
+            "emailVerified": bool(em),
+        }
+        if em:
+            payload["email"] = em
+        if fn:
+            payload["firstName"] = fn
+        if ln:
+            payload["lastName"] = ln
+        # the password is part of the create instead of a separate reset-password
+        payload["credentials"] = [{"type": "password", "value": pw, "temporary": False}]
+        return out, payload, pw
+
+    def created(out: _UserOutcome, r: str, un: str, user_id: str, pw: str) -> _UserOutcome:
+        out.lines.append(f"Created user {un!r} (ID: {user_id}) in realm {r!r}.")
+        out.lines.append(f"Password for user {un!r} in realm {r!r}: {pw}")
+        out.password = pw
+        return out
 
-    for r in target_realms:
-        internal_client_id = _get_client_internal_id(r, client_id) if client_roles else ""
+    jobs = [(r, i, un) for r in target_realms for i, un in enumerate(usernames)]
 
-        for i, un in enumerate(usernames):
-            if _search_user(r, un) is not None:
-                lines.append(f"User {un!r} already exists in realm {r!r}. Skipped.")
-                skipped += 1
-                continue
+    if rt.async_engine:
+        async def prepare_realm(r: str) -> None:
+            if realm_roles:
+                realm_role_payloads[r] = [(await _get_realm_role_async(r, rn)).to_json() for rn in realm_roles]
+            if client_roles:
+                async def role_payloads(iid: str) -> tuple[str, list[dict]]:
+                    return iid, [(await _get_client_role_async(r, iid, rn)).to_json() for rn in client_roles]
 
-            em = _pick(emails, i)
-            fn = _pick(firsts, i)
-            ln = _pick(lasts, i)
-            pw = _pick(passwords, i)
+                internal_client_ids[r], client_role_payloads[r] = await idcache.acached_call(
+                    r, "client", client_id, lambda: _get_client_internal_id_async(r, client_id), role_payloads
+                )
 
-            if not pw:
-                pw = _generate_strong_password(12)
-                lines.append(f"Generated password for user {un!r} in realm {r!r}.")
+        async def create_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, i, un = job
+            if await directory.aget(r, un) is not None:
+                return _UserOutcome("skipped", [f"User {un!r} already exists in realm {r!r}. Skipped."])
+            out, payload, pw = prepare(r, i, un)
+
+            resp = await keycloak_async.kc_raw_request("POST", f"/admin/realms/{r}/users", json=payload)
+            user_id = _created_id(resp)
+            if not user_id:
+                u = await asearch_user(r, un)
+                if u is None or not u.id:
+                    raise RuntimeError(f"failed creating user {un!r} in realm {r}: user not found after create")
+                user_id = u.id
+            directory.remember(r, un, User.from_json(r, {"id": user_id, "username": un}))
 
-            _validate_password_strength(pw)
+            if realm_roles:
+                await keycloak_async.kc_request(
+                    "POST", f"/admin/realms/{r}/users/{user_id}/role-mappings/realm", json=realm_role_payloads[r]
+                )
+            if client_roles:
+                await keycloak_async.kc_request(
+                    "POST",
+                    f"/admin/realms/{r}/users/{user_id}/role-mappings/clients/{internal_client_ids[r]}",
+                    json=client_role_payloads[r],
+                )
+            return created(out, r, un, user_id, pw)
 
-            payload: dict = {
-                "username": un,
-                "enabled": enabled,
-                "emailVerified": bool(em),
-            }
-            if em:
-                payload["email"] = em
-            if fn:
-                payload["firstName"] = fn
-            if ln:
-                payload["lastName"] = ln
+        results = keycloak_async.run(
+            _run_user_pipelines_async(
+                directory, usernames, jobs, create_one, concurrency=rt.concurrency, prepare_realm=prepare_realm
+            ),
+            concurrency=rt.concurrency,
+        )
+        lines, counts, pw_audit = _merge_outcomes(jobs, results, "create")
+    else:
+        # everything shared by the users of a realm is resolved once, up front
+        for r in target_realms:
+            with trace.span("realm", realm=r):
+                directory.prefetch(r, usernames)
+                if realm_roles:
+                    realm_role_payloads[r] = [_get_realm_role(r, rn).to_json() for rn in realm_roles]
+                if client_roles:
+                    # the client's id comes from the id cache; a 404 on its roles looks it up again
+                    internal_client_ids[r], client_role_payloads[r] = idcache.cached_call(
+                        r,
+                        "client",
+                        client_id,
+                        lambda: _get_client_internal_id(r, client_id),
+                        lambda iid: (iid, [_get_client_role(r, iid, rn).to_json() for rn in client_roles]),
+                    )
+
+        def create_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, i, un = job
+            if directory.get(r, un) is not None:
+                return _UserOutcome("skipped", [f"User {un!r} already exists in realm {r!r}. Skipped."])
+            out, payload, pw = prepare(r, i, un)
 
             # create user
-            kc_request("POST", f"/admin/realms/{r}/users", json=payload)
+            resp = kc_raw_request("POST", f"/admin/realms/{r}/users", json=payload)
 
-            u = _search_user(r, un)
-            if u is None or not u.get("id"):
-                raise RuntimeError(f"failed creating user {un!r} in realm {r}: user not found after create")
-            user_id = u["id"]
-
-            # set password
-            cred = {"type": "password", "value": pw, "temporary": False}
-            kc_request("PUT", f"/admin/realms/{r}/users/{user_id}/reset-password", json=cred)
+            user_id = _created_id(resp)
+            if not user_id:
+                u = search_user(r, un)
+                if u is None or not u.id:
+                    raise RuntimeError(f"failed creating user {un!r} in realm {r}: user not found after create")
+                user_id = u.id
+            directory.remember(r, un, User.from_json(r, {"id": user_id, "username": un}))
 
             # assign realm roles
             if realm_roles:
-                roles_payload = [_get_realm_role(r, rn) for rn in realm_roles]
-                kc_request("POST", f"/admin/realms/{r}/users/{user_id}/role-mappings/realm", json=roles_payload)
+                kc_request("POST", f"/admin/realms/{r}/users/{user_id}/role-mappings/realm", json=realm_role_payloads[r])
 
             # assign client roles
             if client_roles:
-                roles_payload = [_get_client_role(r, internal_client_id, rn) for rn in client_roles]
                 kc_request(
                     "POST",
-                    f"/admin/realms/{r}/users/{user_id}/role-mappings/clients/{internal_client_id}",
-                    json=roles_payload,
+                    f"/admin/realms/{r}/users/{user_id}/role-mappings/clients/{internal_client_ids[r]}",
+                    json=client_role_payloads[r],
                 )
 
-            lines.append(f"Created user {un!r} (ID: {user_id}) in realm {r!r}.")
-            lines.append(f"Password for user {un!r} in realm {r!r}: {pw}")
-            pw_audit.append(pw)
-            created += 1
+            return created(out, r, un, user_id, pw)
+
+        lines, counts, pw_audit = _run_user_pipelines(jobs, create_one, workers=workers, verb="create")
 
-    lines.append(f"Done. Created: {created}, Skipped: {skipped}.")
+    lines.append(f"Done. Created: {counts['created']}, Skipped: {counts['skipped']}{_failed_suffix(counts)}.")
 
     if pw_audit:
         rt.audit_details = "passwords: " + ", ".join(pw_audit)
 
     realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    _raise_if_failed(counts)
 
 
 @users_app.command("update")
 def update(
     ctx: typer.Context,
-    username: list[str] = typer.Option(None, "--username", help="username(s) to update. Repeatable; required."),
+    username: list[str] = typer.Option(None, "--username", help="username(s) to update. Repeatable; required unless a selector is given."),
     email: list[str] = typer.Option(None, "--email", help="new email(s). Optional; 0, 1 or N matching --username."),
     first_name: list[str] = typer.Option(None, "--first-name", help="new first name(s). Optional; 0, 1 or N."),
     last_name: list[str] = typer.Option(None, "--last-name", help="new last name(s). Optional; 0, 1 or N."),
@@ -233,6 +546,16 @@ def update(
     realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
     all_realms: bool = typer.Option(False, "--all-realms", help="update users in all realms"),
     ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip users not found instead of failing"),
+    workers: int = typer.Option(4, "--workers", min=1, help="number of users processed concurrently"),
+    force: bool = typer.Option(False, "--force", help="send the update even when the user already has these values"),
+    match: str = typer.Option("", "--match", help="update every user whose username matches this glob, e.g. 'test-*'"),
+    search: str = typer.Option("", "--search", help="update every user whose username, email or name contains this"),
+    attribute: list[str] = typer.Option(None, "--attribute", help="update only users with this attribute value (key=value). Repeatable"),
+    created_before: str = typer.Option("", "--created-before", help="update only users created before this ISO date or time (UTC unless given)"),
+    disabled: bool = typer.Option(False, "--disabled", help="update only disabled users"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="with a selector: count the matching users and change nothing"),
+    rate: float = typer.Option(0.0, "--rate", min=0, help="with a selector: at most this many users per second (0: no limit)"),
+    results: str = typer.Option("", "--results", help="with a selector: NDJSON file with one line per user, written as each finishes"),
 ):
     rt = ctx.obj
 
@@ -242,8 +565,9 @@ def update(
     lasts = last_name or []
     passwords = password or []
 
-    if len(usernames) == 0:
-        raise RuntimeError("missing --username: provide at least one --username")
+    query = _parse_query(usernames, match, search, attribute or [], created_before, disabled, dry_run, rate, results)
+    if len(usernames) == 0 and not query:
+        raise RuntimeError("missing --username: provide at least one --username, or a selector such as --match")
 
     enabled_changed = enabled is not None
 
@@ -251,109 +575,307 @@ def update(
         raise RuntimeError("nothing to update: provide at least one of --email/--first-name/--last-name/--password/--enabled")
 
     for flag, values in [("--email", emails), ("--first-name", firsts), ("--last-name", lasts), ("--password", passwords)]:
+        if query and len(values) > 1:
+            raise RuntimeError(f"invalid {flag}: with a selector, pass at most one {flag} for all matching users")
         _validate_0_1_n(flag, values, len(usernames))
+    if query and passwords:
+        # checked once here rather than failing for every matching user
+        _validate_password_strength(passwords[0])
+
+    enabled_value = False
+    if enabled_changed:
+        val = enabled.lower()
+        if val in {"true", "1", "t", "yes", "y"}:
+            enabled_value = True
+        elif val in {"false", "0", "f", "no", "n"}:
+            enabled_value = False
+        else:
+            raise RuntimeError("invalid value for --enabled: use true/false")
 
     target_realms = _resolve_target_realms(rt, realm or [], all_realms)
 
-    updated = 0
-    skipped = 0
-    lines: list[str] = []
-    pw_audit: list[str] = []
+    directory = UserDirectory()
+
+    def build_patch(i: int, user_id: str) -> tuple[dict, str]:
+        em = _pick(emails, i)
+        fn = _pick(firsts, i)
+        ln = _pick(lasts, i)
+        pw = _pick(passwords, i)
 
-    for r in target_realms:
-        for i, un in enumerate(usernames):
-            u = _search_user(r, un)
-            if u is None or not u.get("id"):
-                if ignore_missing:
-                    lines.append(f"User {un!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise RuntimeError(f"user {un!r} not found in realm {r}")
+        if pw:
+            _validate_password_strength(pw)
 
-            user_id = u["id"]
+        patch: dict = {"id": user_id}
+        if em:
+            patch["email"] = em
+            patch["emailVerified"] = True
+        if fn:
+            patch["firstName"] = fn
+        if ln:
+            patch["lastName"] = ln
+        if enabled_changed:
+            patch["enabled"] = enabled_value
+        return patch, pw
+
+    def missing(r: str, un: str) -> _UserOutcome:
+        if ignore_missing:
+            return _UserOutcome("skipped", [f"User {un!r} not found in realm {r!r}. Skipped."])
+        raise RuntimeError(f"user {un!r} not found in realm {r}")
+
+    def needs_put(u: User, patch: dict) -> bool:
+        # passwords cannot be read back, so a given --password is always set
+        return force or not _unchanged(u, patch)
+
+    def unchanged(r: str, un: str, user_id: str) -> _UserOutcome:
+        return _UserOutcome("unchanged", [f"User {un!r} (ID: {user_id}) in realm {r!r} unchanged."])
+
+    def updated(r: str, un: str, user_id: str, pw: str) -> _UserOutcome:
+        out = _UserOutcome("updated")
+        if pw:
+            out.lines.append(f"Updated password for user {un!r} in realm {r!r}.")
+            out.lines.append(f"New password for user {un!r} in realm {r!r}: {pw}")
+            out.password = pw
+        out.lines.append(f"Updated user {un!r} (ID: {user_id}) in realm {r!r}.")
+        return out
 
-            em = _pick(emails, i)
-            fn = _pick(firsts, i)
-            ln = _pick(lasts, i)
-            pw = _pick(passwords, i)
+    if query:
+        def update_matched(r: str, u: User) -> str:
+            patch, pw = build_patch(0, u.id)
+            put = needs_put(u, patch)
+            if not put and not pw:
+                return "unchanged"
+            if put:
+                kc_request("PUT", f"/admin/realms/{r}/users/{u.id}", json=patch)
+            if pw:
+                cred = {"type": "password", "value": pw, "temporary": False}
+                kc_request("PUT", f"/admin/realms/{r}/users/{u.id}/reset-password", json=cred)
+            return "updated"
+
+        async def aupdate_matched(r: str, u: User) -> str:
+            patch, pw = build_patch(0, u.id)
+            put = needs_put(u, patch)
+            if not put and not pw:
+                return "unchanged"
+            if put:
+                await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/users/{u.id}", json=patch)
+            if pw:
+                cred = {"type": "password", "value": pw, "temporary": False}
+                await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/users/{u.id}/reset-password", json=cred)
+            return "updated"
 
+        lines, counts = _run_query(
+            rt, target_realms, query, "update", update_matched, aupdate_matched,
+            dry_run=dry_run, rate=rate, results=results, workers=workers,
+        )
+        if dry_run:
+            lines.append(f"Dry run. Would update: {counts['matched']}.")
+        else:
+            if passwords and counts["updated"]:
+                lines.append(f"New password for the updated users: {passwords[0]}")
+                rt.audit_details = f"passwords: {passwords[0]}"
+            lines.append(
+                f"Done. Updated: {counts['updated']}, Unchanged: {counts['unchanged']}, Skipped: {counts['skipped']}{_failed_suffix(counts)}."
+            )
+        realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
+        print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        _raise_if_failed(counts)
+        return
+
+    jobs = [(r, i, un) for r in target_realms for i, un in enumerate(usernames)]
+
+    if rt.async_engine:
+        async def update_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, i, un = job
+            u = await directory.afetch(r, un)
+            if u is None or not u.id:
+                return missing(r, un)
+
+            user_id = u.id
+            patch, pw = build_patch(i, user_id)
+            put = needs_put(u, patch)
+            if not put and not pw:
+                return unchanged(r, un, user_id)
+            if put:
+                await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/users/{user_id}", json=patch)
             if pw:
-                _validate_password_strength(pw)
-
-            patch: dict = {"id": user_id}
-            if em:
-                patch["email"] = em
-                patch["emailVerified"] = True
-            if fn:
-                patch["firstName"] = fn
-            if ln:
-                patch["lastName"] = ln
-            if enabled_changed:
-                val = enabled.lower()
-                if val in {"true", "1", "t", "yes", "y"}:
-                    patch["enabled"] = True
-                elif val in {"false", "0", "f", "no", "n"}:
-                    patch["enabled"] = False
-                else:
-                    raise RuntimeError("invalid value for --enabled: use true/false")
-
-            kc_request("PUT", f"/admin/realms/{r}/users/{user_id}", json=patch)
+                cred = {"type": "password", "value": pw, "temporary": False}
+                await keycloak_async.kc_request("PUT", f"/admin/realms/{r}/users/{user_id}/reset-password", json=cred)
+            return updated(r, un, user_id, pw)
+
+        results = keycloak_async.run(
+            _run_user_pipelines_async(
+                directory, usernames, jobs, update_one, concurrency=rt.concurrency, skip_cached=True
+            ),
+            concurrency=rt.concurrency,
+        )
+        lines, counts, pw_audit = _merge_outcomes(jobs, results, "update")
+    else:
+        for r in target_realms:
+            with trace.span("realm", realm=r):
+                directory.prefetch(r, _uncached(r, usernames))
+
+        def update_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, i, un = job
+            # by the cached id when there is one; the record is needed anyway to skip no-op updates
+            u = directory.fetch(r, un)
+            if u is None or not u.id:
+                return missing(r, un)
+
+            user_id = u.id
+            patch, pw = build_patch(i, user_id)
+            put = needs_put(u, patch)
+            if not put and not pw:
+                return unchanged(r, un, user_id)
+            if put:
+                kc_request("PUT", f"/admin/realms/{r}/users/{user_id}", json=patch)
 
             if pw:
                 cred = {"type": "password", "value": pw, "temporary": False}
                 kc_request("PUT", f"/admin/realms/{r}/users/{user_id}/reset-password", json=cred)
-                lines.append(f"Updated password for user {un!r} in realm {r!r}.")
-                lines.append(f"New password for user {un!r} in realm {r!r}: {pw}")
-                pw_audit.append(pw)
+            return updated(r, un, user_id, pw)
 
-            lines.append(f"Updated user {un!r} (ID: {user_id}) in realm {r!r}.")
-            updated += 1
+        lines, counts, pw_audit = _run_user_pipelines(jobs, update_one, workers=workers, verb="update")
 
-    lines.append(f"Done. Updated: {updated}, Skipped: {skipped}.")
+    lines.append(
+        f"Done. Updated: {counts['updated']}, Unchanged: {counts['unchanged']}, Skipped: {counts['skipped']}{_failed_suffix(counts)}."
+    )
 
     if pw_audit:
         rt.audit_details = "passwords: " + ", ".join(pw_audit)
 
     realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    _raise_if_failed(counts)
 
 
 @users_app.command("delete")
 def delete(
     ctx: typer.Context,
-    username: list[str] = typer.Option(None, "--username", help="username(s) to delete. Repeatable; required."),
+    username: list[str] = typer.Option(None, "--username", help="username(s) to delete. Repeatable; required unless a selector is given."),
     realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
     all_realms: bool = typer.Option(False, "--all-realms", help="delete users in all realms"),
     ignore_missing: bool = typer.Option(False, "--ignore-missing", help="skip users not found instead of failing"),
+    workers: int = typer.Option(4, "--workers", min=1, help="number of users processed concurrently"),
+    match: str = typer.Option("", "--match", help="delete every user whose username matches this glob, e.g. 'test-*'"),
+    search: str = typer.Option("", "--search", help="delete every user whose username, email or name contains this"),
+    attribute: list[str] = typer.Option(None, "--attribute", help="delete only users with this attribute value (key=value). Repeatable"),
+    created_before: str = typer.Option("", "--created-before", help="delete only users created before this ISO date or time (UTC unless given)"),
+    disabled: bool = typer.Option(False, "--disabled", help="delete only disabled users"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="with a selector: count the matching users and change nothing"),
+    rate: float = typer.Option(0.0, "--rate", min=0, help="with a selector: at most this many users per second (0: no limit)"),
+    results: str = typer.Option("", "--results", help="with a selector: NDJSON file with one line per user, written as each finishes"),
 ):
     rt = ctx.obj
 
     usernames = username or []
-    if len(usernames) == 0:
-        raise RuntimeError("missing --username: provide at least one --username")
+    query = _parse_query(usernames, match, search, attribute or [], created_before, disabled, dry_run, rate, results)
+    if len(usernames) == 0 and not query:
+        raise RuntimeError("missing --username: provide at least one --username, or a selector such as --match")
 
     target_realms = _resolve_target_realms(rt, realm or [], all_realms)
 
-    deleted = 0
-    skipped = 0
-    lines: list[str] = []
+    if query:
+        def delete_matched(r: str, u: User) -> str:
+            kc_request("DELETE", f"/admin/realms/{r}/users/{u.id}")
+            idcache.forget(r, "user", u.username)
+            return "deleted"
 
-    for r in target_realms:
-        for un in usernames:
-            u = _search_user(r, un)
-            if u is None or not u.get("id"):
-                if ignore_missing:
-                    lines.append(f"User {un!r} not found in realm {r!r}. Skipped.")
-                    skipped += 1
-                    continue
-                raise RuntimeError(f"user {un!r} not found in realm {r}")
-
-            user_id = u["id"]
+        async def adelete_matched(r: str, u: User) -> str:
+            await keycloak_async.kc_request("DELETE", f"/admin/realms/{r}/users/{u.id}")
+            idcache.forget(r, "user", u.username)
+            return "deleted"
+
+        lines, counts = _run_query(
+            rt, target_realms, query, "delete", delete_matched, adelete_matched,
+            dry_run=dry_run, rate=rate, results=results, workers=workers,
+        )
+        if dry_run:
+            lines.append(f"Dry run. Would delete: {counts['matched']}.")
+        else:
+            lines.append(f"Done. Deleted: {counts['deleted']}, Skipped: {counts['skipped']}{_failed_suffix(counts)}.")
+        realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
+        print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+        _raise_if_failed(counts)
+        return
+
+    directory = UserDirectory()
+
+    def missing(r: str, un: str) -> _UserOutcome:
+        if ignore_missing:
+            return _UserOutcome("skipped", [f"User {un!r} not found in realm {r!r}. Skipped."])
+        raise RuntimeError(f"user {un!r} not found in realm {r}")
+
+    jobs = [(r, i, un) for r in target_realms for i, un in enumerate(usernames)]
+
+    if rt.async_engine:
+        async def delete_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, _, un = job
+            u = await directory.afetch(r, un)
+            if u is None or not u.id:
+                return missing(r, un)
+            user_id = u.id
+            await keycloak_async.kc_request("DELETE", f"/admin/realms/{r}/users/{user_id}")
+            directory.remember(r, un, None)
+            return _UserOutcome("deleted", [f"Deleted user {un!r} (ID: {user_id}) in realm {r!r}."])
+
+        results = keycloak_async.run(
+            _run_user_pipelines_async(
+                directory, usernames, jobs, delete_one, concurrency=rt.concurrency, skip_cached=True
+            ),
+            concurrency=rt.concurrency,
+        )
+        lines, counts, _ = _merge_outcomes(jobs, results, "delete")
+    else:
+        for r in target_realms:
+            with trace.span("realm", realm=r):
+                directory.prefetch(r, _uncached(r, usernames))
+
+        def delete_one(job: tuple[str, int, str]) -> _UserOutcome:
+            r, _, un = job
+            # by the cached id when there is one, read back first so a user renamed
+            # elsewhere is looked up again rather than deleted under its old name
+            u = directory.fetch(r, un)
+            if u is None or not u.id:
+                return missing(r, un)
+            user_id = u.id
             kc_request("DELETE", f"/admin/realms/{r}/users/{user_id}")
-            lines.append(f"Deleted user {un!r} (ID: {user_id}) in realm {r!r}.")
-            deleted += 1
+            directory.remember(r, un, None)
+            return _UserOutcome("deleted", [f"Deleted user {un!r} (ID: {user_id}) in realm {r!r}."])
+
+        lines, counts, _ = _run_user_pipelines(jobs, delete_one, workers=workers, verb="delete")
 
-    lines.append(f"Done. Deleted: {deleted}, Skipped: {skipped}.")
+    lines.append(f"Done. Deleted: {counts['deleted']}, Skipped: {counts['skipped']}{_failed_suffix(counts)}.")
 
     realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
     print_box(lines, jira_ticket=rt.jira_ticket, realm_label=realm_label)
+    _raise_if_failed(counts)
+
+
+@users_app.command("count")
+def count(
+    ctx: typer.Context,
+    realm: list[str] = typer.Option(None, "--realm", help="target realm(s). If omitted, uses default or config.json"),
+    all_realms: bool = typer.Option(False, "--all-realms", help="count users in all realms"),
+    search: str = typer.Option("", "--search", help="count only users whose username, email or name contains this"),
+    enabled: Optional[bool] = typer.Option(None, "--enabled/--disabled", help="count only enabled or only disabled users"),
+):
+    rt = ctx.obj
+
+    target_realms = _resolve_target_realms(rt, realm or [], all_realms)
+
+    params: dict = {}
+    if search:
+        params["search"] = search
+    if enabled is not None:
+        params["enabled"] = "true" if enabled else "false"
+
+    # /users/count answers with a number, so no user is ever downloaded
+    async def acount(r: str) -> int:
+        return await keycloak_async.kc_request("GET", f"/admin/realms/{r}/users/count", params=params)
+
+    counts = realm_counts(
+        rt, target_realms, lambda r: kc_request("GET", f"/admin/realms/{r}/users/count", params=params), acount
+    )
+
+    realm_label = "all realms" if all_realms else (realm[0] if realm and len(realm) == 1 else (target_realms[0] if len(target_realms) == 1 else ""))
+    print_box(count_lines(counts), jira_ticket=rt.jira_ticket, realm_label=realm_label)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from kc.core import keycloak_async
+from kc.core.keycloak import kc_request
+
+# Keycloak returns admin events newest first
+_PAGE_SIZE = 100
+
+
+@dataclass
+class Cursor:
+    """Position in a realm's admin events: the time (epoch ms) and id of the last event applied."""
+
+    time: int
+    event_id: str = ""
+
+
+@dataclass
+class ChangeSet:
+    """What a run of admin events touched, by kind of resource."""
+
+    users: set[str] = field(default_factory=set)
+    clients: set[str] = field(default_factory=set)
+    # clients whose roles changed
+    client_roles: set[str] = field(default_factory=set)
+    realm_roles: bool = False
+    scopes: set[str] = field(default_factory=set)
+
+    def __len__(self) -> int:
+        return len(self.users) + len(self.clients) + len(self.client_roles) + int(self.realm_roles) + len(self.scopes)
+
+
+def changes_from(events: list[dict[str, Any]]) -> ChangeSet:
+    """Map admin events to the objects to fetch again, from their resource paths.
+
+    Only the path is used, never the representation (it is often not stored), so
+    every touched object is simply read again. Role events refresh all roles of
+    their owner, because role paths carry names, which a rename changes.
+    """
+    out = ChangeSet()
+    for ev in events:
+        parts = (ev.get("resourcePath") or "").strip("/").split("/")
+        kind = parts[0]
+        if kind == "users" and len(parts) > 1:
+            out.users.add(parts[1])
+        elif kind == "clients" and len(parts) > 1:
+            if len(parts) > 2 and parts[2] == "roles":
+                out.client_roles.add(parts[1])
+            else:
+                # a deleted or renamed client also takes its roles along
+                out.clients.add(parts[1])
+                out.client_roles.add(parts[1])
+        elif kind in ("roles", "roles-by-id"):
+            out.realm_roles = True
+        elif kind == "client-scopes" and len(parts) > 1:
+            out.scopes.add(parts[1])
+    return out
+
+
+def cursor_of(event: dict[str, Any]) -> Cursor:
+    return Cursor(int(event.get("time") or 0), str(event.get("id") or ""))
+
+
+def _date_from(cursor: Cursor) -> str:
+    # the admin-events filter only takes a day
+    return datetime.fromtimestamp(cursor.time / 1000, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _newer(page: list[dict[str, Any]], cursor: Cursor) -> tuple[list[dict[str, Any]], bool]:
+    """Events of a page that come after the cursor, and whether the cursor was reached."""
+    out = []
+    for ev in page:
+        c = cursor_of(ev)
+        if c.time < cursor.time or (c.time == cursor.time and c.event_id == cursor.event_id):
+            return out, True
+        # several events can share the cursor's millisecond; applying one twice is harmless
+        out.append(ev)
+    return out, False
+
+
+def events_since(realm: str, cursor: Cursor) -> tuple[list[dict[str, Any]], bool]:
+    """Admin events after the cursor, newest first, and whether the walk reached the cursor.
+
+    Not reaching it means events were removed in between (expired or cleared), so
+    the events alone no longer tell everything that changed.
+    """
+    path = f"/admin/realms/{realm}/admin-events"
+    params = {"dateFrom": _date_from(cursor), "max": _PAGE_SIZE}
+    events: list[dict[str, Any]] = []
+    first = 0
+    while True:
+        page = kc_request("GET", path, params={**params, "first": first})
+        newer, reached = _newer(page, cursor)
+        events.extend(newer)
+        if reached:
+            return events, True
+        if len(page) < _PAGE_SIZE:
+            return events, not cursor.event_id
+        first += len(page)
+
+
+async def aevents_since(realm: str, cursor: Cursor) -> tuple[list[dict[str, Any]], bool]:
+    """events_since() on the async engine."""
+    path = f"/admin/realms/{realm}/admin-events"
+    params = {"dateFrom": _date_from(cursor), "max": _PAGE_SIZE}
+    events: list[dict[str, Any]] = []
+    first = 0
+    while True:
+        page = await keycloak_async.kc_request("GET", path, params={**params, "first": first})
+        newer, reached = _newer(page, cursor)
+        events.extend(newer)
+        if reached:
+            return events, True
+        if len(page) < _PAGE_SIZE:
+            return events, not cursor.event_id
+        first += len(page)
+
+
+def latest_cursor(realm: str) -> Cursor:
+    """Cursor at the newest admin event; taken before a full sync so nothing after it is missed."""
+    page = kc_request("GET", f"/admin/realms/{realm}/admin-events", params={"first": 0, "max": 1})
+    return cursor_of(page[0]) if page else Cursor(int(time.time() * 1000))
+
+
+async def alatest_cursor(realm: str) -> Cursor:
+    page = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/admin-events", params={"first": 0, "max": 1})
+    return cursor_of(page[0]) if page else Cursor(int(time.time() * 1000))
+
+
+def resync_reason(realm_rep: dict[str, Any], cursor: Optional[Cursor]) -> str:
+    """Why a realm cannot be refreshed from its admin events, or "" if it can."""
+    if cursor is None:
+        return "no cursor yet"
+    if not realm_rep.get("adminEventsEnabled"):
+        return "admin events are disabled"
+    expiration = (realm_rep.get("attributes") or {}).get("adminEventsExpiration")
+    if expiration and int(expiration) > 0 and cursor.time < (time.time() - int(expiration)) * 1000:
+        return "the cursor is older than the admin event expiration"
+    return ""
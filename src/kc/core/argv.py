@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+# Global options (kc.cli.main) that take a value, for code that scans argv or a
+# command-file line before Typer parses it and must skip their arguments.
+# Keep in step with the options of main().
+VALUE_OPTIONS = frozenset(
+    {
+        "--config",
+        "--realm",
+        "--log-file",
+        "--jira",
+        "--cmd-file",
+        "--trace-file",
+        "--profile-dir",
+        "--profiles",
+        "--parallel",
+        "--concurrency",
+        "--id-cache",
+    }
+)
@@ -5,13 +5,55 @@ import os
 from dataclasses import dataclass
 from datetime import datetime
 from threading import Lock
+from typing import Optional
 
-from kc.core.config import GLOBAL
+from kc.core.config import get_config
 
 
 _LOCK = Lock()
 _CSV_PATH = "kc_audit.csv"
 
+_HEADER = [
+    "timestamp",
+    "status",
+    "command_path",
+    "raw_command",
+    "jira",
+    "actor_type",
+    "actor_id",
+    "auth_realm",
+    "change_kind",
+    "target_realms",
+    "duration",
+    "details",
+    "http_requests",
+    "http_errors",
+    "http_bytes",
+    "http_seconds",
+    "cluster",
+]
+
+
+def _rotate_if_outdated(path: str) -> bool:
+    """Move a log written with other columns aside (kc_audit.csv.1, .2, ...); True if path is now new.
+
+    Appending rows of the current layout under an older header would misalign
+    every column after the first difference for CSV readers.
+    """
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), None)
+    except FileNotFoundError:
+        return True
+    if header == _HEADER:
+        return False
+    if header is not None:
+        n = 1
+        while os.path.exists(f"{path}.{n}"):
+            n += 1
+        os.replace(path, f"{path}.{n}")
+    return True
+
 
 def append_audit(
     *,
@@ -22,30 +64,18 @@ def append_audit(
     target_realms: str,
     duration: str,
     details: str,
+    http: Optional[dict] = None,
 ) -> None:
     with _LOCK:
-        file_exists = os.path.exists(_CSV_PATH)
+        new_file = _rotate_if_outdated(_CSV_PATH)
         with open(_CSV_PATH, "a", newline="", encoding="utf-8") as f:
             w = csv.writer(f)
-            if not file_exists:
-                w.writerow(
-                    [
-                        "timestamp",
-                        "status",
-                        "command_path",
-                        "raw_command",
-                        "jira",
-                        "actor_type",
-                        "actor_id",
-                        "auth_realm",
-                        "change_kind",
-                        "target_realms",
-                        "duration",
-                        "details",
-                    ]
-                )
+            if new_file:
+                w.writerow(_HEADER)
 
+            cfg = get_config()
             actor_type, actor_id = _resolve_actor()
+            http = http or {}
             w.writerow(
                 [
                     datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
@@ -55,20 +85,26 @@ def append_audit(
                     jira,
                     actor_type,
                     actor_id,
-                    GLOBAL.auth_realm,
+                    cfg.auth_realm,
                     _resolve_change_kind(command_path),
                     target_realms,
                     duration,
                     details,
+                    http.get("requests", ""),
+                    http.get("errors", ""),
+                    http.get("bytes", ""),
+                    http.get("seconds", ""),
+                    cfg.name,
                 ]
             )
 
 
 def _resolve_actor() -> tuple[str, str]:
-    if GLOBAL.grant_type == "password" and GLOBAL.username:
-        return "user", GLOBAL.username
-    if GLOBAL.client_id:
-        return "client", GLOBAL.client_id
+    cfg = get_config()
+    if cfg.grant_type == "password" and cfg.username:
+        return "user", cfg.username
+    if cfg.client_id:
+        return "client", cfg.client_id
     return "unknown", ""
 
 
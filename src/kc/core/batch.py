@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import heapq
+import json
+import shlex
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+
+import yaml
+
+from kc.core.argv import VALUE_OPTIONS
+
+
+@dataclass
+class BatchCommand:
+    index: int  # 1-based position among the commands of the file
+    line: str
+    id: str = ""
+    depends_on: list[str] = field(default_factory=list)
+    group: str = ""
+
+    @property
+    def label(self) -> str:
+        return f"#{self.index}" + (f" ({self.id})" if self.id else "")
+
+
+@dataclass
+class BatchResult:
+    command: BatchCommand
+    status: str  # ok, failed or skipped
+    returncode: int = 0
+    stdout: str = ""
+    stderr: str = ""
+    seconds: float = 0.0
+
+
+def read_command_file(path: Path) -> Iterator[Any]:
+    """Yield the entries of a command file one at a time, reading it incrementally.
+
+    .ndjson/.jsonl: one JSON string or object per line. .json: a top-level array, or
+    an object with a "commands" array, decoded element by element. .yaml/.yml: every
+    document may be a command, a list of commands or a {"commands": [...]} mapping;
+    documents are loaded one at a time. Anything else: one command per line.
+    """
+    ext = path.suffix.lower()
+    with path.open("r", encoding="utf-8") as f:
+        if ext in (".ndjson", ".jsonl"):
+            for n, raw_line in enumerate(f, 1):
+                if raw_line.strip():
+                    try:
+                        yield json.loads(raw_line)
+                    except json.JSONDecodeError as e:
+                        raise RuntimeError(f"{path}:{n}: invalid JSON: {e}") from e
+        elif ext == ".json":
+            yield from _JsonStream(f, path).commands()
+        elif ext in (".yaml", ".yml"):
+            for doc in yaml.safe_load_all(f):
+                if isinstance(doc, list):
+                    yield from doc
+                elif isinstance(doc, dict) and "commands" in doc:
+                    yield from doc["commands"] or []
+                elif (isinstance(doc, dict) and "cmd" in doc) or isinstance(doc, str):
+                    yield doc
+        else:
+            for raw_line in f:
+                line = raw_line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+
+_JSON_CHUNK = 1 << 16
+
+
+class _JsonStream:
+    """Decodes the elements of a JSON command file without loading the whole document."""
+
+    def __init__(self, f: TextIO, path: Path):
+        self.f = f
+        self.path = path
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(_JSON_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop what has been consumed so the buffer stays around one chunk
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, ch: str) -> None:
+        got = self._peek()
+        if got != ch:
+            raise RuntimeError(f"{self.path}: invalid JSON: expected {ch!r}, got {got or 'end of file'!r}")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise RuntimeError(f"{self.path}: invalid JSON: {e}") from e
+            # a number that ends exactly at the buffer end may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def _array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("]")
+            return
+
+    def commands(self) -> Iterator[Any]:
+        first = self._peek()
+        if first == "[":
+            yield from self._array()
+        elif first == "{":
+            self.pos += 1
+            while self._peek() not in ("}", ""):
+                key = self._value()
+                self._expect(":")
+                if key == "commands" and self._peek() == "[":
+                    yield from self._array()
+                else:
+                    self._value()
+                if self._peek() == ",":
+                    self.pos += 1
+            self._expect("}")
+
+
+def batch_command(index: int, entry: object) -> Optional[BatchCommand]:
+    """Build a command from a file entry (a string or a {"cmd", "id", "depends_on", "group"} mapping)."""
+    if isinstance(entry, dict):
+        line = str(entry.get("cmd", "") or "").strip()
+        deps = entry.get("depends_on") or []
+        if isinstance(deps, str):
+            deps = [deps]
+        cmd = BatchCommand(
+            index=index,
+            line=line,
+            id=str(entry.get("id", "") or ""),
+            depends_on=[str(d) for d in deps],
+            group=str(entry.get("group", "") or ""),
+        )
+    else:
+        cmd = BatchCommand(index=index, line=str(entry).strip())
+    if not cmd.line or cmd.line.startswith("#"):
+        return None
+    return cmd
+
+
+def _targets(args: list[str], default_realm: str) -> tuple[str, list[str]]:
+    """Return (resource, realms) a command line works on; realms is ["*"] for --all-realms."""
+    resource = ""
+    realms: list[str] = []
+    all_realms = False
+    it = iter(args)
+    for a in it:
+        name, has_value, value = a.partition("=")
+        if a == "--all-realms":
+            all_realms = True
+        elif name == "--realm":
+            realms.append(value if has_value else next(it, ""))
+        elif name in VALUE_OPTIONS:
+            # the value of e.g. --config is not the resource
+            if not has_value:
+                next(it, None)
+        elif not a.startswith("-") and not resource:
+            resource = a
+    if all_realms:
+        return resource, ["*"]
+    return resource, realms or [default_realm]
+
+
+class _Ordering:
+    """Derives the dependencies of each command as the file is read.
+
+    Explicit depends_on ids must name earlier commands. A command without them
+    runs after the previous command on the same realm and resource (a
+    --all-realms command counts as touching every realm of its resource), and
+    a command with a group runs after the previous command of that group.
+    depends_on and group edges are required: the command needs what they did.
+    The realm/resource edges only keep the file order, so with
+    --continue-on-error a failure there does not skip the command.
+    Only the latest command per realm/resource/group is remembered, so the
+    state stays small however long the file is.
+    """
+
+    def __init__(self, default_realm: str):
+        self.default_realm = default_realm
+        self.ids: dict[str, int] = {}
+        self.last: dict[str, dict[str, int]] = {}  # resource -> realm -> index
+        self.last_all: dict[str, int] = {}
+        self.last_group: dict[str, int] = {}
+
+    def deps(self, cmd: BatchCommand) -> tuple[set[int], set[int]]:
+        """Return (all dependencies, the required ones among them)."""
+        required: set[int] = set()
+        for d in cmd.depends_on:
+            if d not in self.ids:
+                raise RuntimeError(f"command {cmd.label}: depends_on {d!r} does not name an earlier command id")
+            required.add(self.ids[d])
+        if cmd.group and cmd.group in self.last_group:
+            required.add(self.last_group[cmd.group])
+        deps = set(required)
+
+        resource, realms = _targets(shlex.split(cmd.line), self.default_realm)
+        by_realm = self.last.setdefault(resource, {})
+        if not cmd.depends_on:
+            if resource in self.last_all:
+                deps.add(self.last_all[resource])
+            if realms == ["*"]:
+                deps.update(by_realm.values())
+            else:
+                deps.update(by_realm[r] for r in realms if r in by_realm)
+
+        # remember this command as the latest one for what it touches
+        if realms == ["*"]:
+            self.last_all[resource] = cmd.index
+            by_realm.clear()
+        else:
+            for r in realms:
+                by_realm[r] = cmd.index
+        if cmd.group:
+            self.last_group[cmd.group] = cmd.index
+        if cmd.id:
+            if cmd.id in self.ids:
+                raise RuntimeError(f"command {cmd.label}: duplicate id {cmd.id!r}")
+            self.ids[cmd.id] = cmd.index
+        return deps, required
+
+    def referenced(self) -> set[int]:
+        """Indexes that later commands may still depend on."""
+        out = set(self.ids.values()) | set(self.last_all.values()) | set(self.last_group.values())
+        for by_realm in self.last.values():
+            out.update(by_realm.values())
+        return out
+
+
+@dataclass
+class _Node:
+    cmd: BatchCommand
+    deps: tuple[int, ...]
+    # the deps whose failure skips this command even with continue_on_error
+    required: frozenset[int]
+    waiting: set[int]
+    dependents: list[int] = field(default_factory=list)
+
+
+@dataclass
+class _Done:
+    status: str
+    end: float
+    path: Optional["_Path"]
+
+
+_PATH_ENDS = 5
+
+
+@dataclass(frozen=True)
+class _Path:
+    """The critical path up to a command, with only its first and last few steps kept."""
+
+    count: int
+    seconds: float
+    head: tuple[tuple[str, float], ...]
+    tail: tuple[tuple[str, float], ...]
+
+    def then(self, label: str, seconds: float) -> "_Path":
+        step = ((label, seconds),)
+        head = self.head if len(self.head) == _PATH_ENDS else self.head + step
+        return _Path(self.count + 1, self.seconds + seconds, head, (self.tail + step)[-_PATH_ENDS:])
+
+    def render(self) -> str:
+        if self.count <= 2 * _PATH_ENDS:
+            steps = list(self.head) + list(self.tail[len(self.tail) - (self.count - len(self.head)) :])
+            return " -> ".join(f"{label} {sec:.2f}s" for label, sec in steps)
+        parts = [f"{label} {sec:.2f}s" for label, sec in self.head]
+        parts.append(f"... {self.count - 2 * _PATH_ENDS} more ...")
+        parts.extend(f"{label} {sec:.2f}s" for label, sec in self.tail)
+        return " -> ".join(parts)
+
+
+_EMPTY_PATH = _Path(0, 0.0, (), ())
+
+
+class _Summary:
+    """Running totals, the slowest commands and the critical path, in constant memory."""
+
+    def __init__(self, slowest: int = 10):
+        self.counts = {"ok": 0, "failed": 0, "skipped": 0}
+        self.busy = 0.0
+        self.slowest: list[tuple[float, int, str]] = []  # min-heap of (seconds, index, text)
+        self.keep = slowest
+        self.last_path: Optional[_Path] = None
+
+    def add(self, res: BatchResult, path: Optional[_Path]) -> None:
+        self.counts[res.status] = self.counts.get(res.status, 0) + 1
+        if res.status == "skipped":
+            return
+        self.busy += res.seconds
+        item = (res.seconds, res.command.index, f"{res.command.label} {res.status}")
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+        # commands finish in time order, so the last one to finish ends the critical path
+        self.last_path = path
+
+    def lines(self, wall: float) -> list[str]:
+        ran = self.counts["ok"] + self.counts["failed"]
+        lines = [f"Slowest commands (of {ran} run):"]
+        for seconds, _, text in sorted(self.slowest, reverse=True):
+            lines.append(f"  {seconds:>8.2f}s  {text}")
+
+        p = self.last_path
+        if p is not None:
+            lines.append(f"Critical path ({p.count} command(s), {p.seconds:.2f}s):")
+            lines.append("  " + p.render())
+
+        speedup = f", {self.busy / wall:.1f}x" if wall > 0 else ""
+        lines.append(
+            f"Total: {sum(self.counts.values())} command(s), ok: {self.counts['ok']}, failed: {self.counts['failed']}, "
+            f"skipped: {self.counts['skipped']}; wall {wall:.2f}s, command time {self.busy:.2f}s{speedup}"
+        )
+        return lines
+
+
+def run_graph(
+    commands: Iterable[BatchCommand],
+    run: Callable[[BatchCommand], BatchResult],
+    on_result: Callable[[BatchResult], None],
+    *,
+    parallel: int,
+    continue_on_error: bool,
+    default_realm: str = "",
+    already_done: Optional[Callable[[BatchCommand], bool]] = None,
+) -> list[str]:
+    """Run commands as a dependency graph on up to `parallel` threads.
+
+    on_result is called on the calling thread, once per command, as each one
+    finishes (or is skipped because a dependency failed). Commands are read from
+    the iterable only as far as needed to keep the workers busy, and finished
+    commands are forgotten once nothing can depend on them any more. Stops
+    starting new commands after the first failure unless continue_on_error;
+    with it, only commands that require the failed one (depends_on, group) are
+    skipped, and those merely ordered after it still run.
+    Commands for which already_done returns True (finished in an earlier run)
+    are not run and count as succeeded for their dependents. Returns the
+    summary lines (slowest commands, critical path, totals).
+    """
+    ordering = _Ordering(default_realm)
+    source: Iterator[BatchCommand] = iter(commands)
+    lookahead = max(64, parallel * 16)
+
+    nodes: dict[int, _Node] = {}
+    done: dict[int, _Done] = {}
+    summary = _Summary()
+    ready: deque[int] = deque()
+    running: dict[Future, int] = {}
+    exhausted = False
+    stop = False
+    prune_at = 4 * lookahead
+    started = time.perf_counter()
+
+    def blocks(dep: int, node: _Node) -> bool:
+        return not continue_on_error or dep in node.required
+
+    def finish(res: BatchResult) -> None:
+        idx = res.command.index
+        node = nodes.pop(idx)
+        prev = max((done[d] for d in node.deps if d in done), key=lambda d: d.end, default=None)
+        path = None
+        if res.status != "skipped":
+            base = prev.path if prev is not None and prev.path is not None else _EMPTY_PATH
+            path = base.then(res.command.label, res.seconds)
+        done[idx] = _Done(status=res.status, end=time.perf_counter() - started, path=path)
+        summary.add(res, path)
+        on_result(res)
+        for child in node.dependents:
+            cn = nodes.get(child)
+            if cn is None:
+                continue
+            cn.waiting.discard(idx)
+            if res.status != "ok" and blocks(idx, cn):
+                finish(BatchResult(command=cn.cmd, status="skipped"))
+            elif not cn.waiting:
+                ready.append(child)
+
+    def forget() -> None:
+        keep = ordering.referenced()
+        for live in nodes.values():
+            keep.update(live.deps)
+        for idx in [i for i in done if i not in keep]:
+            del done[idx]
+
+    def read_more() -> None:
+        nonlocal exhausted
+        while not exhausted and len(nodes) < lookahead:
+            cmd = next(source, None)
+            if cmd is None:
+                exhausted = True
+                return
+            deps, required = ordering.deps(cmd)
+            if already_done is not None and already_done(cmd):
+                done[cmd.index] = _Done(status="ok", end=0.0, path=None)
+                continue
+            node = nodes[cmd.index] = _Node(
+                cmd=cmd, deps=tuple(sorted(deps)), required=frozenset(required), waiting={d for d in deps if d in nodes}
+            )
+            for d in node.waiting:
+                nodes[d].dependents.append(cmd.index)
+            if any(done[d].status != "ok" and blocks(d, node) for d in deps if d in done):
+                finish(BatchResult(command=cmd, status="skipped"))
+            elif not node.waiting:
+                ready.append(cmd.index)
+
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="cmd") as ex:
+        while True:
+            if not stop:
+                read_more()
+                while ready and len(running) < parallel:
+                    idx = ready.popleft()
+                    running[ex.submit(run, nodes[idx].cmd)] = idx
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for f in finished:
+                running.pop(f)
+                res = f.result()
+                finish(res)
+                if res.status == "failed" and not continue_on_error:
+                    stop = True
+            if len(done) > prune_at:
+                forget()
+                prune_at = max(4 * lookahead, 2 * len(done))
+
+    return summary.lines(time.perf_counter() - started)
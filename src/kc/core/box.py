@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from typing import Iterable, List
 
+from kc.core import trace
+from kc.core.config import get_config
+
 
 def render_box(lines: List[str], jira_ticket: str, realm_label: str, title: str = "Keycloak CLI") -> str:
     header = _build_header_text(jira_ticket=jira_ticket, realm_label=realm_label, title=title)
@@ -19,13 +22,17 @@ def render_box(lines: List[str], jira_ticket: str, realm_label: str, title: str
 def print_box(lines: List[str], jira_ticket: str, realm_label: str, title: str = "Keycloak CLI") -> None:
     import sys
 
-    text = render_box(lines, jira_ticket=jira_ticket, realm_label=realm_label, title=title) + "\n"
-    sys.stdout.write(text)
-    sys.stdout.flush()
+    with trace.span("print_box", lines=len(lines)):
+        text = render_box(lines, jira_ticket=jira_ticket, realm_label=realm_label, title=title) + "\n"
+        sys.stdout.write(text)
+        sys.stdout.flush()
 
 
 def _build_header_text(*, jira_ticket: str, realm_label: str, title: str) -> str:
     parts: list[str] = []
+    profile = get_config().name
+    if profile:
+        parts.append(f"Cluster: {profile}")
     if jira_ticket:
         parts.append(f"Jira Ticket: {jira_ticket}")
     if realm_label:
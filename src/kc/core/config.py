@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 import json
 import os
 from pathlib import Path
+from typing import Iterator
 
 
 @dataclass
@@ -16,9 +19,35 @@ class Config:
     username: str = ""
     password: str = ""
     grant_type: str = ""
+    # opt-in HTTP/2 transport (needs the h2 package); see keycloak._http_client
+    http2: bool = False
+    # profile name from the "profiles" section of config.json; empty for the top-level settings
+    name: str = ""
 
 
 GLOBAL = Config()
+PROFILES: dict[str, Config] = {}
+
+# The config requests are made with. Defaults to GLOBAL; a profile run (or a thread
+# working for one) swaps in that profile's Config with use_config().
+_CURRENT: ContextVar[Config] = ContextVar("kc_config", default=GLOBAL)
+
+
+def get_config() -> Config:
+    return _CURRENT.get()
+
+
+def set_config(cfg: Config) -> None:
+    _CURRENT.set(cfg)
+
+
+@contextmanager
+def use_config(cfg: Config) -> Iterator[Config]:
+    token = _CURRENT.set(cfg)
+    try:
+        yield cfg
+    finally:
+        _CURRENT.reset(token)
 
 
 def _find_default_config_path() -> str:
@@ -45,6 +74,18 @@ def _find_default_config_path() -> str:
     return ""
 
 
+def _fill(cfg: Config, data: dict) -> None:
+    cfg.server_url = data.get("server_url", "")
+    cfg.auth_realm = data.get("auth_realm", "") or "master"
+    cfg.realm = data.get("realm", "")
+    cfg.client_id = data.get("client_id", "")
+    cfg.client_secret = data.get("client_secret", "")
+    cfg.username = data.get("username", "")
+    cfg.password = data.get("password", "")
+    cfg.grant_type = data.get("grant_type", "") or "client_credentials"
+    cfg.http2 = bool(data.get("http2", False))
+
+
 def load_config(path: str) -> None:
     cfg_path = path or _find_default_config_path()
     if not cfg_path:
@@ -53,14 +94,42 @@ def load_config(path: str) -> None:
     with open(cfg_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    GLOBAL.server_url = data.get("server_url", "")
-    GLOBAL.auth_realm = data.get("auth_realm", "") or "master"
-    GLOBAL.realm = data.get("realm", "")
-    GLOBAL.client_id = data.get("client_id", "")
-    GLOBAL.client_secret = data.get("client_secret", "")
-    GLOBAL.username = data.get("username", "")
-    GLOBAL.password = data.get("password", "")
-    GLOBAL.grant_type = data.get("grant_type", "") or "client_credentials"
-
-    if not GLOBAL.server_url:
+    profiles = data.get("profiles") or {}
+    if not isinstance(profiles, dict):
+        raise RuntimeError("profiles must be an object mapping profile names to settings")
+
+    _fill(GLOBAL, data)
+    PROFILES.clear()
+    for name, overrides in profiles.items():
+        # a profile inherits every top-level setting it does not override
+        base = {k: v for k, v in data.items() if k != "profiles"}
+        cfg = Config(name=name)
+        _fill(cfg, {**base, **(overrides or {})})
+        if not cfg.server_url:
+            raise RuntimeError(f"profile {name!r}: server_url is required")
+        PROFILES[name] = cfg
+
+    if not GLOBAL.server_url and not PROFILES:
         raise RuntimeError("server_url is required")
+
+
+def select_profiles(names: str, all_profiles: bool) -> list[Config]:
+    """Resolve --profiles a,b / --all-profiles to their configs, in the order given."""
+    if all_profiles:
+        if not PROFILES:
+            raise RuntimeError("--all-profiles: config.json has no profiles")
+        return list(PROFILES.values())
+
+    wanted = [n.strip() for n in names.split(",") if n.strip()]
+    if not wanted:
+        if not GLOBAL.server_url:
+            raise RuntimeError(
+                "server_url is not set at the top level of config.json; choose profiles with --profiles or --all-profiles"
+            )
+        return []
+
+    unknown = [n for n in wanted if n not in PROFILES]
+    if unknown:
+        known = ", ".join(PROFILES) or "none"
+        raise RuntimeError(f"unknown profile(s): {', '.join(unknown)} (configured: {known})")
+    return [PROFILES[n] for n in dict.fromkeys(wanted)]
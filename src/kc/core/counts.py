@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Optional
+
+from kc.core import keycloak_async
+from kc.core.keycloak import kc_request
+from kc.core.pool import run_ordered, run_ordered_async
+
+# page size for walks over endpoints without a /count
+_PAGE_SIZE = 500
+# realms counted at once on worker threads; --async uses --concurrency instead
+_WORKERS = 8
+
+
+def count_pages(path: str, params: Optional[dict[str, Any]] = None) -> int:
+    """Count the objects behind a paged list endpoint, holding one page of ids at a time."""
+    total = 0
+    first = 0
+    while True:
+        page = kc_request("GET", path, params={**(params or {}), "first": first, "max": _PAGE_SIZE}, fields=("id",))
+        total += len(page)
+        if len(page) < _PAGE_SIZE:
+            return total
+        first += len(page)
+
+
+async def acount_pages(path: str, params: Optional[dict[str, Any]] = None) -> int:
+    total = 0
+    first = 0
+    while True:
+        page = await keycloak_async.kc_request(
+            "GET", path, params={**(params or {}), "first": first, "max": _PAGE_SIZE}, fields=("id",)
+        )
+        total += len(page)
+        if len(page) < _PAGE_SIZE:
+            return total
+        first += len(page)
+
+
+def realm_counts(
+    rt,
+    realms: list[str],
+    count: Callable[[str], int],
+    acount: Callable[[str], Awaitable[int]],
+) -> list[tuple[str, int]]:
+    """Run count(realm) for every realm, several at once; (realm, count) pairs in input order.
+
+    With --async, acount runs on the asyncio engine instead. The first failure is raised
+    once all realms are done.
+    """
+    if rt.async_engine:
+        results = keycloak_async.run(
+            run_ordered_async(realms, acount, concurrency=rt.concurrency), concurrency=rt.concurrency
+        )
+    else:
+        results = run_ordered(realms, count, workers=_WORKERS)
+
+    out: list[tuple[str, int]] = []
+    for r, (n, err) in zip(realms, results):
+        if err is not None:
+            raise RuntimeError(f"failed counting in realm {r}: {err}")
+        out.append((r, int(n or 0)))
+    return out
+
+
+def count_lines(counts: list[tuple[str, int]]) -> list[str]:
+    """One aligned "realm  count" line per realm, then the grand total."""
+    width = max((len(r) for r, _ in counts), default=0)
+    digits = len(str(sum(n for _, n in counts)))
+    lines = [f"{r:<{width}}  {n:>{digits}}" for r, n in counts]
+    lines.append(f"Total: {sum(n for _, n in counts)}")
+    return lines
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from kc.core import idcache, keycloak_async
+from kc.core.keycloak import kc_request
+from kc.core.models import User
+
+# Up to this many usernames are always resolved with one exact lookup each.
+# Above it, a single paged walk of the realm is used when it needs fewer requests.
+_EXACT_LOOKUP_MAX = 50
+_SCAN_PAGE_SIZE = 500
+
+
+def search_user(realm: str, username: str) -> Optional[User]:
+    users = kc_request(
+        "GET",
+        f"/admin/realms/{realm}/users",
+        params={"username": username, "exact": "true", "briefRepresentation": "true"},
+        model=User,
+    )
+    # Keycloak keeps usernames in lower case and matches them ignoring case
+    for u in users:
+        if (u.username or "").lower() == username.lower():
+            return u
+    return None
+
+
+def iter_realm_users(realm: str, params: Optional[dict] = None):
+    first = 0
+    while True:
+        page = kc_request(
+            "GET",
+            f"/admin/realms/{realm}/users",
+            params={**(params or {}), "first": first, "max": _SCAN_PAGE_SIZE, "briefRepresentation": "true"},
+            model=User,
+        )
+        if not page:
+            return
+        yield from page
+        if len(page) < _SCAN_PAGE_SIZE:
+            return
+        first += len(page)
+
+
+async def asearch_user(realm: str, username: str) -> Optional[User]:
+    users = await keycloak_async.kc_request(
+        "GET",
+        f"/admin/realms/{realm}/users",
+        params={"username": username, "exact": "true", "briefRepresentation": "true"},
+        model=User,
+    )
+    # Keycloak keeps usernames in lower case and matches them ignoring case
+    for u in users:
+        if (u.username or "").lower() == username.lower():
+            return u
+    return None
+
+
+async def aiter_realm_users(realm: str, params: Optional[dict] = None):
+    first = 0
+    while True:
+        page = await keycloak_async.kc_request(
+            "GET",
+            f"/admin/realms/{realm}/users",
+            params={**(params or {}), "first": first, "max": _SCAN_PAGE_SIZE, "briefRepresentation": "true"},
+            model=User,
+        )
+        if not page:
+            return
+        for u in page:
+            yield u
+        if len(page) < _SCAN_PAGE_SIZE:
+            return
+        first += len(page)
+
+
+class UserDirectory:
+    """Resolves usernames once per run and realm and remembers the result.
+
+    It keeps a kc.core.models.User per resolved user: the id, plus what
+    `users update` compares to skip users that already have the wanted values.
+    A missing user is remembered as None so repeated steps never search again.
+    Every id it learns also goes to the id cache (kc.core.idcache) for later runs.
+    """
+
+    def __init__(self) -> None:
+        self._users: dict[tuple[str, str], Optional[User]] = {}
+
+    def _pending(self, realm: str, usernames: list[str]) -> list[str]:
+        return [un for un in dict.fromkeys(usernames) if (realm, un) not in self._users]
+
+    def _store(self, realm: str, username: str, user: Optional[User]) -> None:
+        self._users[(realm, username)] = user
+        if user is not None and user.id:
+            idcache.remember(realm, "user", username, user.id)
+        elif user is None:
+            idcache.forget(realm, "user", username)
+
+    def _store_scan(self, realm: str, pending: list[str], found: dict[str, User]) -> None:
+        # found is keyed by lower-case username
+        for un in pending:
+            self._store(realm, un, found.get(un.lower()))
+
+    def prefetch(self, realm: str, usernames: list[str]) -> None:
+        pending = self._pending(realm, usernames)
+        if not pending:
+            return
+
+        # small batches are left to get(), so their exact lookups run inside the workers
+        if len(pending) <= _EXACT_LOOKUP_MAX or not self._scan_is_cheaper(realm, len(pending)):
+            return
+
+        wanted = {un.lower() for un in pending}
+        found: dict[str, User] = {}
+        for u in iter_realm_users(realm):
+            un = (u.username or "").lower()
+            if un in wanted:
+                found[un] = u
+        self._store_scan(realm, pending, found)
+
+    async def aprefetch(self, realm: str, usernames: list[str]) -> None:
+        pending = self._pending(realm, usernames)
+        if not pending:
+            return
+        if len(pending) <= _EXACT_LOOKUP_MAX:
+            return
+        total = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/users/count")
+        if not _scan_is_cheaper(total, len(pending)):
+            return
+
+        wanted = {un.lower() for un in pending}
+        found: dict[str, User] = {}
+        async for u in aiter_realm_users(realm):
+            un = (u.username or "").lower()
+            if un in wanted:
+                found[un] = u
+        self._store_scan(realm, pending, found)
+
+    def get(self, realm: str, username: str) -> Optional[User]:
+        key = (realm, username)
+        if key not in self._users:
+            self._store(realm, username, search_user(realm, username))
+        return self._users[key]
+
+    async def aget(self, realm: str, username: str) -> Optional[User]:
+        key = (realm, username)
+        if key not in self._users:
+            self._store(realm, username, await asearch_user(realm, username))
+        return self._users[key]
+
+    def fetch(self, realm: str, username: str) -> Optional[User]:
+        """get(), but by the id cache's id when there is one: one GET of the user by id, no search.
+
+        The user read by id must still carry the username; one renamed since is
+        treated as stale and the name searched again.
+        """
+        key = (realm, username)
+        if key in self._users:
+            return self._users[key]
+
+        def resolve() -> Optional[str]:
+            u = self.get(realm, username)
+            return u.id if u is not None else None
+
+        def read(user_id: Optional[str]) -> Optional[User]:
+            if not user_id:
+                return None
+            u = self._users.get(key)
+            if u is None or u.id != user_id:
+                u = kc_request("GET", f"/admin/realms/{realm}/users/{user_id}", model=User)
+                if (u.username or "").lower() != username.lower():
+                    raise idcache.stale("user", username)
+                self._users[key] = u
+            return u
+
+        return idcache.cached_call(realm, "user", username, resolve, read)
+
+    async def afetch(self, realm: str, username: str) -> Optional[User]:
+        key = (realm, username)
+        if key in self._users:
+            return self._users[key]
+
+        async def resolve() -> Optional[str]:
+            u = await self.aget(realm, username)
+            return u.id if u is not None else None
+
+        async def read(user_id: Optional[str]) -> Optional[User]:
+            if not user_id:
+                return None
+            u = self._users.get(key)
+            if u is None or u.id != user_id:
+                u = await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/users/{user_id}", model=User)
+                if (u.username or "").lower() != username.lower():
+                    raise idcache.stale("user", username)
+                self._users[key] = u
+            return u
+
+        return await idcache.acached_call(realm, "user", username, resolve, read)
+
+    def remember(self, realm: str, username: str, user: Optional[User]) -> None:
+        self._store(realm, username, user)
+
+    def _scan_is_cheaper(self, realm: str, n_names: int) -> bool:
+        total = kc_request("GET", f"/admin/realms/{realm}/users/count")
+        return _scan_is_cheaper(total, n_names)
+
+
+def _scan_is_cheaper(total_users, n_names: int) -> bool:
+    pages = -(-int(total_users or 0) // _SCAN_PAGE_SIZE)
+    return pages < n_names
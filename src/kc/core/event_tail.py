@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from kc.core import keycloak_async
+
+# endpoint and realm setting of each kind of event
+KINDS = {
+    "admin": ("admin-events", "adminEventsEnabled"),
+    "login": ("events", "eventsEnabled"),
+}
+_PAGE_SIZE = 100
+# events are taken again from this far behind the newest one seen: an event can
+# become visible after a newer one, and several share a millisecond
+_OVERLAP_MS = 5000
+
+
+def _date_from(ms: int) -> str:
+    # the events filters only take a day
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+
+
+def event_key(ev: dict[str, Any]) -> tuple:
+    """Identity of an event: its id, or its content where the server has no event ids."""
+    if ev.get("id"):
+        return (ev["id"],)
+    return (
+        ev.get("time"),
+        ev.get("type") or ev.get("operationType"),
+        ev.get("resourcePath"),
+        ev.get("userId"),
+        ev.get("sessionId"),
+        ev.get("clientId"),
+        ev.get("ipAddress"),
+    )
+
+
+@dataclass
+class EventStream:
+    """Polls one kind of event of one realm and yields each event once.
+
+    Every poll reads the events from `_OVERLAP_MS` before the newest one seen,
+    newest first, and drops those already seen. Only the keys of events inside
+    that window are kept, so memory stays bounded however long the tail runs.
+    The poll interval halves after a poll that found events and grows by half
+    after one that did not, within [min_interval, max_interval].
+    """
+
+    realm: str
+    kind: str
+    min_interval: float
+    max_interval: float
+    interval: float = 0.0
+    newest: Optional[int] = None
+    # event key -> time (ms), for the events inside the overlap window
+    seen: dict[tuple, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.interval = self.interval or self.min_interval
+
+    @property
+    def path(self) -> str:
+        return f"/admin/realms/{self.realm}/{KINDS[self.kind][0]}"
+
+    async def _pages(self, since: Optional[int]):
+        params: dict[str, Any] = {"max": _PAGE_SIZE}
+        if since is not None:
+            params["dateFrom"] = _date_from(since)
+        first = 0
+        while True:
+            page = await keycloak_async.kc_request("GET", self.path, params={**params, "first": first})
+            yield page
+            if len(page) < _PAGE_SIZE:
+                return
+            first += len(page)
+
+    async def start(self) -> None:
+        """Mark the events already there as seen, so the tail begins with the next one."""
+        page = await keycloak_async.kc_request("GET", self.path, params={"first": 0, "max": _PAGE_SIZE})
+        self._take(page)
+
+    def _take(self, newest_first: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Events of a poll not seen before, oldest first; updates the window."""
+        fresh = []
+        for ev in newest_first:
+            key = event_key(ev)
+            if key in self.seen:
+                continue
+            t = int(ev.get("time") or 0)
+            self.seen[key] = t
+            fresh.append(ev)
+            if self.newest is None or t > self.newest:
+                self.newest = t
+        if self.newest is not None:
+            horizon = self.newest - _OVERLAP_MS
+            self.seen = {k: t for k, t in self.seen.items() if t >= horizon}
+        fresh.reverse()
+        return fresh
+
+    async def poll(self) -> list[dict[str, Any]]:
+        since = None if self.newest is None else self.newest - _OVERLAP_MS
+        batch: list[dict[str, Any]] = []
+        async for page in self._pages(since):
+            done = False
+            for ev in page:
+                if since is not None and int(ev.get("time") or 0) < since:
+                    done = True
+                    break
+                batch.append(ev)
+            if done:
+                break
+        fresh = self._take(batch)
+        if fresh:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return fresh
+
+
+async def tail(
+    streams: list[EventStream],
+    emit: Callable[[EventStream, list[dict[str, Any]]], None],
+    *,
+    duration: float = 0.0,
+    on_error: Callable[[EventStream, Exception], None] = lambda s, e: None,
+) -> None:
+    """Poll every stream on its own schedule until duration (seconds) has passed, or forever if 0.
+
+    emit gets the new events of each poll, oldest first.
+    All streams run on one event loop and so share one connection pool. A failed poll
+    is reported to on_error and counts as an idle one, so the stream backs off.
+    """
+    deadline = time.monotonic() + duration if duration else None
+
+    async def follow(s: EventStream) -> None:
+        started = False
+        first = True
+        while True:
+            if not first:
+                wait = s.interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return
+                await asyncio.sleep(wait)
+            first = False
+            try:
+                if not started:
+                    await s.start()
+                    started = True
+                    continue
+                fresh = await s.poll()
+                if fresh:
+                    emit(s, fresh)
+            except Exception as e:
+                # a tail outlives network trouble and server restarts
+                s.interval = min(s.max_interval, s.interval * 1.5)
+                on_error(s, e)
+
+    await asyncio.gather(*(follow(s) for s in streams))
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import sqlite3
+import sys
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from kc.core.config import get_config
+
+T = TypeVar("T")
+
+DEFAULT_PATH = "kc-ids.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ids (
+    server TEXT NOT NULL,
+    realm TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (server, realm, kind, name)
+) WITHOUT ROWID
+"""
+# pending writes are flushed in one transaction once there are this many, and at exit
+_FLUSH_AT = 1000
+
+
+def _is_404(err: Exception) -> bool:
+    return "404" in str(err).lower()
+
+
+class IdCache:
+    """Name -> id of admin API objects (clients, client scopes, users), per server and realm.
+
+    Kept in SQLite across runs, so a name resolved once is not looked up again.
+    Entries are never checked up front: a request that uses a stale id gets a 404,
+    and cached_call() resolves the name again. A cache that cannot be read or
+    written is switched off with a warning; it never fails a command.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._broken = False
+        self._lock = threading.Lock()
+        # (server, realm, kind, name) -> id, or None to delete; not yet written
+        self._pending: dict[tuple[str, str, str, str], Optional[str]] = {}
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._broken:
+            try:
+                conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+                # --cmd-file --parallel runs share the file
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(_SCHEMA)
+                self._conn = conn
+            except sqlite3.Error as e:
+                self._disable(e)
+        return self._conn
+
+    def _disable(self, err: Exception) -> None:
+        self._broken = True
+        self._conn = None
+        sys.stderr.write(f"Warning: id cache {self.path!r} disabled: {err}\n")
+
+    @staticmethod
+    def _key(realm: str, kind: str, name: str) -> tuple[str, str, str, str]:
+        # Keycloak keeps usernames in lower case
+        return get_config().server_url.rstrip("/"), realm, kind, name.lower() if kind == "user" else name
+
+    def get(self, realm: str, kind: str, name: str) -> Optional[str]:
+        key = self._key(realm, kind, name)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            db = self._db()
+            if db is None:
+                return None
+            try:
+                row = db.execute(
+                    "SELECT id FROM ids WHERE server = ? AND realm = ? AND kind = ? AND name = ?", key
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+        return row[0] if row else None
+
+    def put(self, realm: str, kind: str, name: str, object_id: str) -> None:
+        self._stage(self._key(realm, kind, name), object_id)
+
+    def drop(self, realm: str, kind: str, name: str) -> None:
+        self._stage(self._key(realm, kind, name), None)
+
+    def _stage(self, key: tuple[str, str, str, str], object_id: Optional[str]) -> None:
+        with self._lock:
+            self._pending[key] = object_id
+            if len(self._pending) >= _FLUSH_AT:
+                self._flush()
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        db = self._db()
+        if db is None or not pending:
+            return
+        try:
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO ids VALUES (?, ?, ?, ?, ?)",
+                    [(*k, v) for k, v in pending.items() if v is not None],
+                )
+                db.executemany(
+                    "DELETE FROM ids WHERE server = ? AND realm = ? AND kind = ? AND name = ?",
+                    [k for k, v in pending.items() if v is None],
+                )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_CACHE: Optional[IdCache] = None
+
+
+def configure(path: str) -> None:
+    """Use the cache file at path for this run; "" switches the cache off."""
+    global _CACHE
+    close()
+    _CACHE = IdCache(path) if path else None
+
+
+def close() -> None:
+    if _CACHE is not None:
+        _CACHE.close()
+
+
+def known(realm: str, kind: str, name: str) -> Optional[str]:
+    """The cached id of name, if any; for skipping bulk lookups of names already known."""
+    return _CACHE.get(realm, kind, name) if _CACHE is not None else None
+
+
+def remember(realm: str, kind: str, name: str, object_id: str) -> None:
+    """Record an id the command learnt anyway, e.g. from a create's Location header."""
+    if _CACHE is not None and object_id:
+        _CACHE.put(realm, kind, name, object_id)
+
+
+def forget(realm: str, kind: str, name: str) -> None:
+    if _CACHE is not None:
+        _CACHE.drop(realm, kind, name)
+
+
+def stale(kind: str, name: str) -> RuntimeError:
+    """Error for a use() that finds the cached id now carries another name; handled like a 404.
+
+    Deletes and updates check the name before they act, so an object renamed
+    elsewhere is never changed under its old name.
+    """
+    return RuntimeError(f"404: {kind} {name!r} was renamed since its id was cached")
+
+
+def cached_call(
+    realm: str,
+    kind: str,
+    name: str,
+    resolve: Callable[[], Optional[str]],
+    use: Callable[[Optional[str]], T],
+) -> T:
+    """use(id) with the cached id of name; resolve() it on a miss.
+
+    A 404 from use() with a cached id means the id may be stale (the object was
+    deleted and created again): the name is resolved again and use() retried
+    once. If it still resolves to the same id, the 404 was about something else
+    and is raised. resolve() returns None (or raises) when there is no such
+    object; use(None) then decides what a missing object means.
+    """
+    cached = known(realm, kind, name)
+    if cached:
+        try:
+            return use(cached)
+        except RuntimeError as e:
+            if not _is_404(e):
+                raise
+            fresh = resolve()
+            if fresh == cached:
+                raise
+            _refresh(realm, kind, name, fresh)
+            return use(fresh)
+    fresh = resolve()
+    _refresh(realm, kind, name, fresh)
+    return use(fresh)
+
+
+async def acached_call(
+    realm: str,
+    kind: str,
+    name: str,
+    resolve: Callable[[], Awaitable[Optional[str]]],
+    use: Callable[[Optional[str]], Awaitable[T]],
+) -> T:
+    """cached_call() on the async engine."""
+    cached = known(realm, kind, name)
+    if cached:
+        try:
+            return await use(cached)
+        except RuntimeError as e:
+            if not _is_404(e):
+                raise
+            fresh = await resolve()
+            if fresh == cached:
+                raise
+            _refresh(realm, kind, name, fresh)
+            return await use(fresh)
+    fresh = await resolve()
+    _refresh(realm, kind, name, fresh)
+    return await use(fresh)
+
+
+def _refresh(realm: str, kind: str, name: str, object_id: Optional[str]) -> None:
+    if object_id:
+        remember(realm, kind, name, object_id)
+    else:
+        forget(realm, kind, name)
@@ -0,0 +1,457 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from kc.core import admin_events, keycloak_async
+from kc.core.admin_events import ChangeSet, Cursor
+from kc.core.keycloak import kc_request
+from kc.core.models import Client, ClientScope, Role, User
+
+DEFAULT_PATH = "kc-index.sqlite"
+
+_SCHEMA_VERSION = 2
+# Every row carries the server it came from, so one file can index several
+# clusters (--profiles). The lookup indexes lead with the server, and their
+# NOCASE columns let the LIKE lookups of `kc find` use them.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    server     TEXT PRIMARY KEY,
+    built_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS realms (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    -- admin event cursor for `index refresh`: time (epoch ms) and id of the last event applied
+    event_time INTEGER,
+    event_id   TEXT,
+    PRIMARY KEY (server, realm)
+);
+CREATE TABLE IF NOT EXISTS users (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    username   TEXT COLLATE NOCASE,
+    email      TEXT COLLATE NOCASE,
+    first_name TEXT,
+    last_name  TEXT,
+    enabled    INTEGER,
+    PRIMARY KEY (server, realm, id)
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (server, username);
+CREATE INDEX IF NOT EXISTS users_email ON users (server, email);
+CREATE TABLE IF NOT EXISTS clients (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    client_id  TEXT COLLATE NOCASE,
+    name       TEXT,
+    enabled    INTEGER,
+    public     INTEGER,
+    PRIMARY KEY (server, realm, id)
+);
+CREATE INDEX IF NOT EXISTS clients_client_id ON clients (server, client_id);
+CREATE TABLE IF NOT EXISTS redirect_uris (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    client     TEXT NOT NULL,
+    uri        TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS redirect_uris_uri ON redirect_uris (server, uri);
+CREATE INDEX IF NOT EXISTS redirect_uris_client ON redirect_uris (server, realm, client);
+CREATE TABLE IF NOT EXISTS roles (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    name       TEXT COLLATE NOCASE,
+    -- internal id of the owning client; NULL for realm roles
+    client     TEXT,
+    description TEXT,
+    PRIMARY KEY (server, realm, id)
+);
+CREATE INDEX IF NOT EXISTS roles_name ON roles (server, name);
+CREATE INDEX IF NOT EXISTS roles_client ON roles (server, realm, client);
+CREATE TABLE IF NOT EXISTS scopes (
+    server     TEXT NOT NULL,
+    realm      TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    name       TEXT COLLATE NOCASE,
+    protocol   TEXT,
+    PRIMARY KEY (server, realm, id)
+);
+CREATE INDEX IF NOT EXISTS scopes_name ON scopes (server, name);
+"""
+
+_PAGE_SIZE = 500
+# tables holding objects of a realm, i.e. everything but servers and realms
+_REALM_TABLES = ("users", "clients", "redirect_uris", "roles", "scopes")
+
+
+@dataclass
+class RealmSnapshot:
+    """Everything the index keeps about one realm, as table rows (without server and realm).
+
+    cursor is the newest admin event at the time the snapshot was taken.
+    """
+
+    realm: str
+    users: list[tuple] = field(default_factory=list)
+    clients: list[tuple] = field(default_factory=list)
+    redirect_uris: list[tuple] = field(default_factory=list)
+    roles: list[tuple] = field(default_factory=list)
+    scopes: list[tuple] = field(default_factory=list)
+    cursor: Optional[Cursor] = None
+
+    def add_user(self, u: User) -> None:
+        self.users.append((u.id, u.username, u.email, u.first_name, u.last_name, _flag(u.enabled)))
+
+    def add_client(self, c: Client) -> None:
+        self.clients.append((c.id, c.client_id, c.name, _flag(c.enabled), _flag(c.public_client)))
+        self.redirect_uris.extend((c.id, uri) for uri in c.redirect_uris or ())
+
+    def add_role(self, role: Role, client: Optional[str] = None) -> None:
+        self.roles.append((role.id, role.name, client, role.description))
+
+    def add_scope(self, s: ClientScope) -> None:
+        self.scopes.append((s.id, s.name, s.protocol))
+
+
+@dataclass
+class RealmChanges:
+    """Rows to write for the objects a ChangeSet touched; touched objects that are gone get deleted."""
+
+    realm: str
+    changes: ChangeSet
+    rows: RealmSnapshot
+    cursor: Cursor
+
+
+def _flag(value: Optional[bool]) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+def fetch_realm(realm: str) -> RealmSnapshot:
+    """Page through a realm's users, clients, realm roles, client roles and client scopes."""
+    snap = RealmSnapshot(realm, cursor=_latest_cursor(realm))
+    for u in _walk(realm, "users", User, {"briefRepresentation": "true"}):
+        snap.add_user(u)
+    clients = list(_walk(realm, "clients", Client))
+    for c in clients:
+        snap.add_client(c)
+    for role in _walk(realm, "roles", Role, {"briefRepresentation": "true"}):
+        snap.add_role(role)
+    # there is no cross-client role listing: one request per client
+    for c in clients:
+        for role in kc_request("GET", f"/admin/realms/{realm}/clients/{c.id}/roles", model=Role):
+            snap.add_role(role, c.id)
+    for s in kc_request("GET", f"/admin/realms/{realm}/client-scopes", model=ClientScope):
+        snap.add_scope(s)
+    return snap
+
+
+async def afetch_realm(realm: str) -> RealmSnapshot:
+    """fetch_realm() on the async engine."""
+    snap = RealmSnapshot(realm, cursor=await _alatest_cursor(realm))
+    async for u in _awalk(realm, "users", User, {"briefRepresentation": "true"}):
+        snap.add_user(u)
+    clients = [c async for c in _awalk(realm, "clients", Client)]
+    for c in clients:
+        snap.add_client(c)
+    async for role in _awalk(realm, "roles", Role, {"briefRepresentation": "true"}):
+        snap.add_role(role)
+    for c in clients:
+        for role in await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/clients/{c.id}/roles", model=Role):
+            snap.add_role(role, c.id)
+    for s in await keycloak_async.kc_request("GET", f"/admin/realms/{realm}/client-scopes", model=ClientScope):
+        snap.add_scope(s)
+    return snap
+
+
+def _latest_cursor(realm: str) -> Optional[Cursor]:
+    try:
+        return admin_events.latest_cursor(realm)
+    except RuntimeError:
+        # no access to admin events: `index refresh` falls back to full syncs
+        return None
+
+
+async def _alatest_cursor(realm: str) -> Optional[Cursor]:
+    try:
+        return await admin_events.alatest_cursor(realm)
+    except RuntimeError:
+        return None
+
+
+def _is_404(err: Exception) -> bool:
+    return "404" in str(err).lower()
+
+
+def _get_or_none(path: str, model: type) -> Any:
+    try:
+        return kc_request("GET", path, model=model)
+    except RuntimeError as e:
+        if _is_404(e):
+            return None
+        raise
+
+
+async def _aget_or_none(path: str, model: type) -> Any:
+    try:
+        return await keycloak_async.kc_request("GET", path, model=model)
+    except RuntimeError as e:
+        if _is_404(e):
+            return None
+        raise
+
+
+def fetch_changes(realm: str, changes: ChangeSet, cursor: Cursor) -> RealmChanges:
+    """Read again every object a run of admin events touched."""
+    rows = RealmSnapshot(realm)
+    base = f"/admin/realms/{realm}"
+    for user_id in changes.users:
+        u = _get_or_none(f"{base}/users/{user_id}", User)
+        if u is not None:
+            rows.add_user(u)
+    for client_id in changes.clients:
+        c = _get_or_none(f"{base}/clients/{client_id}", Client)
+        if c is not None:
+            rows.add_client(c)
+    for client_id in changes.client_roles:
+        for role in _get_or_none(f"{base}/clients/{client_id}/roles", Role) or ():
+            rows.add_role(role, client_id)
+    if changes.realm_roles:
+        for role in _walk(realm, "roles", Role, {"briefRepresentation": "true"}):
+            rows.add_role(role)
+    for scope_id in changes.scopes:
+        s = _get_or_none(f"{base}/client-scopes/{scope_id}", ClientScope)
+        if s is not None:
+            rows.add_scope(s)
+    return RealmChanges(realm, changes, rows, cursor)
+
+
+async def afetch_changes(realm: str, changes: ChangeSet, cursor: Cursor) -> RealmChanges:
+    """fetch_changes() on the async engine."""
+    rows = RealmSnapshot(realm)
+    base = f"/admin/realms/{realm}"
+    for user_id in changes.users:
+        u = await _aget_or_none(f"{base}/users/{user_id}", User)
+        if u is not None:
+            rows.add_user(u)
+    for client_id in changes.clients:
+        c = await _aget_or_none(f"{base}/clients/{client_id}", Client)
+        if c is not None:
+            rows.add_client(c)
+    for client_id in changes.client_roles:
+        for role in await _aget_or_none(f"{base}/clients/{client_id}/roles", Role) or ():
+            rows.add_role(role, client_id)
+    if changes.realm_roles:
+        async for role in _awalk(realm, "roles", Role, {"briefRepresentation": "true"}):
+            rows.add_role(role)
+    for scope_id in changes.scopes:
+        s = await _aget_or_none(f"{base}/client-scopes/{scope_id}", ClientScope)
+        if s is not None:
+            rows.add_scope(s)
+    return RealmChanges(realm, changes, rows, cursor)
+
+
+def _walk(realm: str, what: str, model: type, params: Optional[dict[str, Any]] = None):
+    path = f"/admin/realms/{realm}/{what}"
+    first = 0
+    while True:
+        page = kc_request("GET", path, params={**(params or {}), "first": first, "max": _PAGE_SIZE}, model=model)
+        yield from page
+        if len(page) < _PAGE_SIZE:
+            return
+        first += len(page)
+
+
+async def _awalk(realm: str, what: str, model: type, params: Optional[dict[str, Any]] = None):
+    path = f"/admin/realms/{realm}/{what}"
+    first = 0
+    while True:
+        page = await keycloak_async.kc_request(
+            "GET", path, params={**(params or {}), "first": first, "max": _PAGE_SIZE}, model=model
+        )
+        for obj in page:
+            yield obj
+        if len(page) < _PAGE_SIZE:
+            return
+        first += len(page)
+
+
+def like_pattern(text: str) -> str:
+    """`*` is the wildcard of `kc find`; everything else matches literally."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%")
+
+
+class Index:
+    """Local SQLite copy of the users, clients, roles and client scopes of one or more servers.
+
+    Each realm is replaced in one transaction, so a reader never sees half a
+    realm. One Index can be shared by worker threads; writes are serialized.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self.path = path
+        # WAL lets `kc find` read while another process is building
+        self._db = sqlite3.connect(path, timeout=60.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, _SCHEMA_VERSION):
+            raise RuntimeError(f"{path} was written by another version of kc; delete it and run `kc index build` again")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "Index":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def replace_realm(self, server: str, snap: RealmSnapshot) -> None:
+        r = snap.realm
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for table in _REALM_TABLES:
+                    db.execute(f"DELETE FROM {table} WHERE server = ? AND realm = ?", (server, r))
+                self._insert(server, snap)
+                self._set_cursor(server, r, snap.cursor)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def apply_changes(self, server: str, ch: RealmChanges) -> None:
+        """Replace the rows of the touched objects and move the realm's cursor, in one transaction."""
+        r = ch.realm
+        key = (server, r)
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id in ch.changes.users:
+                    db.execute("DELETE FROM users WHERE server = ? AND realm = ? AND id = ?", (*key, user_id))
+                for client_id in ch.changes.clients:
+                    db.execute("DELETE FROM clients WHERE server = ? AND realm = ? AND id = ?", (*key, client_id))
+                    db.execute("DELETE FROM redirect_uris WHERE server = ? AND realm = ? AND client = ?", (*key, client_id))
+                for client_id in ch.changes.client_roles:
+                    db.execute("DELETE FROM roles WHERE server = ? AND realm = ? AND client = ?", (*key, client_id))
+                if ch.changes.realm_roles:
+                    db.execute("DELETE FROM roles WHERE server = ? AND realm = ? AND client IS NULL", key)
+                for scope_id in ch.changes.scopes:
+                    db.execute("DELETE FROM scopes WHERE server = ? AND realm = ? AND id = ?", (*key, scope_id))
+                self._insert(server, ch.rows)
+                self._set_cursor(server, r, ch.cursor)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _insert(self, server: str, snap: RealmSnapshot) -> None:
+        db, r = self._db, snap.realm
+        db.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((server, r, *row) for row in snap.users))
+        db.executemany("INSERT INTO clients VALUES (?, ?, ?, ?, ?, ?, ?)", ((server, r, *row) for row in snap.clients))
+        db.executemany("INSERT INTO redirect_uris VALUES (?, ?, ?, ?)", ((server, r, *row) for row in snap.redirect_uris))
+        db.executemany("INSERT INTO roles VALUES (?, ?, ?, ?, ?, ?)", ((server, r, *row) for row in snap.roles))
+        db.executemany("INSERT INTO scopes VALUES (?, ?, ?, ?, ?)", ((server, r, *row) for row in snap.scopes))
+
+    def _set_cursor(self, server: str, realm: str, cursor: Optional[Cursor]) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO realms VALUES (?, ?, ?, ?, ?)",
+            (server, realm, time.time(), cursor.time if cursor else None, cursor.event_id if cursor else None),
+        )
+
+    def cursor(self, server: str, realm: str) -> Optional[Cursor]:
+        row = self._db.execute(
+            "SELECT event_time, event_id FROM realms WHERE server = ? AND realm = ?", (server, realm)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return Cursor(row[0], row[1] or "")
+
+    def finish_build(self, server: str, realms: list[str]) -> None:
+        """Record the build time and drop realms that no longer exist on the server."""
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                current = set(realms)
+                stale = [
+                    row[0]
+                    for row in db.execute("SELECT realm FROM realms WHERE server = ?", (server,))
+                    if row[0] not in current
+                ]
+                for r in stale:
+                    for table in (*_REALM_TABLES, "realms"):
+                        db.execute(f"DELETE FROM {table} WHERE server = ? AND realm = ?", (server, r))
+                db.execute("INSERT OR REPLACE INTO servers VALUES (?, ?)", (server, time.time()))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            # refresh the planner statistics, or SQLite may pick the primary key over the lookup indexes
+            db.execute("PRAGMA optimize")
+
+    def built_at(self, server: str) -> Optional[float]:
+        row = self._db.execute("SELECT built_at FROM servers WHERE server = ?", (server,)).fetchone()
+        return row[0] if row else None
+
+    def totals(self, server: str) -> dict[str, int]:
+        out = {}
+        for table in ("realms", "users", "clients", "roles", "scopes"):
+            out[table] = self._db.execute(f"SELECT count(*) FROM {table} WHERE server = ?", (server,)).fetchone()[0]
+        return out
+
+    def find_users(self, server: str, text: str) -> list[tuple]:
+        """(realm, username, email, id) of users whose username or email matches."""
+        pattern = like_pattern(text)
+        return self._db.execute(
+            "SELECT realm, username, email, id FROM users WHERE server = ? AND username LIKE ? ESCAPE '\\' "
+            "UNION SELECT realm, username, email, id FROM users WHERE server = ? AND email LIKE ? ESCAPE '\\' "
+            "ORDER BY 1, 2",
+            (server, pattern, server, pattern),
+        ).fetchall()
+
+    def find_clients(self, server: str, text: str) -> list[tuple]:
+        """(realm, clientId, id) of clients whose clientId matches."""
+        return self._db.execute(
+            "SELECT realm, client_id, id FROM clients WHERE server = ? AND client_id LIKE ? ESCAPE '\\' ORDER BY 1, 2",
+            (server, like_pattern(text)),
+        ).fetchall()
+
+    def find_clients_by_redirect_uri(self, server: str, text: str) -> list[tuple]:
+        """(realm, clientId, redirect URI) of clients with a matching redirect URI."""
+        return self._db.execute(
+            "SELECT u.realm, c.client_id, u.uri FROM redirect_uris u "
+            "JOIN clients c ON c.server = u.server AND c.realm = u.realm AND c.id = u.client "
+            "WHERE u.server = ? AND u.uri LIKE ? ESCAPE '\\' ORDER BY 1, 2, 3",
+            (server, like_pattern(text)),
+        ).fetchall()
+
+    def find_roles(self, server: str, text: str) -> list[tuple]:
+        """(realm, role name, clientId or None, description) of matching realm and client roles."""
+        return self._db.execute(
+            "SELECT r.realm, r.name, c.client_id, r.description FROM roles r "
+            "LEFT JOIN clients c ON c.server = r.server AND c.realm = r.realm AND c.id = r.client "
+            "WHERE r.server = ? AND r.name LIKE ? ESCAPE '\\' ORDER BY 1, 3 NULLS FIRST, 2",
+            (server, like_pattern(text)),
+        ).fetchall()
+
+    def find_scopes(self, server: str, text: str) -> list[tuple]:
+        """(realm, scope name, protocol, id) of matching client scopes."""
+        return self._db.execute(
+            "SELECT realm, name, protocol, id FROM scopes WHERE server = ? AND name LIKE ? ESCAPE '\\' ORDER BY 1, 2",
+            (server, like_pattern(text)),
+        ).fetchall()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Optional, TextIO
+
+from kc.core.batch import BatchCommand
+
+_HEADER = "# kc cmd-file journal v2: key<TAB>status<TAB>hash\n"
+
+
+def journal_path(cmd_file: Path) -> Path:
+    return cmd_file.with_name(cmd_file.name + ".journal")
+
+
+def command_hash(cmd: BatchCommand) -> str:
+    """Hash of everything that defines the command, so an edited line no longer matches."""
+    text = "\x1f".join([cmd.line, cmd.id, ",".join(cmd.depends_on), cmd.group])
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class Journal:
+    """Append-only record of finished --cmd-file commands, for --resume.
+
+    One line per finished command: its key, its status (ok or failed) and the
+    hash of its content. The key is the command's id when it has one, else its
+    content hash and which occurrence of that content in the file it is, so
+    inserting or deleting lines does not move the records of the others; the
+    position only tells duplicate lines apart. Records are buffered and written
+    with fsync every `batch` records or `interval` seconds, and on close; a
+    crash loses at most that window, and those commands simply run again on
+    resume.
+    """
+
+    def __init__(self, path: Path, *, resume: bool, batch: int = 64, interval: float = 1.0):
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        # key -> (status, hash); later records win
+        self.done: dict[str, tuple[str, str]] = {}
+        # occurrences of each content hash so far, and the key given to each command index
+        self._seen: dict[str, int] = {}
+        self._keys: dict[int, str] = {}
+        if resume and path.exists():
+            self._load()
+        self._fh: Optional[TextIO] = open(path, "a" if resume else "w", encoding="utf-8")
+        if self._fh.tell() == 0:
+            self._fh.write(_HEADER)
+        self._pending: list[str] = []
+        self._last_sync = time.monotonic()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for raw in f:
+                if raw.startswith("# kc cmd-file journal v1"):
+                    raise RuntimeError(
+                        f"--resume: {self.path} was written by an older version that keyed commands by line number; "
+                        "run without --resume to start a new journal"
+                    )
+                if raw.startswith("#"):
+                    continue
+                parts = raw.rstrip("\n").split("\t")
+                # a torn last line (crash mid-write) is ignored
+                if len(parts) != 3 or not parts[0]:
+                    continue
+                self.done[parts[0]] = (parts[1], parts[2])
+
+    def _key(self, cmd: BatchCommand) -> str:
+        """The command's journal key; commands must be keyed in file order."""
+        key = self._keys.get(cmd.index)
+        if key is None:
+            if cmd.id:
+                key = f"id:{cmd.id}"
+            else:
+                h = command_hash(cmd)
+                n = self._seen[h] = self._seen.get(h, 0) + 1
+                key = f"{h}:{n}"
+            self._keys[cmd.index] = key
+        return key
+
+    def check(self, cmd: BatchCommand) -> str:
+        """Return "done" if the command already finished ok unchanged, "changed" if it
+        finished ok but has been edited since, or "" if it still has to run.
+
+        Only a command with an id can be "changed": an edited line without one
+        no longer matches any record and simply runs.
+        """
+        rec = self.done.get(self._key(cmd))
+        if rec is None or rec[0] != "ok":
+            return ""
+        if rec[1] != command_hash(cmd):
+            return "changed"
+        # not run, so never recorded: its key is not needed any more
+        del self._keys[cmd.index]
+        return "done"
+
+    def record(self, cmd: BatchCommand, status: str) -> None:
+        key = self._key(cmd)
+        del self._keys[cmd.index]
+        self._pending.append(f"{key}\t{status}\t{command_hash(cmd)}\n")
+        if len(self._pending) >= self.batch or time.monotonic() - self._last_sync >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._fh is None:
+            return
+        if self._pending:
+            self._fh.write("".join(self._pending))
+            self._pending.clear()
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._fh.close()
+            self._fh = None
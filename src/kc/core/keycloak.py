@@ -1,53 +1,228 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import atexit
+import importlib.util
+import threading
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Sequence
 
 import httpx
 
-from kc.core.config import GLOBAL
+try:  # optional: pip install "kc[fast]"
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+from kc.core import metrics, trace
+from kc.core.config import Config, get_config
 
 
 _TOKEN_CACHE: dict[str, str] = {}
+_LOGIN_LOCK = Lock()
+# per token-cache key, so logins to different servers do not wait for each other
+_LOGIN_LOCKS: dict[str, Lock] = {}
+
+# One keep-alive pool per (server, transport), shared by every request (and every worker thread)
+_CLIENTS: dict[tuple[str, bool], Any] = {}
+_CLIENT_LOCK = Lock()
+
+# GETs in flight, by _flight_key; an identical GET waits for that one instead of being sent
+_FLIGHTS: dict[tuple, "_Flight"] = {}
+_FLIGHTS_LOCK = Lock()
+
+# httpx decodes gzip itself, and br when brotli (or brotlicffi) is installed
+_HAS_BROTLI = any(importlib.util.find_spec(m) is not None for m in ("brotli", "brotlicffi"))
+_ACCEPT_ENCODING = "gzip, br" if _HAS_BROTLI else "gzip"
+
+# HTTP/2 connections per server; each one carries many concurrent requests
+_HTTP2_MAX_CONNECTIONS = 4
+
+
+class _Http2Client:
+    """HTTP/2 pool behind the same blocking request() as httpx.Client.
+
+    httpx's synchronous HTTP/2 connection is not safe to share between threads
+    (stream ids race), so an AsyncClient runs on one event-loop thread and worker
+    threads hand their requests to it. Their requests become concurrent streams on
+    a few connections; a new connection only opens once the server's stream limit
+    is reached.
+    """
+
+    def __init__(self, **client_kwargs: Any):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="kc-http2", daemon=True)
+        self._thread.start()
+        self._client = httpx.AsyncClient(**client_kwargs)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return asyncio.run_coroutine_threadsafe(self._client.request(method, url, **kwargs), self._loop).result()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def _client_kwargs(cfg: Config) -> dict[str, Any]:
+    """httpx client settings for a server, shared with the async engine."""
+    kwargs: dict[str, Any] = {"timeout": 60.0, "headers": {"Accept-Encoding": _ACCEPT_ENCODING}}
+    if not cfg.http2:
+        return kwargs
+
+    if importlib.util.find_spec("h2") is None:
+        raise RuntimeError('"http2" is enabled in config.json but the h2 package is missing: pip install "kc[http2]"')
+
+    # https negotiates HTTP/2 through ALPN (falling back to HTTP/1.1);
+    # plain http:// speaks it directly (h2c, prior knowledge)
+    plain = cfg.server_url.lower().startswith("http://")
+    kwargs.update(http1=not plain, http2=True, limits=httpx.Limits(max_connections=_HTTP2_MAX_CONNECTIONS))
+    return kwargs
 
 
-def _token_cache_key() -> str:
-    return f"{GLOBAL.server_url}|{GLOBAL.auth_realm}|{GLOBAL.grant_type}|{GLOBAL.client_id}|{GLOBAL.username}"
+def _new_http_client(cfg: Config):
+    kwargs = _client_kwargs(cfg)
+    return _Http2Client(**kwargs) if cfg.http2 else httpx.Client(**kwargs)
+
+
+def _http_client(cfg: Config):
+    key = (cfg.server_url, cfg.http2)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENT_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = _new_http_client(cfg)
+                atexit.register(client.close)
+    return client
+
+
+def _send(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    cfg = get_config()
+    url = f"{cfg.server_url.rstrip('/')}{path}"
+    started = time.perf_counter()
+    try:
+        r = _http_client(cfg).request(method, url, **kwargs)
+    except Exception:
+        metrics.record(method, path, 0, 0, time.perf_counter() - started)
+        raise
+    # bytes as received, i.e. before gzip/br decoding
+    metrics.record(method, path, r.status_code, r.num_bytes_downloaded, time.perf_counter() - started)
+    return r
+
+
+def _token_cache_key(cfg: Config) -> str:
+    return f"{cfg.server_url}|{cfg.auth_realm}|{cfg.grant_type}|{cfg.client_id}|{cfg.username}"
 
 
 def login() -> str:
-    key = _token_cache_key()
+    cfg = get_config()
+    key = _token_cache_key(cfg)
     if key in _TOKEN_CACHE:
         return _TOKEN_CACHE[key]
 
-    token_url = f"{GLOBAL.server_url.rstrip('/')}/realms/{GLOBAL.auth_realm}/protocol/openid-connect/token"
+    with _LOGIN_LOCK:
+        lock = _LOGIN_LOCKS.setdefault(key, Lock())
+    with lock:
+        if key in _TOKEN_CACHE:
+            return _TOKEN_CACHE[key]
+        with trace.span("login", auth_realm=cfg.auth_realm, grant_type=cfg.grant_type):
+            return _login(cfg, key)
+
 
-    if GLOBAL.grant_type == "password":
+def _token_request(cfg: Config) -> tuple[str, dict[str, str]]:
+    token_path = f"/realms/{cfg.auth_realm}/protocol/openid-connect/token"
+
+    if cfg.grant_type == "password":
         data = {
             "grant_type": "password",
-            "username": GLOBAL.username,
-            "password": GLOBAL.password,
+            "username": cfg.username,
+            "password": cfg.password,
             "client_id": "admin-cli",
         }
     else:
         data = {
             "grant_type": "client_credentials",
-            "client_id": GLOBAL.client_id,
-            "client_secret": GLOBAL.client_secret,
+            "client_id": cfg.client_id,
+            "client_secret": cfg.client_secret,
         }
+    return token_path, data
 
-    with httpx.Client(timeout=30.0) as c:
-        r = c.post(token_url, data=data)
-        r.raise_for_status()
-        payload = r.json()
 
-    token = payload.get("access_token")
+def _token_from(r: httpx.Response) -> str:
+    r.raise_for_status()
+    token = r.json().get("access_token")
     if not token:
         raise RuntimeError("login failed: missing access_token")
+    return token
 
+
+def _login(cfg: Config, key: str) -> str:
+    token_path, data = _token_request(cfg)
+    r = _send("POST", token_path, data=data, timeout=30.0)
+    token = _token_from(r)
     _TOKEN_CACHE[key] = token
     return token
 
 
+def _realm_of(path: str) -> str:
+    parts = path.split("/")
+    if len(parts) > 3 and parts[1] == "admin" and parts[2] == "realms":
+        return parts[3]
+    return ""
+
+
+class _Flight:
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.response: Optional[httpx.Response] = None
+        self.error: Optional[BaseException] = None
+
+
+def _flight_key(cfg: Config, path: str, params: Optional[dict[str, Any]]) -> tuple:
+    # same server and identity, same URL: the answer is the same for every caller
+    query = tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+    return _token_cache_key(cfg), path, query
+
+
+def _single_flight(path: str, params: Optional[dict[str, Any]], fetch) -> httpx.Response:
+    """Run fetch() for a GET, unless an identical GET is in flight; then wait for its result.
+
+    Waiters get the same response (or exception) as the request they waited for.
+    Responses are shared, not decoded data, so every caller still decodes its own copy.
+    """
+    key = _flight_key(get_config(), path, params)
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = _FLIGHTS[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        metrics.record_shared("GET", path)
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    try:
+        flight.response = fetch()
+        return flight.response
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _FLIGHTS_LOCK:
+            del _FLIGHTS[key]
+        flight.done.set()
+
+
 def kc_raw_request(
     method: str,
     path: str,
@@ -55,29 +230,90 @@ def kc_raw_request(
     json: Any = None,
     params: Optional[dict[str, Any]] = None,
     timeout: float = 60.0,
+) -> httpx.Response:
+    if method.upper() == "GET":
+        r = _single_flight(path, params, lambda: _fetch(method, path, json=json, params=params, timeout=timeout))
+    else:
+        r = _fetch(method, path, json=json, params=params, timeout=timeout)
+    _raise_for_status(r)
+    return r
+
+
+def _fetch(
+    method: str,
+    path: str,
+    *,
+    json: Any,
+    params: Optional[dict[str, Any]],
+    timeout: float,
 ) -> httpx.Response:
     token = login()
-    url = f"{GLOBAL.server_url.rstrip('/')}{path}"
 
     headers = {"Authorization": f"Bearer {token}"}
 
-    with httpx.Client(timeout=timeout) as c:
-        r = c.request(method, url, headers=headers, json=json, params=params)
+    if trace.enabled():
+        with trace.span(f"kc_request {method} {metrics.path_template(path)}", realm=_realm_of(path)) as sp:
+            r = _send(method, path, headers=headers, json=json, params=params, timeout=timeout)
+            sp.set(status=r.status_code)
+    else:
+        r = _send(method, path, headers=headers, json=json, params=params, timeout=timeout)
+    return r
+
 
+def _raise_for_status(r: httpx.Response) -> None:
     if r.status_code >= 400:
         msg = r.text.strip()
         raise RuntimeError(f"{r.status_code}: {msg}")
 
-    return r
+
+def _decode_json(r: httpx.Response) -> Any:
+    if _orjson is not None:
+        return _orjson.loads(r.content)
+    return r.json()
+
+
+def _project(data: Any, fields: Sequence[str]) -> Any:
+    """Keep only `fields` of an object, or of every object in a list."""
+    if isinstance(data, list):
+        return [{k: d[k] for k in fields if k in d} if isinstance(d, dict) else d for d in data]
+    if isinstance(data, dict):
+        return {k: data[k] for k in fields if k in data}
+    return data
 
 
-def kc_request(method: str, path: str, *, json: Any = None, params: Optional[dict[str, Any]] = None) -> Any:
+def kc_request(
+    method: str,
+    path: str,
+    *,
+    json: Any = None,
+    params: Optional[dict[str, Any]] = None,
+    fields: Optional[Sequence[str]] = None,
+    model: Optional[type] = None,
+    keep_raw: bool = False,
+) -> Any:
+    """Send an admin request and decode the JSON response.
+
+    With `fields`, every returned object is cut down to those keys right after
+    decoding, so big representations are not kept around by list/lookup callers.
+    With `model` (a kc.core.models record type), every object is turned into
+    such a record instead, which is smaller still; keep_raw=True also keeps the
+    decoded object on each record, for callers that need the full
+    representation (Record.raw()).
+    """
     r = kc_raw_request(method, path, json=json, params=params)
+    return _decode(r, fields, model, path, keep_raw)
+
 
+def _decode(
+    r: httpx.Response, fields: Optional[Sequence[str]], model: Optional[type] = None, path: str = "", keep_raw: bool = False
+) -> Any:
     if r.status_code == 204:
         return None
 
     ct = r.headers.get("content-type", "")
     if "application/json" in ct:
-        return r.json()
+        data = _decode_json(r)
+        if model is not None:
+            return model.build(_realm_of(path), data, keep_raw)
+        return _project(data, fields) if fields else data
     return r.text
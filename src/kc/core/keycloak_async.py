@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Optional, Sequence, TypeVar
+
+import httpx
+
+from kc.core import metrics, trace
+from kc.core.config import Config, get_config
+from kc.core.keycloak import (
+    _TOKEN_CACHE,
+    _client_kwargs,
+    _decode,
+    _flight_key,
+    _raise_for_status,
+    _realm_of,
+    _token_cache_key,
+    _token_from,
+    _token_request,
+)
+
+T = TypeVar("T")
+
+# asyncio twin of kc.core.keycloak. Tokens are shared with the sync engine; clients
+# and login locks belong to one event loop, because httpx.AsyncClient and asyncio.Lock
+# cannot be used across loops (each cluster thread runs its own).
+_CLIENTS: dict[tuple[asyncio.AbstractEventLoop, str, bool], list[httpx.AsyncClient]] = {}
+_LOGIN_LOCKS: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Lock] = {}
+# connections wanted per loop: one per request in flight, or httpcore keeps
+# closing and reopening keep-alive connections
+_POOL_SIZES: dict[asyncio.AbstractEventLoop, int] = {}
+# httpcore's async pool rescans every queued request against every connection on
+# each state change, so large pools are split over several clients of this size
+_CONNECTIONS_PER_CLIENT = 8
+_NEXT = itertools.count()
+# GETs in flight per loop, by kc.core.keycloak._flight_key
+_FLIGHTS: dict[tuple[asyncio.AbstractEventLoop, tuple], asyncio.Future] = {}
+
+
+def run(main: Awaitable[T], *, concurrency: int = 32) -> T:
+    """Run a coroutine on a new event loop and close the clients it opened.
+
+    This is how synchronous Typer commands call into the async engine;
+    concurrency sizes the connection pools to the requests kept in flight.
+    """
+    return asyncio.run(_run_and_close(main, concurrency))
+
+
+async def _run_and_close(main: Awaitable[T], concurrency: int) -> T:
+    loop = asyncio.get_running_loop()
+    _POOL_SIZES[loop] = concurrency
+    try:
+        return await main
+    finally:
+        for key in [k for k in _CLIENTS if k[0] is loop]:
+            for client in _CLIENTS.pop(key):
+                await client.aclose()
+        for key in [k for k in _LOGIN_LOCKS if k[0] is loop]:
+            del _LOGIN_LOCKS[key]
+        for key in [k for k in _FLIGHTS if k[0] is loop]:
+            del _FLIGHTS[key]
+        del _POOL_SIZES[loop]
+
+
+def _http_client(cfg: Config) -> httpx.AsyncClient:
+    # no lock needed: only this loop's thread touches its own keys
+    loop = asyncio.get_running_loop()
+    key = (loop, cfg.server_url, cfg.http2)
+    clients = _CLIENTS.get(key)
+    if clients is None:
+        clients = _CLIENTS[key] = _new_clients(cfg, _POOL_SIZES.get(loop, 32))
+    return clients[next(_NEXT) % len(clients)]
+
+
+def _new_clients(cfg: Config, size: int) -> list[httpx.AsyncClient]:
+    kwargs = _client_kwargs(cfg)
+    if cfg.http2:
+        # a few multiplexed connections already carry any concurrency
+        return [httpx.AsyncClient(**kwargs)]
+    n = -(-size // _CONNECTIONS_PER_CLIENT)
+    per_client = -(-size // n)
+    kwargs["limits"] = httpx.Limits(max_connections=per_client, max_keepalive_connections=per_client)
+    return [httpx.AsyncClient(**kwargs) for _ in range(n)]
+
+
+async def _send(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    cfg = get_config()
+    url = f"{cfg.server_url.rstrip('/')}{path}"
+    started = time.perf_counter()
+    try:
+        r = await _http_client(cfg).request(method, url, **kwargs)
+    except Exception:
+        metrics.record(method, path, 0, 0, time.perf_counter() - started)
+        raise
+    metrics.record(method, path, r.status_code, r.num_bytes_downloaded, time.perf_counter() - started)
+    return r
+
+
+async def login() -> str:
+    cfg = get_config()
+    key = _token_cache_key(cfg)
+    if key in _TOKEN_CACHE:
+        return _TOKEN_CACHE[key]
+
+    lock = _LOGIN_LOCKS.setdefault((asyncio.get_running_loop(), key), asyncio.Lock())
+    async with lock:
+        if key in _TOKEN_CACHE:
+            return _TOKEN_CACHE[key]
+        with trace.span("login", auth_realm=cfg.auth_realm, grant_type=cfg.grant_type):
+            token_path, data = _token_request(cfg)
+            r = await _send("POST", token_path, data=data, timeout=30.0)
+            token = _token_from(r)
+        _TOKEN_CACHE[key] = token
+        return token
+
+
+class _LeaderCancelled(Exception):
+    """The task running a shared GET was cancelled before the response came."""
+
+
+async def _single_flight(path: str, params: Optional[dict[str, Any]], fetch) -> httpx.Response:
+    """Async kc.core.keycloak._single_flight: identical GETs in flight share one request.
+
+    If the task running the request is cancelled, its waiters were not: they
+    start over, and the first of them runs the request for the rest.
+    """
+    loop = asyncio.get_running_loop()
+    key = (loop, _flight_key(get_config(), path, params))
+    flight = _FLIGHTS.get(key)
+    if flight is not None:
+        try:
+            # shield: a cancelled waiter must not cancel the request the others wait for
+            r = await asyncio.shield(flight)
+        except _LeaderCancelled:
+            return await _single_flight(path, params, fetch)
+        metrics.record_shared("GET", path)
+        return r
+
+    flight = _FLIGHTS[key] = loop.create_future()
+    try:
+        r = await fetch()
+    except asyncio.CancelledError:
+        flight.set_exception(_LeaderCancelled())
+        flight.exception()
+        raise
+    except Exception as e:
+        flight.set_exception(e)
+        # retrieved here, so asyncio does not warn when nobody was waiting
+        flight.exception()
+        raise
+    else:
+        flight.set_result(r)
+        return r
+    finally:
+        del _FLIGHTS[key]
+
+
+async def kc_raw_request(
+    method: str,
+    path: str,
+    *,
+    json: Any = None,
+    params: Optional[dict[str, Any]] = None,
+    timeout: float = 60.0,
+) -> httpx.Response:
+    if method.upper() == "GET":
+        r = await _single_flight(path, params, lambda: _fetch(method, path, json=json, params=params, timeout=timeout))
+    else:
+        r = await _fetch(method, path, json=json, params=params, timeout=timeout)
+    _raise_for_status(r)
+    return r
+
+
+async def _fetch(
+    method: str,
+    path: str,
+    *,
+    json: Any,
+    params: Optional[dict[str, Any]],
+    timeout: float,
+) -> httpx.Response:
+    token = await login()
+
+    headers = {"Authorization": f"Bearer {token}"}
+
+    if trace.enabled():
+        with trace.span(f"kc_request {method} {metrics.path_template(path)}", realm=_realm_of(path)) as sp:
+            r = await _send(method, path, headers=headers, json=json, params=params, timeout=timeout)
+            sp.set(status=r.status_code)
+    else:
+        r = await _send(method, path, headers=headers, json=json, params=params, timeout=timeout)
+    return r
+
+
+async def kc_request(
+    method: str,
+    path: str,
+    *,
+    json: Any = None,
+    params: Optional[dict[str, Any]] = None,
+    fields: Optional[Sequence[str]] = None,
+    model: Optional[type] = None,
+    keep_raw: bool = False,
+) -> Any:
+    """Async kc.core.keycloak.kc_request: same errors, decoding, projection and records."""
+    r = await kc_raw_request(method, path, json=json, params=params)
+    return _decode(r, fields, model, path, keep_raw)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from threading import Lock
+
+from kc.core.config import get_config
+
+
+# Path segments whose next segment is an identifier, and the placeholder used for it.
+_PLACEHOLDERS = {
+    "realms": "{realm}",
+    "users": "{id}",
+    "clients": "{id}",
+    "client-scopes": "{id}",
+    "default-client-scopes": "{id}",
+    "optional-client-scopes": "{id}",
+    "groups": "{id}",
+    "roles-by-id": "{id}",
+    "roles": "{name}",
+}
+
+# Path segments followed by a path of any depth (a group path), collapsed to one placeholder.
+_REST_PLACEHOLDERS = {"group-by-path": "{path}"}
+
+# Fixed sub-resources that must never be mistaken for an identifier.
+_LITERALS = {"count", "role-mappings", "reset-password", "members", "children", "composites"}
+
+
+def path_template(path: str) -> str:
+    """Normalize an admin API path, e.g. /admin/realms/acme/users/1f0c... -> /admin/realms/{realm}/users/{id}."""
+    out: list[str] = []
+    prev = ""
+    for seg in path.split("?", 1)[0].split("/"):
+        if prev in _REST_PLACEHOLDERS:
+            out.append(_REST_PLACEHOLDERS[prev])
+            break
+        if prev in _PLACEHOLDERS and seg and seg not in _LITERALS:
+            out.append(_PLACEHOLDERS[prev])
+            prev = ""
+            continue
+        out.append(seg)
+        prev = seg
+    return "/".join(out)
+
+
+# Latency buckets grow by 10% from 0.1 ms, so a percentile is accurate to about 10%.
+_BUCKET_BASE_MS = 0.1
+_BUCKET_GROWTH = 1.1
+_BUCKETS = 160
+
+
+def _bucket(ms: float) -> int:
+    if ms <= _BUCKET_BASE_MS:
+        return 0
+    return min(int(math.log(ms / _BUCKET_BASE_MS, _BUCKET_GROWTH)) + 1, _BUCKETS - 1)
+
+
+def _bucket_upper_ms(i: int) -> float:
+    return _BUCKET_BASE_MS * (_BUCKET_GROWTH**i)
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * _BUCKETS)
+    n: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[_bucket(ms)] += 1
+        self.n += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p: float) -> float:
+        if self.n == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.n * p / 100.0))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(_bucket_upper_ms(i), self.max_ms)
+        return self.max_ms
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    errors: int = 0
+    bytes: int = 0
+    # requests not sent because an identical one was already in flight
+    shared: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+
+_LOCK = Lock()
+# keyed by (method, path template, profile name)
+_ENDPOINTS: dict[tuple[str, str, str], EndpointStats] = {}
+
+
+def _stats(method: str, path: str) -> EndpointStats:
+    # caller holds _LOCK
+    key = (method.upper(), path_template(path), get_config().name)
+    st = _ENDPOINTS.get(key)
+    if st is None:
+        st = _ENDPOINTS[key] = EndpointStats()
+    return st
+
+
+def record(method: str, path: str, status: int, nbytes: int, seconds: float) -> None:
+    """Record one HTTP exchange. status 0 means the request never got a response."""
+    with _LOCK:
+        st = _stats(method, path)
+        st.count += 1
+        st.bytes += nbytes
+        if status == 0 or status >= 400:
+            st.errors += 1
+        st.latency.add(seconds * 1000.0)
+
+
+def record_shared(method: str, path: str) -> None:
+    """Record a request answered by an identical one already in flight."""
+    with _LOCK:
+        _stats(method, path).shared += 1
+
+
+def reset() -> None:
+    with _LOCK:
+        _ENDPOINTS.clear()
+
+
+def totals(profile: str | None = None) -> dict[str, float]:
+    """Sum over all endpoints, or over one profile's endpoints when profile is given."""
+    with _LOCK:
+        stats = [st for key, st in _ENDPOINTS.items() if profile is None or key[2] == profile]
+    return {
+        "requests": sum(s.count for s in stats),
+        "errors": sum(s.errors for s in stats),
+        "bytes": sum(s.bytes for s in stats),
+        "shared": sum(s.shared for s in stats),
+        "seconds": round(sum(s.latency.total_ms for s in stats) / 1000.0, 3),
+    }
+
+
+def render_stats() -> list[str]:
+    """Return a per-endpoint table (busiest first) followed by a totals line."""
+    with _LOCK:
+        rows = sorted(_ENDPOINTS.items(), key=lambda kv: (-kv[1].count, kv[0]))
+
+    lines = [f"{'count':>7} {'shared':>6} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bytes':>11}  endpoint"]
+    for (method, template, profile), st in rows:
+        h = st.latency
+        where = f" [{profile}]" if profile else ""
+        lines.append(
+            f"{st.count:>7} {st.shared:>6} {st.errors:>5} {h.percentile(50):>8.1f} {h.percentile(95):>8.1f} "
+            f"{h.percentile(99):>8.1f} {st.bytes:>11}  {method} {template}{where}"
+        )
+    t = totals()
+    lines.append(
+        f"Total: {t['requests']} requests, {t['errors']} errors, {t['bytes']} bytes, {t['seconds']:.3f}s in HTTP, "
+        f"{t['shared']} saved by sharing in-flight GETs"
+    )
+    return lines
+
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Sequence, Tuple
+
+
+def run_ordered(
+    items: Sequence[Any],
+    fn: Callable[[Any], Any],
+    *,
+    workers: int,
+    key: Optional[Callable[[Any], Hashable]] = None,
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """Run fn over items on a bounded thread pool.
+
+    Returns one (result, error) pair per item, in input order. An exception raised
+    for one item is captured in its pair and does not stop the others. Items that
+    share the same key run one after another, in input order, on the same worker.
+    """
+    out: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(items)
+
+    lanes: dict[Hashable, list[int]] = {}
+    for i, item in enumerate(items):
+        k = key(item) if key is not None else i
+        lanes.setdefault(k, []).append(i)
+
+    def run_lane(indexes: list[int]) -> None:
+        for i in indexes:
+            try:
+                out[i] = (fn(items[i]), None)
+            except Exception as e:
+                out[i] = (None, e)
+
+    if workers <= 1 or len(lanes) <= 1:
+        for indexes in lanes.values():
+            run_lane(indexes)
+        return out
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(lanes))) as ex:
+        # each lane runs in a copy of the caller's context, so e.g. the active config profile carries over
+        futures = [ex.submit(contextvars.copy_context().run, run_lane, indexes) for indexes in lanes.values()]
+        for f in futures:
+            f.result()
+    return out
+
+
+async def run_ordered_async(
+    items: Sequence[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    *,
+    concurrency: int,
+    key: Optional[Callable[[Any], Hashable]] = None,
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """asyncio version of run_ordered: at most `concurrency` items are in flight.
+
+    Only `concurrency` tasks exist at any time, however many items there are; each
+    takes the next lane when it is done with one. Same (result, error) pairs, in
+    input order, and same per-key ordering as run_ordered.
+    """
+    out: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(items)
+
+    lanes: dict[Hashable, list[int]] = {}
+    for i, item in enumerate(items):
+        k = key(item) if key is not None else i
+        lanes.setdefault(k, []).append(i)
+    pending = iter(lanes.values())
+
+    async def worker() -> None:
+        for indexes in pending:
+            for i in indexes:
+                try:
+                    out[i] = (await fn(items[i]), None)
+                except Exception as e:
+                    out[i] = (None, e)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(lanes))))))
+    return out
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from kc.core.argv import VALUE_OPTIONS
+
+_TOP_ALLOCATIONS = 30
+
+_PROFILER = None
+_TRACING_MALLOC = False
+
+
+def global_flags(argv: list[str]) -> set[str]:
+    """Return the boolean global flags given before the first subcommand."""
+    flags: set[str] = set()
+    it = iter(argv)
+    for a in it:
+        if not a.startswith("-"):
+            break
+        name = a.split("=", 1)[0]
+        if name in VALUE_OPTIONS:
+            if "=" not in a:
+                next(it, None)
+            continue
+        flags.add(name)
+    return flags
+
+
+def command_path(argv: list[str]) -> str:
+    """Return e.g. "kc users create" (or "kc cmd-file commands" for --cmd-file runs) from argv."""
+    parts = ["kc"]
+    it = iter(argv)
+    for a in it:
+        name = a.split("=", 1)[0]
+        if name == "--cmd-file":
+            value = a.split("=", 1)[1] if "=" in a else next(it, "")
+            parts.extend(["cmd-file", Path(value).stem])
+            continue
+        if name in VALUE_OPTIONS and "=" not in a:
+            next(it, None)
+            continue
+        if a.startswith("-"):
+            if len(parts) > 1:
+                break
+            continue
+        parts.append(a)
+    return " ".join(parts[:3])
+
+
+def start(profile: bool, trace_malloc: bool) -> None:
+    """Start cProfile and/or tracemalloc. Called from main() before the CLI parses anything."""
+    global _PROFILER, _TRACING_MALLOC
+    if trace_malloc and not _TRACING_MALLOC:
+        import tracemalloc
+
+        tracemalloc.start()
+        _TRACING_MALLOC = True
+    if profile and _PROFILER is None:
+        import cProfile
+
+        _PROFILER = cProfile.Profile()
+        _PROFILER.enable()
+
+
+def active() -> bool:
+    return _PROFILER is not None or _TRACING_MALLOC
+
+
+def _output_stem(out_dir: str, command_path: str) -> Path:
+    # "kc users create" -> kc-users-create-20240101T120000-1234
+    slug = re.sub(r"[^A-Za-z0-9_.]+", "-", command_path).strip("-") or "kc"
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    directory = Path(out_dir or ".")
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{slug}-{stamp}-{os.getpid()}"
+
+
+def stop(command_path: str, out_dir: str = "") -> list[str]:
+    """Stop whatever is running and write its output; returns the written file paths."""
+    global _PROFILER, _TRACING_MALLOC
+    if not active():
+        return []
+    stem = _output_stem(out_dir, command_path)
+    written: list[str] = []
+
+    # Snapshot memory first so the profiler's own bookkeeping does not show up in it.
+    if _TRACING_MALLOC:
+        import tracemalloc
+
+        _TRACING_MALLOC = False
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        written.append(_write_malloc_report(stem, command_path, snapshot, current, peak))
+
+    if _PROFILER is not None:
+        prof, _PROFILER = _PROFILER, None
+        prof.disable()
+        path = stem.with_name(stem.name + ".pstats")
+        prof.dump_stats(str(path))
+        written.append(str(path))
+
+    return written
+
+
+def _write_malloc_report(stem: Path, command_path: str, snapshot, current: int, peak: int) -> str:
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "*/cProfile.py"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+    stats = snapshot.statistics("lineno")
+    path = stem.with_name(stem.name + ".tracemalloc.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"command: {command_path}\n")
+        f.write(f"peak traced memory: {peak / 1024:.1f} KiB\n")
+        f.write(f"traced memory at exit: {current / 1024:.1f} KiB\n")
+        f.write(f"\ntop {_TOP_ALLOCATIONS} allocation sites still held at exit:\n")
+        for st in stats[:_TOP_ALLOCATIONS]:
+            frame = st.traceback[0]
+            f.write(f"{st.size / 1024:>10.1f} KiB {st.count:>8} blocks  {frame.filename}:{frame.lineno}\n")
+    return str(path)
+
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+
+class Progress:
+    """Running count of finished items, reported on stderr every `interval` seconds.
+
+    Long bulk operations print "label: done/total" as they go, so a run over
+    thousands of items is not silent until its summary box. Safe to update from
+    worker threads; the async wrapper runs on the event loop thread only.
+    """
+
+    def __init__(self, label: str, total: int, interval: float = 2.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+
+    def step(self, ok: bool = True) -> None:
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.failed += 1
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                self._report()
+
+    def _report(self) -> None:
+        failed = f" (failed {self.failed})" if self.failed else ""
+        sys.stderr.write(f"{self.label}: {self.done}/{self.total}{failed}\n")
+
+    def wrap(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """fn, counting each call as one finished item; a raised error counts as failed."""
+        def counted(*args: Any) -> Any:
+            try:
+                res = fn(*args)
+            except Exception:
+                self.step(ok=False)
+                raise
+            self.step()
+            return res
+
+        return counted
+
+    def awrap(self, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def counted(*args: Any) -> Any:
+            try:
+                res = await fn(*args)
+            except Exception:
+                self.step(ok=False)
+                raise
+            self.step()
+            return res
+
+        return counted
+
+    def close(self) -> None:
+        """Final report, unless there was nothing to do."""
+        if self.total:
+            with self._lock:
+                self._report()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+
+class RateLimit:
+    """Spaces out operations to at most `per_second` starts per second, across all workers.
+
+    Each caller takes the next free slot, 1/per_second after the one before, and
+    sleeps until it comes. There is no burst: a limiter idle for a while starts
+    again at the same pace. per_second <= 0 means no limit.
+    """
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take the next slot; seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            return slot - now
+
+    def wait(self) -> None:
+        if self.interval:
+            delay = self._reserve()
+            if delay > 0:
+                time.sleep(delay)
+
+    async def await_slot(self) -> None:
+        if self.interval:
+            delay = self._reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
@@ -1,32 +1,83 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+from kc.core import idcache, metrics, profiling, trace
 from kc.core.audit import append_audit
-from kc.core.config import load_config
+from kc.core.box import render_box
+from kc.core.config import Config, load_config, select_profiles, set_config, use_config
 from kc.core.logging import Tee
 
 
 CURRENT_RUNTIME: "Runtime | None" = None
 
 
+@dataclass
+class ClusterRun:
+    """Stands in for the Runtime (ctx.obj) while a command runs against one config profile."""
+
+    config: Config
+    jira_ticket: str
+    default_realm: str
+    async_engine: bool = False
+    concurrency: int = 32
+    audit_details: str = ""
+    status: str = ""
+    error: Optional[Exception] = None
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def finish_ok(self) -> None:
+        self.status = "ok"
+
+    def finish_error(self, err: Exception) -> None:
+        # only record it; the Runtime still owns the log and writes the audit rows
+        self.status = "error"
+        self.error = err
+
+
 @dataclass
 class Runtime:
     config_path: str
     default_realm: str
     log_file: str
     jira_ticket: str
+    stats: bool = False
+    trace_file: str = ""
+    profile_dir: str = ""
+    profile_names: str = ""
+    all_profiles: bool = False
+    # --async: bulk commands run on kc.core.keycloak_async, with up to `concurrency` requests in flight
+    async_engine: bool = False
+    concurrency: int = 32
+    # name -> id cache file (kc.core.idcache); "" with --no-id-cache
+    id_cache: str = ""
 
     started_at: Optional[datetime] = None
     ended: bool = False
     tee: Optional[Tee] = None
     audit_details: str = ""
+    # selected config profiles; with more than one the command fans out over clusters
+    profiles: list[Config] = field(default_factory=list)
+    clusters: list[ClusterRun] = field(default_factory=list)
 
     def start(self) -> None:
+        trace.enable(self.trace_file)
+        idcache.configure(self.id_cache)
+        with trace.span("Runtime.start"):
+            self._start()
+
+    def _start(self) -> None:
         global CURRENT_RUNTIME
-        load_config(self.config_path)
+        with trace.span("load_config"):
+            load_config(self.config_path)
+            self.profiles = select_profiles(self.profile_names, self.all_profiles)
+        if len(self.profiles) == 1:
+            set_config(self.profiles[0])
         self.tee = Tee(self.log_file)
         self.tee.install()
         self.started_at = datetime.now(timezone.utc)
@@ -35,6 +86,17 @@ class Runtime:
         raw = self._build_raw_command()
         self.tee.err(f"[{self.started_at.isoformat()}] START: {raw}\n")
 
+    def cluster_run(self, cfg: Config) -> ClusterRun:
+        run = ClusterRun(
+            config=cfg,
+            jira_ticket=self.jira_ticket,
+            default_realm=self.default_realm,
+            async_engine=self.async_engine,
+            concurrency=self.concurrency,
+        )
+        self.clusters.append(run)
+        return run
+
     def finish_ok(self) -> None:
         global CURRENT_RUNTIME
         if self.ended:
@@ -43,16 +105,12 @@ class Runtime:
         start = self.started_at or datetime.now(timezone.utc)
         end = datetime.now(timezone.utc)
         dur = end - start
+        idcache.close()
+        self._print_stats()
+        self._write_trace()
+        self._write_profiles()
         self.tee.err(f"[{end.isoformat()}] END: status=ok dur={dur}\n\n")
-        append_audit(
-            status="ok",
-            command_path=self._build_command_path(),
-            raw_command=self._build_raw_command(),
-            jira=self.jira_ticket,
-            target_realms=self._resolve_target_realms(),
-            duration=str(dur),
-            details=self.audit_details,
-        )
+        self._append_audit("ok", dur)
         if self.tee is not None:
             self.tee.close()
         if CURRENT_RUNTIME is self:
@@ -67,21 +125,66 @@ class Runtime:
         end = datetime.now(timezone.utc)
         dur = end - start
         self.tee.err(f"[{end.isoformat()}] ERROR: {err}\n")
+        idcache.close()
+        self._print_stats()
+        self._write_trace()
+        self._write_profiles()
         self.tee.err(f"[{end.isoformat()}] END: status=error dur={dur}\n\n")
-        append_audit(
-            status="error",
-            command_path=self._build_command_path(),
-            raw_command=self._build_raw_command(),
-            jira=self.jira_ticket,
-            target_realms=self._resolve_target_realms(),
-            duration=str(dur),
-            details=self.audit_details,
-        )
+        self._append_audit("error", dur)
         if self.tee is not None:
             self.tee.close()
         if CURRENT_RUNTIME is self:
             CURRENT_RUNTIME = None
 
+    def _append_audit(self, status: str, dur: timedelta) -> None:
+        if not self.clusters:
+            append_audit(
+                status=status,
+                command_path=self._build_command_path(),
+                raw_command=self._build_raw_command(),
+                jira=self.jira_ticket,
+                target_realms=self._resolve_target_realms(),
+                duration=str(dur),
+                details=self.audit_details,
+                http=metrics.totals(),
+            )
+            return
+        # one row per cluster, with that cluster's own outcome, actor and HTTP totals
+        for run in self.clusters:
+            with use_config(run.config):
+                append_audit(
+                    status=run.status or status,
+                    command_path=self._build_command_path(),
+                    raw_command=self._build_raw_command(),
+                    jira=self.jira_ticket,
+                    target_realms=self._resolve_target_realms(),
+                    duration=str(dur),
+                    details=run.audit_details or self.audit_details,
+                    http=metrics.totals(run.name),
+                )
+
+    def _write_trace(self) -> None:
+        if not trace.enabled():
+            return
+        try:
+            trace.write()
+        except OSError as e:
+            self.tee.err(f"Warning: could not write trace file {self.trace_file!r}: {e}\n")
+
+    def _write_profiles(self) -> None:
+        try:
+            written = profiling.stop(self._build_command_path(), self.profile_dir)
+        except OSError as e:
+            self.tee.err(f"Warning: could not write profiling output: {e}\n")
+            return
+        for path in written:
+            self.tee.err(f"Profiling output written to {path}\n")
+
+    def _print_stats(self) -> None:
+        if not self.stats or not metrics.totals()["requests"]:
+            return
+        self.tee.err(render_box(metrics.render_stats(), jira_ticket="", realm_label="", title="HTTP request stats") + "\n")
+
     def _build_raw_command(self) -> str:
         import sys
 
@@ -92,21 +195,14 @@ class Runtime:
     def _build_command_path(self) -> str:
         import sys
 
-        if len(sys.argv) <= 1:
-            return "kc"
-        # mimic cobra CommandPath-like output by joining tokens excluding flags
-        parts: list[str] = ["kc"]
-        for a in sys.argv[1:]:
-            if a.startswith("-"):
-                continue
-            parts.append(a)
-        return " ".join(parts[:3]) if len(parts) > 3 else " ".join(parts)
+        # e.g. "kc users create"; values of global options (--config x.json, --profiles eu,us) are skipped
+        return profiling.command_path(sys.argv[1:])
 
     def _resolve_target_realms(self) -> str:
-        from kc.core.config import GLOBAL
+        from kc.core.config import get_config
 
         if self.default_realm:
             return self.default_realm
-        if GLOBAL.realm:
-            return GLOBAL.realm
+        if get_config().realm:
+            return get_config().realm
         return ""
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional, TextIO
+
+_HEADER = "# kc seed progress v1: spec<TAB>{hash}; then server<TAB>realm<TAB>phase<TAB>batch\n"
+
+_FIRST_NAMES = ("Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hugo", "Ida", "Jonas", "Lena", "Max")
+_LAST_NAMES = ("Bauer", "Fischer", "Hoffmann", "Klein", "Koch", "Meyer", "Neumann", "Schmidt", "Wagner", "Weber")
+
+# allowed keys per section, with their defaults
+_SECTIONS: dict[str, dict[str, Any]] = {
+    "client_scopes": {"count": 0, "name": "seed-scope-{n:03d}"},
+    "roles": {"count": 0, "name": "seed-role-{n:05d}"},
+    "clients": {
+        "count": 0,
+        "client_id": "seed-client-{n:04d}",
+        # client roles per client, named after the client
+        "roles": 0,
+        "role_name": "{client_id}-role-{n:02d}",
+        # client scopes assigned to each client as default scopes
+        "scopes": 0,
+        # share of clients that are public
+        "public": 0.0,
+        "redirect_uri": "https://{client_id}.example.com/*",
+    },
+    "users": {
+        "count": 0,
+        "username": "seed-user-{n:06d}",
+        "email": "{username}@example.com",
+        # realm roles and client roles mapped to each user
+        "roles": 0,
+        "client_roles": 0,
+        # empty: users get no password (hashing one costs the server far more than the import)
+        "password": "",
+    },
+}
+
+
+@dataclass
+class SeedSpec:
+    """What `kc seed` creates: counts and name patterns per kind of object, and a random seed.
+
+    Name patterns are str.format templates; {n} counts from 1. Everything random
+    (names, role and scope picks) derives from the seed and the object's number,
+    so the same spec always produces the same objects, whatever the batch size.
+    """
+
+    seed: int = 0
+    sections: dict[str, dict[str, Any]] = field(default_factory=dict)
+    digest: str = ""
+
+    @classmethod
+    def load(cls, path: str) -> "SeedSpec":
+        text = Path(path).read_text(encoding="utf-8")
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise RuntimeError(f"{path} is not valid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise RuntimeError(f"{path} must hold a JSON object")
+        unknown = set(data) - {"seed", *_SECTIONS}
+        if unknown:
+            raise RuntimeError(f"unknown key(s) in {path}: {', '.join(sorted(unknown))}")
+        sections = {}
+        for name, defaults in _SECTIONS.items():
+            given = data.get(name) or {}
+            bad = set(given) - set(defaults)
+            if bad:
+                raise RuntimeError(f"unknown key(s) in {path} {name}: {', '.join(sorted(bad))}")
+            sections[name] = {**defaults, **given}
+        spec = cls(int(data.get("seed", 0)), sections, hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest())
+        spec._check()
+        return spec
+
+    def _check(self) -> None:
+        c, u = self.sections["clients"], self.sections["users"]
+        if c["scopes"] > self.sections["client_scopes"]["count"]:
+            raise RuntimeError("clients.scopes is more than client_scopes.count")
+        if u["roles"] > self.sections["roles"]["count"]:
+            raise RuntimeError("users.roles is more than roles.count")
+        if u["client_roles"] > c["count"] * c["roles"]:
+            raise RuntimeError("users.client_roles is more than the client roles there are")
+
+    def count(self, section: str) -> int:
+        return int(self.sections[section]["count"])
+
+    def _rng(self, kind: str, n: int) -> random.Random:
+        return random.Random(f"{self.seed}/{kind}/{n}")
+
+    def scope_name(self, n: int) -> str:
+        return self.sections["client_scopes"]["name"].format(n=n)
+
+    def role_name(self, n: int) -> str:
+        return self.sections["roles"]["name"].format(n=n)
+
+    def client_id(self, n: int) -> str:
+        return self.sections["clients"]["client_id"].format(n=n)
+
+    def client_role_name(self, client_id: str, n: int) -> str:
+        return self.sections["clients"]["role_name"].format(client_id=client_id, n=n)
+
+    def scope(self, n: int) -> dict[str, Any]:
+        return {"name": self.scope_name(n), "protocol": "openid-connect", "description": "seeded by kc seed"}
+
+    def roles_import(self, start: int, stop: int) -> dict[str, Any]:
+        """partialImport body for realm roles start..stop-1 (0-based)."""
+        realm_roles = [{"name": self.role_name(i + 1), "description": "seeded by kc seed"} for i in range(start, stop)]
+        return {"ifResourceExists": "SKIP", "roles": {"realm": realm_roles}}
+
+    def clients_import(self, start: int, stop: int) -> dict[str, Any]:
+        """partialImport body for clients start..stop-1 with their client roles and scopes."""
+        c = self.sections["clients"]
+        scope_count = self.count("client_scopes")
+        clients, client_roles = [], {}
+        for i in range(start, stop):
+            rng = self._rng("clients", i + 1)
+            cid = self.client_id(i + 1)
+            rep: dict[str, Any] = {
+                "clientId": cid,
+                "name": cid,
+                "enabled": True,
+                "publicClient": rng.random() < c["public"],
+                "redirectUris": [c["redirect_uri"].format(client_id=cid)],
+            }
+            if c["scopes"]:
+                picks = rng.sample(range(scope_count), c["scopes"])
+                rep["defaultClientScopes"] = [self.scope_name(n + 1) for n in sorted(picks)]
+            clients.append(rep)
+            if c["roles"]:
+                client_roles[cid] = [{"name": self.client_role_name(cid, n + 1)} for n in range(c["roles"])]
+        body: dict[str, Any] = {"ifResourceExists": "SKIP", "clients": clients}
+        if client_roles:
+            body["roles"] = {"client": client_roles}
+        return body
+
+    def users_import(self, start: int, stop: int) -> dict[str, Any]:
+        """partialImport body for users start..stop-1, with their role mappings."""
+        u, c = self.sections["users"], self.sections["clients"]
+        role_count = self.count("roles")
+        client_role_count = self.count("clients") * c["roles"]
+        users = []
+        for i in range(start, stop):
+            rng = self._rng("users", i + 1)
+            username = u["username"].format(n=i + 1)
+            rep: dict[str, Any] = {
+                "username": username,
+                "email": u["email"].format(username=username, n=i + 1),
+                "emailVerified": True,
+                "enabled": True,
+                "firstName": rng.choice(_FIRST_NAMES),
+                "lastName": rng.choice(_LAST_NAMES),
+            }
+            if u["password"]:
+                rep["credentials"] = [{"type": "password", "value": u["password"], "temporary": False}]
+            if u["roles"]:
+                rep["realmRoles"] = [self.role_name(n + 1) for n in sorted(rng.sample(range(role_count), u["roles"]))]
+            if u["client_roles"]:
+                mapped: dict[str, list[str]] = {}
+                for k in sorted(rng.sample(range(client_role_count), u["client_roles"])):
+                    cid = self.client_id(k // c["roles"] + 1)
+                    mapped.setdefault(cid, []).append(self.client_role_name(cid, k % c["roles"] + 1))
+                rep["clientRoles"] = mapped
+            users.append(rep)
+        return {"ifResourceExists": "SKIP", "users": users}
+
+
+class SeedProgress:
+    """Append-only record of the batches `kc seed` has finished, for re-runs.
+
+    The first line holds the hash of the spec and batch size; a file written
+    for another spec or batch size is started over. Each finished batch is one line, flushed as it is written,
+    so an interrupted run loses nothing but the batches still in flight.
+    """
+
+    def __init__(self, path: str, spec_digest: str, batch_size: int):
+        self.path = Path(path)
+        self.done: set[tuple[str, str, str, int]] = set()
+        header = _HEADER.replace("{hash}", f"{spec_digest}/{batch_size}")
+        fresh = True
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                if f.readline() == header:
+                    fresh = False
+                    self._load(f)
+        self._lock = threading.Lock()
+        self._fh: Optional[TextIO] = open(self.path, "w" if fresh else "a", encoding="utf-8")
+        if fresh:
+            self._fh.write(header)
+            self._fh.flush()
+
+    def _load(self, f: TextIO) -> None:
+        for raw in f:
+            parts = raw.rstrip("\n").split("\t")
+            # a torn last line (crash mid-write) is ignored
+            if len(parts) == 4 and parts[3].isdigit():
+                self.done.add((parts[0], parts[1], parts[2], int(parts[3])))
+
+    def is_done(self, server: str, realm: str, phase: str, batch: int) -> bool:
+        return (server, realm, phase, batch) in self.done
+
+    def mark(self, server: str, realm: str, phase: str, batch: int) -> None:
+        with self._lock:
+            self.done.add((server, realm, phase, batch))
+            self._fh.write(f"{server}\t{realm}\t{phase}\t{batch}\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "SeedProgress":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
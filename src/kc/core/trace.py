@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+_ENABLED = False
+_PATH = ""
+_LOCK = threading.Lock()
+_EVENTS: list[dict] = []
+_THREADS: dict[int, str] = {}
+_T0 = time.perf_counter()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        end = time.perf_counter()
+        if exc is not None:
+            self.args["error"] = str(exc)
+        t = threading.current_thread()
+        event = {
+            "name": self.name,
+            "cat": "kc",
+            "ph": "X",
+            "ts": round((self.start - _T0) * 1e6, 1),
+            "dur": round((end - self.start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": t.ident,
+            "args": self.args,
+        }
+        with _LOCK:
+            _EVENTS.append(event)
+            _THREADS.setdefault(t.ident or 0, t.name)
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+def enable(path: str) -> None:
+    global _ENABLED, _PATH
+    _PATH = path
+    _ENABLED = bool(path)
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def span(name: str, **args: Any):
+    """Time a block as one complete ("X") event. A shared no-op when tracing is off."""
+    if not _ENABLED:
+        return _NOOP
+    return _Span(name, args)
+
+
+def write(path: Optional[str] = None) -> None:
+    """Write the collected events as a Chrome trace-event JSON file (chrome://tracing, Perfetto)."""
+    path = path or _PATH
+    if not path:
+        return
+    with _LOCK:
+        events = list(_EVENTS)
+        threads = dict(_THREADS)
+    pid = os.getpid()
+    meta = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "kc"}}]
+    meta.extend(
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in threads.items()
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
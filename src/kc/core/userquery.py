@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional, TextIO
+
+from kc.core.directory import aiter_realm_users, iter_realm_users
+from kc.core.models import User
+
+_WILDCARDS = re.compile(r"\*|\?|\[[^\]]*\]")
+
+
+def _parse_time(value: str) -> int:
+    """Milliseconds since the epoch of an ISO date or date-time; UTC unless it names a zone."""
+    try:
+        t = datetime.fromisoformat(value)
+    except ValueError:
+        raise RuntimeError(
+            f"invalid --created-before {value!r}: use a date like 2024-01-31 or 2024-01-31T12:00:00Z"
+        ) from None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return int(t.timestamp() * 1000)
+
+
+@dataclass
+class UserQuery:
+    """Which users a query-driven `users update` or `users delete` applies to.
+
+    The server filters as far as the admin API allows: `enabled` for --disabled,
+    `q` for --attribute, `search` for --search and `username` (a substring) for
+    the longest literal part of --match. Keycloak ignores `q` and `username`
+    when `search` is given, so with --attribute the search is checked here
+    instead. The rest (the glob itself, --created-before) is checked here on the
+    brief representation the listing returns.
+    """
+
+    match: str = ""
+    search: str = ""
+    attributes: dict[str, str] = field(default_factory=dict)
+    # milliseconds since the epoch
+    created_before: Optional[int] = None
+    disabled: bool = False
+
+    @classmethod
+    def parse(
+        cls, match: str, search: str, attributes: list[str], created_before: str, disabled: bool
+    ) -> "UserQuery":
+        attrs: dict[str, str] = {}
+        for a in attributes:
+            k, sep, v = a.partition("=")
+            if not sep or not k:
+                raise RuntimeError(f"invalid --attribute {a!r}: use key=value")
+            # q is a space-separated list of key:value pairs
+            if " " in a:
+                raise RuntimeError(f"invalid --attribute {a!r}: the admin API cannot search for spaces")
+            attrs[k] = v
+        return cls(
+            match=match,
+            search=search,
+            attributes=attrs,
+            created_before=_parse_time(created_before) if created_before else None,
+            disabled=disabled,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.match or self.search or self.attributes or self.created_before is not None or self.disabled)
+
+    def params(self) -> dict[str, str]:
+        """Query parameters of GET /users that do the server's share of the filtering."""
+        params: dict[str, str] = {}
+        if self.disabled:
+            params["enabled"] = "false"
+        if self.attributes:
+            params["q"] = " ".join(f"{k}:{v}" for k, v in self.attributes.items())
+        elif self.search:
+            params["search"] = self.search
+        if self.match and "search" not in params:
+            literal = max(_WILDCARDS.split(self.match), key=len)
+            if literal:
+                params["username"] = literal
+        return params
+
+    def accepts(self, u: User) -> bool:
+        if self.match and not fnmatch.fnmatchcase((u.username or "").lower(), self.match.lower()):
+            return False
+        if self.search and self.attributes and not self._search_hit(u):
+            return False
+        if self.created_before is not None and (u.created_timestamp is None or u.created_timestamp >= self.created_before):
+            return False
+        if self.disabled and u.enabled is not False:
+            return False
+        return True
+
+    def _search_hit(self, u: User) -> bool:
+        want = self.search.strip('*"').lower()
+        return any(want in (v or "").lower() for v in (u.username, u.email, u.first_name, u.last_name))
+
+    def describe(self) -> str:
+        parts = []
+        if self.match:
+            parts.append(f"--match {self.match!r}")
+        if self.search:
+            parts.append(f"--search {self.search!r}")
+        parts.extend(f"--attribute {k}={v}" for k, v in self.attributes.items())
+        if self.created_before is not None:
+            when = datetime.fromtimestamp(self.created_before / 1000, timezone.utc)
+            parts.append(f"--created-before {when.isoformat(timespec='seconds')}")
+        if self.disabled:
+            parts.append("--disabled")
+        return " ".join(parts)
+
+
+def find_users(realm: str, query: UserQuery) -> list[User]:
+    """Every user of the realm the query matches, paging through the filtered listing."""
+    return [u for u in iter_realm_users(realm, query.params()) if query.accepts(u)]
+
+
+async def afind_users(realm: str, query: UserQuery) -> list[User]:
+    return [u async for u in aiter_realm_users(realm, query.params()) if query.accepts(u)]
+
+
+class ResultLog:
+    """NDJSON file with one line per user as its operation finishes.
+
+    Lines are flushed as they are written, so the file can be followed while a
+    long run goes on and holds everything done so far if the run is cut short.
+    An empty path writes nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh: Optional[TextIO] = open(path, "w", encoding="utf-8") if path else None
+
+    def write(self, realm: str, user: User, status: str, error: str = "") -> None:
+        if self._fh is None:
+            return
+        rec: dict[str, Any] = {"realm": realm, "username": user.username, "id": user.id, "status": status}
+        if error:
+            rec["error"] = error
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "ResultLog":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import Any
+
+from kc.core import keycloak_async
+from kc.core.keycloak import kc_request
+
+
+class WriteBuffer:
+    """Changes to admin API resources, merged per resource and sent as one PUT each.
+
+    Every PUT makes Keycloak invalidate its caches for the resource and emit an
+    admin event, so a command collects all its changes to a resource here and
+    flushes once. Later changes to the same field win.
+    """
+
+    def __init__(self) -> None:
+        # path -> merged body, in the order resources were first touched
+        self._bodies: dict[str, dict[str, Any]] = {}
+
+    def put(self, path: str, fields: dict[str, Any]) -> None:
+        self._bodies.setdefault(path, {}).update(fields)
+
+    def __bool__(self) -> bool:
+        return bool(self._bodies)
+
+    def _drain(self) -> list[tuple[str, dict[str, Any]]]:
+        items = list(self._bodies.items())
+        self._bodies.clear()
+        return items
+
+    def flush(self) -> int:
+        """Send the pending writes; returns the number of requests made."""
+        items = self._drain()
+        for path, body in items:
+            kc_request("PUT", path, json=body)
+        return len(items)
+
+    async def aflush(self) -> int:
+        """flush() on the async engine."""
+        items = self._drain()
+        for path, body in items:
+            await keycloak_async.kc_request("PUT", path, json=body)
+        return len(items)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from kc.bench.server import FakeKeycloak
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def server():
+    with FakeKeycloak(realms=2) as srv:
+        yield srv
+
+
+@pytest.fixture
+def kc(server, tmp_path):
+    """Run the CLI against the stand-in server, in a child process with its own working directory."""
+    cfg = tmp_path / "config.json"
+    cfg.write_text(
+        json.dumps({"server_url": server.url, "realm": "realm-0001", "client_id": "kc-test", "client_secret": "kc-test"}),
+        encoding="utf-8",
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+
+    def run(*args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "kc", "--config", str(cfg), *args],
+            cwd=tmp_path, env=env, capture_output=True, text=True, encoding="utf-8",
+        )
+
+    return run
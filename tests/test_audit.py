@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import csv
+
+OLD_HEADER = "timestamp,status,command_path,raw_command,jira,actor_type,actor_id,auth_realm,change_kind,target_realms,duration,details\n"
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_audit_log_with_an_older_header_is_rotated(kc, tmp_path):
+    old = tmp_path / "kc_audit.csv"
+    old.write_text(OLD_HEADER + "2024-01-01T00:00:00Z,ok,kc realms list,kc realms list,,client,x,master,realms_list,,0:00:01,\n", encoding="utf-8")
+
+    assert kc("realms", "list").returncode == 0
+
+    assert (tmp_path / "kc_audit.csv.1").read_text(encoding="utf-8").startswith(OLD_HEADER)
+    rows = _rows(old)
+    assert rows[0][-1] == "cluster"
+    assert len(rows) == 2 and len(rows[1]) == len(rows[0])
+
+
+def test_audit_log_with_the_current_header_is_appended_to(kc, tmp_path):
+    assert kc("realms", "list").returncode == 0
+    assert kc("realms", "list").returncode == 0
+
+    rows = _rows(tmp_path / "kc_audit.csv")
+    assert len(rows) == 3 and {len(r) for r in rows} == {len(rows[0])}
+    assert not (tmp_path / "kc_audit.csv.1").exists()
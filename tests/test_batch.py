@@ -0,0 +1,136 @@
+import json
+import threading
+
+import pytest
+
+from kc.core import batch
+from kc.core.batch import BatchCommand, BatchResult, _targets, batch_command, read_command_file, run_graph
+
+
+@pytest.mark.parametrize(
+    "line, resource, realms",
+    [
+        ("roles create --name x", "roles", ["default"]),
+        ("--realm r1 roles create --name x", "roles", ["r1"]),
+        ("--realm=r1 roles create --name x", "roles", ["r1"]),
+        ("--config other.json --jira OPS-1 users create --username u", "users", ["default"]),
+        ("groups create --name g --realm r1 --realm r2", "groups", ["r1", "r2"]),
+        ("--realm r1 clients list --all-realms", "clients", ["*"]),
+    ],
+)
+def test_targets(line, resource, realms):
+    assert _targets(line.split(), "default") == (resource, realms)
+
+
+def _graph(entries, fail=(), **kwargs):
+    """Run entries through run_graph with a fake runner; return {index: status} and the run order."""
+    order = []
+    lock = threading.Lock()
+
+    def run(cmd: BatchCommand) -> BatchResult:
+        with lock:
+            order.append(cmd.index)
+        return BatchResult(command=cmd, status="failed" if cmd.index in fail else "ok", returncode=int(cmd.index in fail))
+
+    statuses = {}
+    cmds = [c for i, e in enumerate(entries, 1) if (c := batch_command(i, e)) is not None]
+    run_graph(cmds, run, lambda res: statuses.__setitem__(res.command.index, res.status), default_realm="r", **kwargs)
+    return statuses, order
+
+
+def test_run_graph_keeps_file_order_per_realm_and_resource():
+    entries = [f"roles create --name x{i}" for i in range(20)]
+    _, order = _graph(entries, parallel=4, continue_on_error=False)
+    assert order == list(range(1, 21))
+
+
+def test_run_graph_continue_on_error_runs_commands_only_ordered_after_a_failure():
+    entries = ["roles delete --name nope", "roles create --name x3", "roles create --name x4"]
+    statuses, _ = _graph(entries, fail={1}, parallel=3, continue_on_error=True)
+    assert statuses == {1: "failed", 2: "ok", 3: "ok"}
+
+
+def test_run_graph_continue_on_error_skips_required_dependents():
+    entries = [
+        {"cmd": "clients create --client-id app", "id": "app"},
+        {"cmd": "client-roles create --client-id app --name r", "depends_on": "app"},
+        {"cmd": "users create --username u", "group": "g"},
+        {"cmd": "users update --username u --first-name U", "group": "g"},
+        # ordered after the skipped command only by realm/resource
+        "client-roles create --client-id other --name r",
+    ]
+    statuses, _ = _graph(entries, fail={1, 3}, parallel=3, continue_on_error=True)
+    assert statuses == {1: "failed", 2: "skipped", 3: "failed", 4: "skipped", 5: "ok"}
+
+
+def test_run_graph_without_continue_on_error_skips_every_dependent():
+    entries = ["roles delete --name nope", "roles create --name x3", "realms list"]
+    statuses, _ = _graph(entries, fail={1}, parallel=1, continue_on_error=False)
+    assert statuses[1] == "failed"
+    assert statuses[2] == "skipped"
+    assert 3 not in statuses or statuses[3] == "ok"
+
+
+def test_run_graph_treats_already_done_commands_as_succeeded():
+    entries = [{"cmd": "clients create --client-id app", "id": "app"}, {"cmd": "client-roles create --client-id app --name r", "depends_on": "app"}]
+    statuses, order = _graph(entries, parallel=2, continue_on_error=False, already_done=lambda c: c.index == 1)
+    assert statuses == {2: "ok"}
+    assert order == [2]
+
+
+@pytest.mark.parametrize("parallel", ["1", "3"])
+def test_cmd_file_continue_on_error_runs_lines_ordered_after_a_failure(kc, tmp_path, parallel):
+    cmds = tmp_path / "commands.txt"
+    cmds.write_text("roles delete --name nope\nroles create --name x3\n", encoding="utf-8")
+
+    res = kc("--continue-on-error", "--parallel", parallel, "--cmd-file", str(cmds))
+
+    assert "Created role 'x3'" in res.stdout, res.stdout + res.stderr
+    assert kc("roles", "delete", "--name", "x3").returncode == 0
+
+
+def _read(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return list(read_command_file(path))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '["roles create --name a", {"cmd": "roles create --name b", "id": "b"}]',
+        '{"version": 1, "commands": ["roles create --name a", {"cmd": "roles create --name b", "id": "b"}], "x": [1, {"y": 2}]}',
+        ' \n[ "roles create --name a" ,\n {"cmd": "roles create --name b", "id": "b"} ]\n',
+    ],
+    ids=["array", "object", "whitespace"],
+)
+def test_json_command_file_is_decoded_element_by_element(tmp_path, text):
+    assert _read(tmp_path, "c.json", text) == ["roles create --name a", {"cmd": "roles create --name b", "id": "b"}]
+
+
+def test_json_stream_handles_values_split_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_JSON_CHUNK", 7)
+    entries = [f"users create --username user-{i:04d}" for i in range(50)] + [{"cmd": "realms list", "n": 12345678}]
+
+    assert _read(tmp_path, "c.json", json.dumps({"commands": entries})) == entries
+
+
+def test_json_stream_reads_only_as_far_as_needed(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_JSON_CHUNK", 16)
+    path = tmp_path / "c.json"
+    path.write_text(json.dumps(["realms list"] * 10000), encoding="utf-8")
+
+    with path.open(encoding="utf-8") as f:
+        first = next(batch._JsonStream(f, path).commands())
+        assert first == "realms list"
+        assert f.tell() < 100
+
+
+@pytest.mark.parametrize("text", ['["roles create --name a"', '["a" "b"]', '{"commands": [1, }'])
+def test_invalid_json_command_file_names_the_file(tmp_path, text):
+    with pytest.raises(RuntimeError, match=r"c\.json: invalid JSON"):
+        _read(tmp_path, "c.json", text)
+
+
+def test_empty_json_array_has_no_commands(tmp_path):
+    assert _read(tmp_path, "c.json", "[]") == []
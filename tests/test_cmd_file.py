@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+
+def test_profiled_cmd_file_profiles_every_line(kc, tmp_path):
+    cmds = tmp_path / "commands.txt"
+    cmds.write_text("roles create --name r1\nroles create --name r2\nrealms list\n", encoding="utf-8")
+
+    res = kc("--profile", "--profile-dir", "prof", "--cmd-file", str(cmds))
+
+    assert res.returncode == 0, res.stderr
+    names = sorted(p.name for p in (tmp_path / "prof").glob("*.pstats"))
+    assert len([n for n in names if n.startswith("kc-roles-create-")]) == 2
+    assert len([n for n in names if n.startswith("kc-realms-list-")]) == 1
+    assert len([n for n in names if n.startswith("kc-cmd-file-commands-")]) == 1
+
+
+def test_traced_cmd_file_writes_a_trace_per_line(kc, tmp_path):
+    cmds = tmp_path / "commands.txt"
+    cmds.write_text("roles create --name r1\nrealms list\n", encoding="utf-8")
+
+    res = kc("--trace-file", "trace.json", "--cmd-file", str(cmds))
+
+    assert res.returncode == 0, res.stderr
+    assert sorted(p.name for p in tmp_path.glob("trace*.json")) == ["trace.json", "trace.line-1.json", "trace.line-2.json"]
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.mark.parametrize("engine", [[], ["--async"]])
+def test_members_add_resolves_usernames_ignoring_case(kc, server, engine):
+    assert kc("users", "create", "--username", "MixedCase1").returncode == 0
+    assert kc("groups", "create", "--name", "g1").returncode == 0
+
+    res = kc(*engine, "--no-id-cache", "groups", "members", "add", "--group", "/g1", "--username", "MixedCase1")
+
+    assert res.returncode == 0, res.stderr
+    assert "Added: 1" in res.stdout
+    assert "mixedcase1" in kc("groups", "members", "list", "--group", "/g1").stdout
+
+
+@pytest.mark.parametrize("engine", [[], ["--async"]])
+def test_members_add_bulk_scan_ignores_case(kc, server, engine):
+    server.add_users("realm-0001", 120)
+    assert kc("groups", "create", "--name", "g2").returncode == 0
+    # enough names for the single paged walk of the realm instead of one search each
+    names = [f"Bench-User-{i:06d}" for i in range(100)]
+    args = [a for n in names for a in ("--username", n)]
+
+    res = kc(*engine, "--no-id-cache", "groups", "members", "add", "--group", "/g2", *args)
+
+    assert res.returncode == 0, res.stderr
+    assert "Added: 100" in res.stdout
+
+
+def test_update_puts_back_the_representation_it_read(kc, server):
+    assert kc("groups", "create", "--name", "g3").returncode == 0
+    before = server.snapshot()["requests"]
+
+    res = kc("groups", "update", "--group", "/g3", "--attribute", "team=ops")
+
+    assert res.returncode == 0, res.stderr
+    assert "Updated group" in res.stdout
+    after = server.snapshot()["requests"]
+    # one read by path and the PUT; no second GET of the group by id
+    assert after.get("GET /admin/realms/{realm}/groups/{id}", 0) == before.get("GET /admin/realms/{realm}/groups/{id}", 0)
+    assert after["PUT /admin/realms/{realm}/groups/{id}"] == before.get("PUT /admin/realms/{realm}/groups/{id}", 0) + 1
+    g = next(g for g in server._realms["realm-0001"].groups.values() if g["name"] == "g3")
+    assert g["attributes"] == {"team": ["ops"]}
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import pytest
+
+SEARCH = "GET /admin/realms/{realm}/users"
+
+
+def _searches(server) -> int:
+    return server.snapshot()["requests"].get(SEARCH, 0)
+
+
+def test_users_update_reads_cached_ids_instead_of_searching(kc, server):
+    assert kc("users", "create", "--username", "alice", "--username", "bob").returncode == 0
+
+    before = _searches(server)
+    res = kc("users", "update", "--username", "alice", "--username", "bob", "--first-name", "A")
+    assert res.returncode == 0, res.stderr
+    assert "Updated: 2" in res.stdout
+    assert _searches(server) == before
+
+    # unchanged values are still recognised from the record read by id
+    res = kc("users", "update", "--username", "alice", "--first-name", "A")
+    assert "Unchanged: 1" in res.stdout
+
+
+def test_users_delete_uses_cached_ids_and_recovers_from_stale_ones(kc, server):
+    assert kc("users", "create", "--username", "carol").returncode == 0
+    # deleted and created again outside the cache: the cached id now 404s
+    assert kc("--no-id-cache", "users", "delete", "--username", "carol").returncode == 0
+    assert kc("--no-id-cache", "users", "create", "--username", "carol").returncode == 0
+
+    res = kc("users", "delete", "--username", "carol")
+    assert res.returncode == 0, res.stderr
+    assert "Deleted: 1" in res.stdout
+
+    before = _searches(server)
+    res = kc("users", "delete", "--username", "carol", "--ignore-missing")
+    assert "Skipped: 1" in res.stdout
+    # the forgotten name is searched for, not read by a stale id
+    assert _searches(server) == before + 1
+
+
+def test_users_update_does_not_touch_a_user_renamed_since_caching(kc, server):
+    assert kc("users", "create", "--username", "dave").returncode == 0
+    realm = server._realms["realm-0001"]
+    user_id = realm.usernames.pop("dave")
+    realm.users[user_id]["username"] = "david"
+    realm.usernames["david"] = user_id
+
+    res = kc("users", "update", "--username", "dave", "--first-name", "D", "--ignore-missing")
+    assert res.returncode == 0, res.stderr
+    assert "Skipped: 1" in res.stdout
+    assert realm.users[user_id].get("firstName") != "D"
+
+
+@pytest.mark.parametrize("engine", [[], ["--async"]], ids=["sync", "async"])
+def test_users_delete_does_not_delete_a_user_renamed_since_caching(kc, server, engine):
+    assert kc("users", "create", "--username", "frank").returncode == 0
+    realm = server._realms["realm-0001"]
+    user_id = realm.usernames.pop("frank")
+    realm.users[user_id]["username"] = "francis"
+    realm.usernames["francis"] = user_id
+
+    res = kc(*engine, "users", "delete", "--username", "frank", "--ignore-missing")
+    assert res.returncode == 0, res.stderr
+    assert "Skipped: 1" in res.stdout
+    assert user_id in realm.users
+
+
+def test_async_users_update_and_delete_use_cached_ids(kc, server):
+    assert kc("users", "create", "--username", "erin").returncode == 0
+
+    before = _searches(server)
+    res = kc("--async", "users", "update", "--username", "erin", "--last-name", "E")
+    assert "Updated: 1" in res.stdout, res.stderr
+    res = kc("--async", "users", "delete", "--username", "erin")
+    assert "Deleted: 1" in res.stdout, res.stderr
+    assert _searches(server) == before
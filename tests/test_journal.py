@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import pytest
+
+from kc.core.batch import batch_command
+from kc.core.journal import Journal
+
+
+def _commands(entries):
+    return [c for i, e in enumerate(entries, 1) if (c := batch_command(i, e)) is not None]
+
+
+def _run(path, entries, *, resume, fail=()):
+    """Check and record every command like a --cmd-file run; return {line: check result}."""
+    journal = Journal(path, resume=resume)
+    seen = {}
+    try:
+        for cmd in _commands(entries):
+            state = journal.check(cmd)
+            seen.setdefault(cmd.line, []).append(state)
+            if state != "done":
+                journal.record(cmd, "failed" if cmd.line in fail else "ok")
+    finally:
+        journal.close()
+    return seen
+
+
+def test_resume_skips_finished_commands_and_reruns_failed_ones(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    entries = ["roles create --name a", "roles create --name b", "roles create --name c"]
+    _run(path, entries, resume=False, fail={"roles create --name b"})
+
+    seen = _run(path, entries, resume=True)
+
+    assert seen == {"roles create --name a": ["done"], "roles create --name b": [""], "roles create --name c": ["done"]}
+
+
+def test_inserted_and_deleted_lines_do_not_shift_other_records(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    _run(path, ["roles create --name a", "roles create --name b", "roles create --name c"], resume=False)
+
+    seen = _run(path, ["roles create --name new", "roles create --name a", "roles create --name c"], resume=True)
+
+    assert seen == {"roles create --name new": [""], "roles create --name a": ["done"], "roles create --name c": ["done"]}
+
+
+def test_duplicate_lines_are_told_apart_by_position(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    line = "users update --username u --first-name U"
+    journal = Journal(path, resume=False)
+    first = _commands([line, line])[0]
+    journal.check(first)
+    journal.record(first, "ok")
+    journal.close()
+
+    seen = _run(path, ["roles create --name new", line, line], resume=True)
+
+    assert seen[line] == ["done", ""]
+
+
+def test_an_edited_command_with_an_id_is_reported_as_changed(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    _run(path, [{"cmd": "clients create --client-id app", "id": "app"}], resume=False)
+
+    seen = _run(path, ["realms list", {"cmd": "clients create --client-id app --public", "id": "app"}], resume=True)
+
+    assert seen["clients create --client-id app --public"] == ["changed"]
+
+
+def test_a_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    _run(path, ["roles create --name a"], resume=False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("deadbeef")
+
+    assert _run(path, ["roles create --name a", "roles create --name b"], resume=True) == {
+        "roles create --name a": ["done"],
+        "roles create --name b": [""],
+    }
+
+
+def test_a_journal_keyed_by_line_number_cannot_be_resumed(tmp_path):
+    path = tmp_path / "c.txt.journal"
+    path.write_text("# kc cmd-file journal v1: index<TAB>status<TAB>hash\n1\tok\t0011223344556677\n", encoding="utf-8")
+
+    with pytest.raises(RuntimeError, match="older version"):
+        Journal(path, resume=True)
+
+
+def test_cmd_file_resume_after_inserting_a_line(kc, tmp_path):
+    cmds = tmp_path / "commands.txt"
+    cmds.write_text("roles create --name r1\nroles create --name r2\n", encoding="utf-8")
+    assert kc("--cmd-file", str(cmds)).returncode == 0
+
+    cmds.write_text("roles create --name r0\nroles create --name r1\nroles create --name r2\n", encoding="utf-8")
+    res = kc("--cmd-file", str(cmds), "--resume")
+
+    assert res.returncode == 0, res.stderr
+    assert "Resumed: 2 command(s)" in res.stderr
+    assert "edited" not in res.stderr
+    assert "Created role 'r0'" in res.stdout
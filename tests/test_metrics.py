@@ -0,0 +1,17 @@
+import pytest
+
+from kc.core.metrics import path_template
+
+
+@pytest.mark.parametrize(
+    "path, template",
+    [
+        ("/admin/realms/acme/users/1f0c?briefRepresentation=true", "/admin/realms/{realm}/users/{id}"),
+        ("/admin/realms/acme/users/count", "/admin/realms/{realm}/users/count"),
+        ("/admin/realms/acme/roles/admin/composites", "/admin/realms/{realm}/roles/{name}/composites"),
+        ("/admin/realms/acme/group-by-path/ops", "/admin/realms/{realm}/group-by-path/{path}"),
+        ("/admin/realms/acme/group-by-path/ops/eu/oncall", "/admin/realms/{realm}/group-by-path/{path}"),
+    ],
+)
+def test_path_template(path, template):
+    assert path_template(path) == template
@@ -0,0 +1,30 @@
+import asyncio
+
+import httpx
+
+from kc.core import keycloak_async
+
+
+def test_waiter_survives_cancelled_leader():
+    calls = []
+
+    async def fetch():
+        calls.append(asyncio.current_task())
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"ok": True})
+
+    async def main():
+        leader = asyncio.create_task(keycloak_async._single_flight("/admin/realms", None, fetch))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(keycloak_async._single_flight("/admin/realms", None, fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        return results
+
+    results = asyncio.run(main())
+    assert [r.json() for r in results] == [{"ok": True}] * 3
+    # the cancelled request, then one more for all the waiters
+    assert len(calls) == 2
+    assert not keycloak_async._FLIGHTS
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import json
+
+
+def _realm_spans(path):
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    return [e for e in events if e.get("name") == "realm"]
+
+
+def test_realm_span_records_an_error_raised_in_the_loop_body(kc, tmp_path):
+    res = kc("--trace-file", "trace.json", "roles", "delete", "--name", "nope")
+
+    assert res.returncode != 0
+    spans = _realm_spans(tmp_path / "trace.json")
+    assert [s["args"]["realm"] for s in spans] == ["realm-0001"]
+    assert "not found" in spans[0]["args"]["error"]
+
+
+def test_realm_spans_cover_every_realm(kc, tmp_path):
+    res = kc("--trace-file", "trace.json", "roles", "create", "--name", "r", "--all-realms")
+
+    assert res.returncode == 0, res.stderr
+    assert sorted(s["args"]["realm"] for s in _realm_spans(tmp_path / "trace.json")) == ["master", "realm-0001"]
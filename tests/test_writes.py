@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from kc.core import writes
+from kc.core.writes import WriteBuffer
+
+PUT = "PUT /admin/realms/{realm}/clients/{id}"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    def kc_request(method, path, *, json=None):
+        calls.append((method, path, json))
+
+    async def akc_request(method, path, *, json=None):
+        calls.append((method, path, json))
+
+    monkeypatch.setattr(writes, "kc_request", kc_request)
+    monkeypatch.setattr(writes.keycloak_async, "kc_request", akc_request)
+    return calls
+
+
+def test_changes_to_one_resource_are_merged_into_one_put(sent):
+    buf = WriteBuffer()
+    buf.put("/a", {"enabled": True, "name": "old"})
+    buf.put("/b", {"enabled": False})
+    buf.put("/a", {"name": "new"})
+
+    assert buf.flush() == 2
+    # in the order resources were first touched; later changes to a field win
+    assert sent == [("PUT", "/a", {"enabled": True, "name": "new"}), ("PUT", "/b", {"enabled": False})]
+
+
+def test_flush_empties_the_buffer(sent):
+    buf = WriteBuffer()
+    assert not buf
+    buf.put("/a", {"enabled": True})
+    assert buf
+
+    buf.flush()
+
+    assert not buf
+    assert buf.flush() == 0
+    assert len(sent) == 1
+
+
+def test_aflush_sends_the_same_requests(sent):
+    buf = WriteBuffer()
+    buf.put("/a", {"enabled": True})
+    buf.put("/a", {"clientId": "x"})
+
+    assert asyncio.run(buf.aflush()) == 1
+    assert sent == [("PUT", "/a", {"enabled": True, "clientId": "x"})]
+
+
+@pytest.mark.parametrize("engine", [[], ["--async"]], ids=["sync", "async"])
+def test_clients_update_sends_field_changes_and_a_rename_as_one_put(kc, server, engine):
+    assert kc("clients", "create", "--client-id", "app").returncode == 0
+    before = server.snapshot()["requests"].get(PUT, 0)
+
+    res = kc(*engine, "clients", "update", "--client-id", "app", "--new-client-id", "app2", "--redirect-uri", "https://x/*")
+
+    assert res.returncode == 0, res.stderr
+    assert server.snapshot()["requests"][PUT] == before + 1
+    client = next(c for c in server._realms["realm-0001"].clients.values() if c["clientId"] == "app2")
+    assert client["redirectUris"] == ["https://x/*"]